@@ -13,9 +13,14 @@ API_KEY = os.getenv("GEMINI_API_KEY") or "AIzaSyBfRtMF7bsNGy81yhoPHN-paVFxW2qdhA
 if not API_KEY:
     print("Warning: GEMINI_API_KEY not found in environment variables.")
 
+import sys
 import time
 import random
 
+# Local free-text extractor shared with the backend; Gemini is only asked when it is unsure
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'symptom-analysis-web', 'backend')
+LOCAL_EXTRACTION_THRESHOLD = 0.75
+
 # ... imports ...
 
 genai.configure(api_key=API_KEY)
@@ -42,7 +47,19 @@ def retry_api_call(func, retries=5, delay=4):
 class DiagnosisSystem:
     def __init__(self, symptoms_file: str = 'symptoms.json'):
         self.symptoms_list = self._load_symptoms(symptoms_file)
+        self.local_extractor = self._load_local_extractor()
         
+    def _load_local_extractor(self):
+        try:
+            # Appended, not prepended, so backend modules never shadow this package's own
+            if BACKEND_DIR not in sys.path:
+                sys.path.append(BACKEND_DIR)
+            from symptom_extractor import SymptomExtractor
+            return SymptomExtractor.from_vocabularies({}, self.symptoms_list)
+        except Exception as e:
+            print(f"Local symptom extractor unavailable, using Gemini only: {e}")
+            return None
+
     def _load_symptoms(self, filepath: str) -> List[str]:
         try:
             with open(filepath, 'r') as f:
@@ -53,8 +70,14 @@ class DiagnosisSystem:
 
     def extract_symptoms_from_text(self, user_text: str) -> List[str]:
         """
-        Uses LLM to extract valid symptoms from user description.
+        Extracts valid symptoms from user description.
+        Tries the local n-gram extractor first and only uses the LLM when it is unsure.
         """
+        if self.local_extractor:
+            matches = self.local_extractor.extract(user_text)
+            if matches and self.local_extractor.confidence(matches) >= LOCAL_EXTRACTION_THRESHOLD:
+                return [m["symptom"] for m in matches]
+        
         prompt = f"""
         You are a medical assistant. Parse the following user description and extract relevant symptoms.
         Map them EXACTLY to the following list of valid known symptoms.
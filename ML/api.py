@@ -1,5 +1,6 @@
 import pickle
 import numpy as np
+from scipy.sparse import csr_matrix
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
@@ -26,6 +27,11 @@ try:
         
     symptom_to_idx = mappings['symptom_to_idx']
     idx_to_disease = mappings['idx_to_disease']
+
+    # Fuzzy match symptoms
+    # The dataset has keys like ' itching' (leading space)
+    # We clean both user input and map keys to compare
+    normalized_map = {k.strip().lower(): v for k, v in symptom_to_idx.items()}
     print(f"✅ Loaded model & {len(symptom_to_idx)} symptoms")
     
 except Exception as e:
@@ -40,20 +46,14 @@ async def predict_disease(request: SymptomRequest):
     if not model:
         raise HTTPException(status_code=500, detail="Model API not initialized correctly")
 
-    # Initialize input vector
-    input_vector = np.zeros((1, len(symptom_to_idx)))
+    # Collect active symptom indices (sparse input, no dense vector)
+    active = set()
     matched = []
 
-    # Fuzzy match symptoms
-    # The dataset has keys like ' itching' (leading space)
-    # We clean both user input and map keys to compare
-    normalized_map = {k.strip().lower(): v for k, v in symptom_to_idx.items()}
-
     for s in request.symptoms:
         clean_s = s.strip().lower()
         if clean_s in normalized_map:
-            idx = normalized_map[clean_s]
-            input_vector[0, idx] = 1
+            active.add(normalized_map[clean_s])
             matched.append(clean_s)
 
     if not matched:
@@ -62,6 +62,12 @@ async def predict_disease(request: SymptomRequest):
             "message": "Try these: itching, skin rash, mild fever, etc."
         }
 
+    indices = sorted(active)
+    input_vector = csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, [0, len(indices)]),
+        shape=(1, len(symptom_to_idx))
+    )
+
     # Predict
     probabilities = model.predict_proba(input_vector)[0]
     
@@ -0,0 +1,115 @@
+"""
+Symptom Frequency Tables for Follow-up Questions
+================================================
+Precompute P(symptom | disease) from the hybrid training matrix for the
+backend's question engine (symptom-analysis-web/backend/question_engine.py),
+together with the yes/no question asked for each feature. Most features are
+symptoms and use the question engine's QUESTION_TEMPLATE; history and exposure features, which
+would read badly in it, have their own wording in QUESTION_OVERRIDES.
+
+The matrix is rebuilt with get_model_stats.build_dataset(), which follows
+the same preprocessing as fix_and_retrain.create_training_data() but uses
+the saved mappings, so rows and columns line up with the served model.
+
+Usage:
+    python build_question_table.py
+    python build_question_table.py --data dataset.npz --out symptom_frequencies.npz
+"""
+
+import argparse
+import os
+import pickle
+import sys
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'symptom-analysis-web', 'backend')
+sys.path.append(BACKEND_DIR)
+
+from question_engine import QUESTION_TEMPLATE  # noqa: E402
+
+QUESTION_OVERRIDES = {
+    "extra marital contacts": "Have you had sexual contact with a new or casual partner recently?",
+    "family history": "Has anyone in your family had a similar illness?",
+    "history of alcohol consumption": "Do you drink alcohol regularly, or have you in the past?",
+    "receiving blood transfusion": "Have you received a blood transfusion recently?",
+    "receiving unsterile injections": "Have you recently had an injection that may not have been sterile?",
+    "irregular sugar level": "Have you been told your blood sugar level is irregular?",
+    "obesity": "Are you significantly overweight?",
+    "coma": "Have you lost consciousness or been unresponsive?",
+    "cross-eyed": "Do your eyes point in different directions (cross-eyed)?",
+    "lack of growth": "Is there a lack of normal growth (for a child)?",
+    "symptoms of eye": "Are you having any other problems with your eyes?",
+    "pain during pregnancy": "Are you pregnant and having pain?",
+    "toxic look (typhos)": "Do you look very unwell, dazed or exhausted?",
+}
+
+
+def question_text(symptom):
+    """Yes/no question asked about a feature (symptom key as in the mappings)."""
+    phrase = " ".join(symptom.replace("_", " ").lower().split())
+    return QUESTION_OVERRIDES.get(phrase, QUESTION_TEMPLATE.format(phrase=phrase))
+
+
+def build_table(X, y, n_diseases, alpha=1.0):
+    """Laplace-smoothed P(symptom | disease) of shape (n_diseases, n_symptoms), plus disease counts."""
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.int64)
+    counts = np.bincount(y, minlength=n_diseases).astype(np.float64)
+    present = np.zeros((n_diseases, X.shape[1]))
+    np.add.at(present, y, X)
+    likelihood = (present + alpha) / (counts[:, np.newaxis] + 2 * alpha)
+    return likelihood.astype(np.float32), counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build per-disease symptom frequency tables")
+    parser.add_argument("--mappings", default="mappings_100percent.pkl")
+    parser.add_argument("--data", help="npz with X and y (default: rebuild from the CSVs)")
+    parser.add_argument("--alpha", type=float, default=1.0, help="Laplace smoothing")
+    parser.add_argument("--out", default="symptom_frequencies.npz")
+    args = parser.parse_args()
+
+    print("\n" + "="*80)
+    print("📊 BUILDING SYMPTOM FREQUENCY TABLES")
+    print("="*80)
+
+    with open(args.mappings, 'rb') as f:
+        mappings = pickle.load(f)
+    symptom_to_idx = mappings['symptom_to_idx']
+    idx_to_disease = mappings['idx_to_disease']
+
+    if args.data:
+        data = np.load(args.data)
+        X, y = data['X'], data['y']
+    else:
+        from get_model_stats import build_dataset
+        X, y = build_dataset(mappings)
+
+    if X.shape[1] != len(symptom_to_idx):
+        raise SystemExit(f"❌ Data has {X.shape[1]} symptom columns, mappings define {len(symptom_to_idx)}")
+
+    likelihood, counts = build_table(X, y, len(idx_to_disease), args.alpha)
+
+    symptom_names = [None] * len(symptom_to_idx)
+    for name, idx in symptom_to_idx.items():
+        symptom_names[idx] = name.strip()
+    disease_names = [idx_to_disease[i] for i in range(len(idx_to_disease))]
+
+    np.savez_compressed(
+        args.out,
+        likelihood=likelihood,
+        disease_counts=counts,
+        symptom_names=np.array(symptom_names),
+        questions=np.array([question_text(name) for name in symptom_names]),
+        disease_names=np.array(disease_names),
+    )
+
+    print(f"\n✅ Saved: {args.out} ({os.path.getsize(args.out) / 1e3:.0f} KB)")
+    print(f"   Samples: {len(y):,}")
+    print(f"   Diseases: {len(disease_names)}, symptoms: {len(symptom_names)}")
+    print(f"   Diseases without samples: {int((counts == 0).sum())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Per-Disease Report Library
+==========================
+Generate a base report (specialist, triage level, advice) for every
+disease the model can predict, so the backend's high-confidence path
+(symptom-analysis-web/backend/report_library.py) can answer without an
+LLM call.
+
+Diseases are read from idx_to_disease in the ML mappings. Each one is sent
+to Groq with bounded concurrency; replies must be JSON with a known triage
+level and non-empty, length-capped text fields, and are retried otherwise.
+The library is saved as an npz indexed like idx_to_disease, with
+specialists and triage levels stored as small vocabularies.
+
+Usage:
+    python build_report_library.py
+    python build_report_library.py --concurrency 4 --resume --out report_library.npz
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+from dotenv import load_dotenv
+from groq import AsyncGroq
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'symptom-analysis-web', 'backend')
+sys.path.append(BACKEND_DIR)
+
+from report_library import ReportLibrary  # noqa: E402
+
+TRIAGE_LEVELS = ("immediate", "delayed", "minimal", "expectant")
+MAX_SPECIALIST_CHARS = 60
+MAX_ADVICE_CHARS = 400
+
+SYSTEM_PROMPT = """You are a professional medical assistant writing reference notes for a triage app.
+Always respond with valid JSON only."""
+
+PROMPT = """Write the standard triage note for a patient diagnosed with: {disease}
+
+TRIAGE LEVELS (choose one based on condition severity):
+- "immediate" - Life-threatening, needs emergency care (heart attack, stroke, severe bleeding)
+- "delayed" - Serious but stable, can wait hours (fractures, moderate infections)
+- "minimal" - Minor condition, outpatient care (common cold, minor pain)
+- "expectant" - Chronic/terminal conditions requiring palliative care
+
+Return ONLY this JSON:
+{{
+    "specialist": "Type of specialist",
+    "triage_level": "immediate/delayed/minimal/expectant",
+    "advice": "1-2 sentences of actionable next steps"
+}}"""
+
+
+def validate_report(report):
+    """The cleaned report, or None if a field is missing or invalid."""
+    if not isinstance(report, dict):
+        return None
+    specialist = str(report.get("specialist", "")).strip()
+    triage = str(report.get("triage_level", "")).strip().lower()
+    advice = str(report.get("advice", "")).strip()
+    if not specialist or len(specialist) > MAX_SPECIALIST_CHARS:
+        return None
+    if triage not in TRIAGE_LEVELS or not advice or len(advice) > MAX_ADVICE_CHARS:
+        return None
+    return {"specialist": specialist, "triage_level": triage, "advice": advice}
+
+
+async def generate_report(client, model, disease, slots, retries):
+    """Validated base report for one disease, or None after the retries."""
+    for attempt in range(retries + 1):
+        async with slots:
+            try:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": PROMPT.format(disease=disease)},
+                    ],
+                    temperature=0.2,
+                    max_tokens=256,
+                    response_format={"type": "json_object"},
+                )
+                report = validate_report(json.loads(response.choices[0].message.content))
+                if report:
+                    return report
+                print(f"   ⚠️  {disease}: invalid report (attempt {attempt + 1})")
+            except Exception as e:
+                print(f"   ⚠️  {disease}: {e} (attempt {attempt + 1})")
+        if attempt < retries:
+            await asyncio.sleep(2 ** attempt)
+    return None
+
+
+def save_library(path, disease_names, reports, model):
+    """Save reports (disease name -> report) indexed like disease_names."""
+    specialists = sorted({r["specialist"] for r in reports.values()})
+    specialist_ids = {s: i for i, s in enumerate(specialists)}
+    triage_ids = {t: i for i, t in enumerate(TRIAGE_LEVELS)}
+    missing = {"specialist": "", "triage_level": TRIAGE_LEVELS[0], "advice": ""}
+    rows = [reports.get(name, missing) for name in disease_names]
+
+    np.savez_compressed(
+        path,
+        disease_names=np.array(disease_names),
+        valid=np.array([name in reports for name in disease_names]),
+        specialists=np.array(specialists or [""]),
+        specialist_idx=np.array([specialist_ids.get(r["specialist"], 0) for r in rows], dtype=np.uint16),
+        triage_levels=np.array(TRIAGE_LEVELS),
+        triage_idx=np.array([triage_ids[r["triage_level"]] for r in rows], dtype=np.uint8),
+        advice=np.array([r["advice"] for r in rows]),
+        model=np.array(model),
+    )
+
+
+async def build(args, disease_names):
+    reports = {}
+    if args.resume and os.path.exists(args.out):
+        # The library keys reports by lowercased name; keep the mapping's spelling
+        library = ReportLibrary.from_file(args.out).reports
+        reports = {name: library[name.lower()] for name in disease_names if name.lower() in library}
+        print(f"   Resuming: {len(reports)} diseases already done")
+
+    todo = [name for name in disease_names if name not in reports]
+    client = AsyncGroq(api_key=os.environ.get("GROQ_API_KEY"))
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def one(name):
+        report = await generate_report(client, args.model, name, slots, args.retries)
+        if report:
+            reports[name] = report
+            print(f"   ✓ {name}: {report['specialist']} / {report['triage_level']}")
+
+    await asyncio.gather(*(one(name) for name in todo))
+    await client.close()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the per-disease base report library")
+    parser.add_argument("--mappings", default="mappings_100percent.pkl")
+    parser.add_argument("--model", default="llama-3.3-70b-versatile")
+    parser.add_argument("--concurrency", type=int, default=8, help="Groq requests in flight")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per disease on errors or invalid reports")
+    parser.add_argument("--resume", action="store_true", help="Keep diseases already in --out")
+    parser.add_argument("--out", default="report_library.npz")
+    args = parser.parse_args()
+
+    load_dotenv()
+    load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+    print("\n" + "="*80)
+    print("📚 BUILDING DISEASE REPORT LIBRARY")
+    print("="*80)
+
+    with open(args.mappings, 'rb') as f:
+        mappings = pickle.load(f)
+    idx_to_disease = mappings['idx_to_disease']
+    disease_names = [str(idx_to_disease[i]).strip() for i in range(len(idx_to_disease))]
+
+    reports = asyncio.run(build(args, disease_names))
+    save_library(args.out, disease_names, reports, args.model)
+
+    missing = [name for name in disease_names if name not in reports]
+    print(f"\n✅ Saved: {args.out} ({os.path.getsize(args.out) / 1e3:.1f} KB)")
+    print(f"   Diseases: {len(reports)}/{len(disease_names)}")
+    if missing:
+        print(f"   ⚠️  Missing (rerun with --resume): {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
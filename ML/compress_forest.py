@@ -0,0 +1,233 @@
+"""
+Forest Compression
+==================
+Search for a smaller RandomForest that serves within a latency and size
+budget while keeping accuracy close to the production model.
+
+Candidates:
+- Tree dropping: the first k trees of the fitted forest (no retraining)
+- Pruning: refits with cost-complexity pruning (ccp_alpha) or a depth cap
+- Distillation: small forests trained on the teacher's labels for the
+  training rows plus perturbed copies with symptoms randomly dropped
+
+Every candidate is compiled with the backend's flat engine (the engine the
+API serves with) to measure single-request p50/p99 latency and artifact
+size. The smallest candidate within the accuracy tolerance and budgets is
+saved, and the full accuracy/latency/memory table is printed (and
+optionally written as JSON).
+
+Usage:
+    python compress_forest.py --target-p99-ms 1.0 --max-size-mb 20 --out model_compressed.pkl
+    python compress_forest.py --split split.npz --strategies drop,distill --report compression.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'symptom-analysis-web', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from forest_engine import FlatForest  # noqa: E402
+
+DROP_SIZES = (10, 20, 30, 50, 75)
+CCP_ALPHAS = (1e-5, 1e-4, 1e-3)
+DEPTH_CAPS = (10, 15)
+DISTILL_SHAPES = ((20, 15), (30, 12), (50, 10))  # (n_trees, max_depth)
+
+
+def load_split(args, mappings):
+    """(X_train, X_test, y_train, y_test) from --split, or rebuilt from the CSVs."""
+    if args.split:
+        data = np.load(args.split)
+        return data['X_train'], data['X_test'], data['y_train'], data['y_test']
+    from get_model_stats import load_split as build_split
+    return build_split(mappings)
+
+
+def drop_trees(model, n_trees):
+    """The first n_trees of a fitted forest (trees are i.i.d., so no ranking is needed)."""
+    subset = copy.copy(model)
+    subset.estimators_ = model.estimators_[:n_trees]
+    subset.n_estimators = n_trees
+    return subset
+
+
+def refit(model, X, y, **overrides):
+    params = model.get_params()
+    params.update(overrides)
+    return RandomForestClassifier(**params).fit(X, y)
+
+
+def distill(teacher_engine, teacher_classes, X, seed, n_trees, max_depth, drop_rate=0.2):
+    """Train a small forest on the teacher's labels for X plus a perturbed copy of X."""
+    rng = np.random.default_rng(seed)
+    X_aug = X * (rng.random(X.shape) >= drop_rate)
+    X_all = np.vstack([X, X_aug]).astype(np.float32)
+    y_teacher = teacher_classes[teacher_engine.predict_proba(X_all).argmax(axis=1)]
+    student = RandomForestClassifier(n_estimators=n_trees, max_depth=max_depth, random_state=seed, n_jobs=-1)
+    return student.fit(X_all, y_teacher)
+
+
+def evaluate(model, X_test, y_test, latency_samples, seed=0):
+    """Accuracy on the held-out split plus serving latency and size in the flat engine."""
+    engine = FlatForest.from_sklearn(model)
+    classes = np.asarray(model.classes_)
+
+    # Batched in chunks so the traversal's index arrays stay small; stable sort ranks ties like predict()
+    ranked = np.concatenate([
+        classes[np.argsort(-engine.predict_proba(X_test[i:i + 4096]), axis=1, kind='stable')[:, :3]]
+        for i in range(0, len(X_test), 4096)
+    ])
+    top1 = float(np.mean(ranked[:, 0] == y_test))
+    top3 = float(np.mean(np.any(ranked == y_test[:, np.newaxis], axis=1)))
+
+    # Single-request latency through the same sparse path as the API
+    rng = np.random.default_rng(seed)
+    rows = [np.flatnonzero(X_test[i]).astype(np.int32) for i in rng.integers(0, len(X_test), latency_samples)]
+    for indices in rows[:50]:
+        engine.predict_proba_sparse(np.array([0, len(indices)]), indices)
+    timings = []
+    for indices in rows:
+        start = time.perf_counter()
+        engine.predict_proba_sparse(np.array([0, len(indices)]), indices)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "trees": engine.n_trees,
+        "nodes": len(engine.feature),
+        "max_depth": engine.max_depth,
+        "top1": top1,
+        "top3": top3,
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p99_ms": float(np.percentile(timings, 99) * 1000),
+        "size_mb": sum(a.nbytes for a in engine.to_arrays().values()) / 1e6,
+    }
+
+
+def generate_candidates(model, X_train, y_train, strategies, seed):
+    """Yield (name, fitted model) for every requested strategy."""
+    if 'drop' in strategies:
+        for k in DROP_SIZES:
+            if k < len(model.estimators_):
+                yield f"drop:{k}", drop_trees(model, k)
+
+    if 'prune' in strategies:
+        for alpha in CCP_ALPHAS:
+            yield f"ccp:{alpha:g}", refit(model, X_train, y_train, ccp_alpha=alpha, random_state=seed)
+        for depth in DEPTH_CAPS:
+            yield f"depth:{depth}", refit(model, X_train, y_train, max_depth=depth, random_state=seed)
+
+    if 'distill' in strategies:
+        teacher = FlatForest.from_sklearn(model)
+        for n_trees, depth in DISTILL_SHAPES:
+            yield f"distill:{n_trees}x{depth}", distill(teacher, np.asarray(model.classes_), X_train, seed, n_trees, depth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune and distill the RandomForest under a latency budget")
+    parser.add_argument("--model", default="model_100percent.pkl", help="Fitted RandomForestClassifier pickle")
+    parser.add_argument("--mappings", default="mappings_100percent.pkl", help="Mappings pickle for the model")
+    parser.add_argument("--split", help="npz with X_train, X_test, y_train, y_test (default: rebuild from CSVs)")
+    parser.add_argument("--strategies", default="drop,prune,distill", help="Comma-separated: drop, prune, distill")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Allowed top-1/top-3 accuracy loss (fraction)")
+    parser.add_argument("--target-p99-ms", type=float, default=1.0, help="Single-request p99 latency budget")
+    parser.add_argument("--max-size-mb", type=float, default=50.0, help="Artifact size budget")
+    parser.add_argument("--train-fraction", type=float, default=0.10, help="Training sample for refits (as in fix_and_retrain.py)")
+    parser.add_argument("--latency-samples", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Where to save the selected model pickle")
+    parser.add_argument("--artifact", help="Also export the selected model as a .forest artifact")
+    parser.add_argument("--report", help="Write every candidate's metrics to this JSON file")
+    args = parser.parse_args()
+
+    print("\n" + "="*80)
+    print("🗜️  FOREST COMPRESSION")
+    print("="*80)
+
+    with open(args.model, 'rb') as f:
+        model = pickle.load(f)
+    with open(args.mappings, 'rb') as f:
+        mappings = pickle.load(f)
+
+    X_train, X_test, y_train, y_test = load_split(args, mappings)
+    X_test = np.asarray(X_test, dtype=np.float32)
+    y_test = np.asarray(y_test)
+    rng = np.random.default_rng(args.seed)
+    sample = rng.choice(len(y_train), max(1, int(len(y_train) * args.train_fraction)), replace=False)
+    X_train, y_train = np.asarray(X_train[sample], dtype=np.float32), np.asarray(y_train[sample])
+    print(f"\n✅ Split loaded: {len(y_train):,} training rows (sampled), {len(y_test):,} test rows")
+
+    baseline = evaluate(model, X_test, y_test, args.latency_samples)
+    baseline["name"] = "baseline"
+    print(f"\n📊 Baseline: top-1 {baseline['top1']*100:.2f}%, top-3 {baseline['top3']*100:.2f}%, "
+          f"p99 {baseline['p99_ms']:.3f} ms, {baseline['size_mb']:.1f} MB")
+
+    min_top1 = baseline["top1"] - args.tolerance
+    min_top3 = baseline["top3"] - args.tolerance
+    strategies = {s.strip() for s in args.strategies.split(',') if s.strip()}
+
+    print(f"\n🔍 Evaluating candidates ({', '.join(sorted(strategies))})...")
+    results = [baseline]
+    models = {"baseline": model}
+    for name, candidate in generate_candidates(model, X_train, y_train, strategies, args.seed):
+        metrics = evaluate(candidate, X_test, y_test, args.latency_samples)
+        metrics["name"] = name
+        results.append(metrics)
+        models[name] = candidate
+        print(f"   {name:<16} top-1 {metrics['top1']*100:6.2f}%  top-3 {metrics['top3']*100:6.2f}%  "
+              f"p99 {metrics['p99_ms']:7.3f} ms  {metrics['size_mb']:7.2f} MB")
+
+    for metrics in results:
+        metrics["accurate"] = metrics["top1"] >= min_top1 and metrics["top3"] >= min_top3
+        metrics["fast"] = metrics["p99_ms"] <= args.target_p99_ms
+        metrics["small"] = metrics["size_mb"] <= args.max_size_mb
+        metrics["eligible"] = metrics["accurate"] and metrics["fast"] and metrics["small"]
+
+    print("\n" + "="*80)
+    print("📈 ACCURACY vs LATENCY vs MEMORY")
+    print("="*80)
+    print(f"\n   {'Candidate':<16} {'Trees':>5} {'Nodes':>9} {'Top-1':>8} {'Top-3':>8} {'p50 ms':>8} {'p99 ms':>8} {'MB':>8}  OK")
+    print(f"   {'-'*84}")
+    for m in sorted(results, key=lambda m: m["size_mb"]):
+        flag = "✅" if m["eligible"] else "  "
+        print(f"   {m['name']:<16} {m['trees']:>5} {m['nodes']:>9,} {m['top1']*100:>7.2f}% {m['top3']*100:>7.2f}% "
+              f"{m['p50_ms']:>8.3f} {m['p99_ms']:>8.3f} {m['size_mb']:>8.2f}  {flag}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({"tolerance": args.tolerance, "target_p99_ms": args.target_p99_ms,
+                       "max_size_mb": args.max_size_mb, "candidates": results}, f, indent=2)
+        print(f"\n   ✅ Report saved: {args.report}")
+
+    eligible = [m for m in results if m["eligible"]]
+    if not eligible:
+        print("\n❌ No candidate meets the accuracy tolerance, latency and size budgets")
+        sys.exit(1)
+
+    best = min(eligible, key=lambda m: (m["size_mb"], m["p99_ms"]))
+    print(f"\n🎯 Selected: {best['name']} ({best['trees']} trees, {best['size_mb']:.2f} MB, "
+          f"p99 {best['p99_ms']:.3f} ms, top-3 {best['top3']*100:.2f}%)")
+
+    if args.out:
+        with open(args.out, 'wb') as f:
+            pickle.dump(models[best["name"]], f)
+        print(f"   ✅ Saved: {args.out}")
+    if args.artifact:
+        from ml_service import file_version
+        from model_artifact import export_artifact
+        export_artifact(FlatForest.from_sklearn(models[best["name"]]), mappings['symptom_to_idx'],
+                        mappings['idx_to_disease'], args.artifact,
+                        model_version=file_version(args.out) if args.out else None)
+        print(f"   ✅ Artifact saved: {args.artifact}")
+
+
+if __name__ == "__main__":
+    main()
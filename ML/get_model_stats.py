@@ -56,18 +56,12 @@ def standardize_disease_name(disease_name):
         return DISEASE_NAME_MAP[disease_name]
     return disease_name.lower().strip()
 
-def main():
-    print("Loading resources...")
-    with open('mappings_100percent.pkl', 'rb') as f:
-        mappings = pickle.load(f)
-    
+def build_dataset(mappings):
+    """Rebuild the merged training dataset as (X, y) using the saved mappings."""
     symptom_to_idx = mappings['symptom_to_idx']
     disease_to_idx = mappings['disease_to_idx'] # Might be in mappings
     # Note: mappings might be a dict or a tuple depending on which script saved it.
     # api.py accesses it as: mappings['symptom_to_idx']
-    
-    with open('model_100percent.pkl', 'rb') as f:
-        model = pickle.load(f)
 
     print("Loading datasets...")
     # Load and standardize same as fix_and_retrain.py
@@ -121,11 +115,26 @@ def main():
                     X[idx, symptom_to_idx[s]] = 1
                 elif s.strip() in symptom_to_idx: # Try strip
                     X[idx, symptom_to_idx[s.strip()]] = 1
-                    
-    # Split
-    X_train, X_test, y_train, y_test = train_test_split(
+
+    return X, y
+
+def load_split(mappings):
+    """The train/test split used for evaluation: (X_train, X_test, y_train, y_test)."""
+    X, y = build_dataset(mappings)
+    return train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
+
+def main():
+    print("Loading resources...")
+    with open('mappings_100percent.pkl', 'rb') as f:
+        mappings = pickle.load(f)
+    
+    with open('model_100percent.pkl', 'rb') as f:
+        model = pickle.load(f)
+                    
+    # Split
+    X_train, X_test, y_train, y_test = load_split(mappings)
     
     print("Evaluating...")
     y_pred = model.predict(X_test)
@@ -0,0 +1,168 @@
+"""
+Compact, quantized variant of the flat-array forest engine.
+
+All model inputs are binary symptom indicators, so every split threshold
+lies strictly between 0 and 1 and a node only needs to know which feature
+it tests: a row goes right exactly when that symptom is present. Features
+are stored as uint16, and leaf class distributions, which are mostly
+zeros, are kept as CSR rows of (class, quantized probability) pairs.
+
+Quantization error per class is at most max_error, both per tree and
+after averaging over trees. Top-k rankings are verified against the exact
+model before a compact engine is used (see MLService).
+"""
+import threading
+import numpy as np
+from forest_engine import FlatForest, GATHER_LIMIT, SCRATCH_ROWS
+
+# Probability encodings: dtype -> (scale applied on decode, max absolute rounding error)
+PRECISIONS = {
+    "uint8": (np.uint8, 1.0 / 255, 0.5 / 255),
+    "float16": (np.float16, 1.0, 2.0 ** -12),  # values <= 1: spacing <= 2**-11, round to nearest
+}
+
+
+class CompactForest(FlatForest):
+    """
+    FlatForest layout with implicit thresholds and sparse quantized leaves.
+    Leaves point to themselves on both branches, so traversal matches
+    FlatForest step for step.
+    """
+    row_dtype = np.uint8
+
+    def __init__(self, feature, children, leaf_row, leaf_ptr, leaf_class, leaf_prob, roots,
+                 n_features: int, n_classes: int, max_depth: int):
+        self.feature = feature        # (n_nodes,) uint16 feature tested at node
+        self.children = children      # (2 * n_nodes,) uint32 children[2 * node + present]
+        self.leaf_row = leaf_row      # (n_nodes,) int32 leaf id, -1 for splits
+        self.leaf_ptr = leaf_ptr      # (n_leaves + 1,) uint32 CSR row pointers into leaf_class/leaf_prob
+        self.leaf_class = leaf_class  # (nnz,) uint16 class of each non-zero probability
+        self.leaf_prob = leaf_prob    # (nnz,) uint8 or float16 quantized probability
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.n_features = n_features
+        self.n_classes = n_classes
+        self.n_trees = len(roots)
+        self.max_depth = max_depth
+        self.precision = "uint8" if leaf_prob.dtype == np.uint8 else "float16"
+        self.scale, self.max_error = PRECISIONS[self.precision][1:]
+        self._local = threading.local()
+
+    def to_arrays(self) -> dict:
+        return {
+            "feature": self.feature,
+            "children": self.children,
+            "leaf_row": self.leaf_row,
+            "leaf_ptr": self.leaf_ptr,
+            "leaf_class": self.leaf_class,
+            "leaf_prob": self.leaf_prob,
+            "roots": self.roots,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, n_features: int, max_depth: int, n_classes: int = None) -> "CompactForest":
+        return cls(n_features=n_features, n_classes=n_classes, max_depth=max_depth, **arrays)
+
+    @classmethod
+    def from_sklearn(cls, model, precision: str = "float16") -> "CompactForest":
+        return cls.from_flat(FlatForest.from_sklearn(model), precision)
+
+    @classmethod
+    def from_flat(cls, forest: FlatForest, precision: str = "float16") -> "CompactForest":
+        """Compress a FlatForest. Raises ValueError if a split is not a binary-feature split."""
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}, expected one of {sorted(PRECISIONS)}")
+        if forest.n_features > np.iinfo(np.uint16).max or forest.n_classes > np.iinfo(np.uint16).max:
+            raise ValueError("Too many features or classes for uint16 indices")
+        splits = forest.leaf_row < 0
+        thresholds = forest.threshold[splits]
+        if np.any((thresholds < 0.0) | (thresholds >= 1.0)):
+            raise ValueError("Forest has splits that are not 0/1 splits; binary inputs are required")
+
+        dtype, scale, _ = PRECISIONS[precision]
+        values = forest.leaf_values
+        if dtype == np.uint8:
+            quantized = np.rint(values / scale)
+        else:
+            quantized = values.astype(np.float16)
+        leaf_ids, classes = np.nonzero(quantized)
+
+        return cls(
+            feature=np.where(splits, forest.feature, 0).astype(np.uint16),
+            children=forest.children.astype(np.uint32),
+            leaf_row=np.asarray(forest.leaf_row, dtype=np.int32),
+            leaf_ptr=np.concatenate(([0], np.cumsum(np.bincount(leaf_ids, minlength=len(values))))).astype(np.uint32),
+            leaf_class=classes.astype(np.uint16),
+            leaf_prob=quantized[leaf_ids, classes].astype(dtype),
+            roots=forest.roots,
+            n_features=forest.n_features,
+            n_classes=forest.n_classes,
+            max_depth=forest.max_depth,
+        )
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node id reached in every tree, shape (n_samples, n_trees)."""
+        X = np.ascontiguousarray(X, dtype=np.uint8)
+        if X.shape[0] == 1:
+            return self.apply_row(X[0])[np.newaxis, :]
+
+        flat_x = X.ravel()
+        row_base = (np.arange(X.shape[0], dtype=np.int64) * X.shape[1])[:, np.newaxis]
+        nodes = np.tile(self.roots, (X.shape[0], 1))
+        for _ in range(self.max_depth):
+            nodes = self.children[2 * nodes + flat_x[row_base + self.feature[nodes]]]
+        return nodes
+
+    def _step(self, x: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        return self.children[2 * nodes + x[self.feature[nodes]]]
+
+    def _threshold_of(self):
+        return lambda node: 0  # uint8 rows: right when the feature is present
+
+    def _scratch_rows(self, n_rows: int) -> np.ndarray:
+        """Zeroed (n_rows, n_features) view of this thread's uint8 membership buffer."""
+        buffer = getattr(self._local, "scratch", None)
+        if buffer is None:
+            buffer = np.zeros((SCRATCH_ROWS, self.n_features), dtype=np.uint8)
+            self._local.scratch = buffer
+        return buffer[:n_rows]
+
+    def leaf_proba(self, rows: np.ndarray, trees: slice = None) -> np.ndarray:
+        """Average the sparse leaf distributions of rows (n_samples, n_trees)."""
+        if trees is not None:
+            rows = rows[:, trees]
+        n_samples, n_trees = rows.shape
+        proba = np.zeros(n_samples * self.n_classes)
+        chunk = max(1, GATHER_LIMIT // max(1, n_trees * 4))
+        for start in range(0, n_samples, chunk):
+            block = rows[start:start + chunk].ravel()
+            begins = self.leaf_ptr[block].astype(np.int64)
+            counts = self.leaf_ptr[block + 1].astype(np.int64) - begins
+            # Position of every stored entry of every gathered leaf
+            entry_offsets = np.repeat(begins - np.cumsum(counts) + counts, counts)
+            entries = entry_offsets + np.arange(counts.sum())
+            sample = np.repeat(np.arange(start, start + len(block) // n_trees), n_trees)
+            target = np.repeat(sample, counts) * self.n_classes + self.leaf_class[entries]
+            proba += np.bincount(target, weights=self.leaf_prob[entries].astype(np.float64),
+                                 minlength=len(proba))
+        proba = proba.reshape(n_samples, self.n_classes)
+        proba *= self.scale / n_trees
+        return proba
+
+    def matches(self, model, X: np.ndarray, k: int = 3) -> bool:
+        """
+        Check the error bound and top-k rankings against the exact model on a
+        probe batch. Rankings may only differ between classes whose exact
+        probabilities are within 2 * max_error of each other (quantization
+        cannot order near-ties the way float rounding happens to).
+        """
+        exact = model.predict_proba(X)
+        approx = self.predict_proba(X)
+        if np.max(np.abs(exact - approx)) > self.max_error + 1e-12:
+            return False
+        exact_top = np.argsort(-exact, axis=1, kind="stable")[:, :k]
+        approx_top = np.argsort(-approx, axis=1, kind="stable")[:, :k]
+        rows = np.arange(len(X))[:, np.newaxis]
+        return bool(np.all(np.abs(exact[rows, exact_top] - exact[rows, approx_top]) <= 2 * self.max_error))
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.to_arrays().values())
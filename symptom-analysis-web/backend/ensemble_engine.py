@@ -0,0 +1,142 @@
+"""
+Serving for the multi-forest ensemble built by ML/train_ensemble.py.
+Members are combined by soft voting (mean of predict_proba) and each
+member's top class is counted as a vote, giving an agreement signal
+alongside the probability.
+
+With the flat engine all members are merged into one FlatForest, so a
+single traversal scores every member. Otherwise members run in parallel
+on a thread pool under a latency budget; members that miss the budget
+are left out of that prediction.
+"""
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import numpy as np
+from scipy.sparse import csr_matrix
+from forest_engine import FlatForest
+
+logger = logging.getLogger(__name__)
+
+
+class ForestEnsemble:
+    def __init__(self, models: list, n_classes: int, use_flat_engine: bool = True,
+                 latency_budget_ms: float = 0):
+        """
+        Args:
+            models: Fitted RandomForestClassifiers sharing one feature space
+            n_classes: Size of the label space (class labels are 0..n_classes-1)
+            use_flat_engine: Merge the members into one compiled FlatForest
+            latency_budget_ms: Pooled path only; 0 waits for every member
+        """
+        if not models:
+            raise ValueError("Ensemble has no members")
+        n_features = {int(m.n_features_in_) for m in models}
+        if len(n_features) != 1:
+            raise ValueError(f"Ensemble members disagree on feature count: {sorted(n_features)}")
+
+        self.models = models
+        self.n_members = len(models)
+        self.n_classes = n_classes
+        self.n_features = n_features.pop()
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.member_trees = None  # Tree columns of each member within the merged engine
+        self.engine = self._compile(models) if use_flat_engine else None
+        self._pool = None
+        if self.engine is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.n_members, thread_name_prefix="ensemble")
+
+        # Counters
+        self.predictions = 0
+        self.members_dropped = 0  # Member results left out for missing the latency budget
+
+    def _compile(self, models: list):
+        """Compile and merge all members; None if any member fails verification."""
+        rng = np.random.default_rng(0)
+        probe = (rng.random((32, self.n_features)) < 0.05).astype(np.float32)
+        forests = []
+        for i, model in enumerate(models):
+            forest = FlatForest.from_sklearn(model)
+            if not forest.matches(model, probe):
+                logger.error(f"Flat engine differs from sklearn for ensemble member {i}, using the thread pool")
+                return None
+            forests.append(self._in_label_space(forest, model))
+
+        self.member_trees = FlatForest.tree_slices(forests)
+        engine = FlatForest.concatenate(forests)
+        logger.info(f"Ensemble compiled: {self.n_members} members, {engine.n_trees} trees, {len(engine.feature)} nodes")
+        return engine
+
+    def _in_label_space(self, forest: FlatForest, model) -> FlatForest:
+        """Widen leaf distributions to all n_classes labels (a member may not have seen every class)."""
+        labels = np.asarray(model.classes_, dtype=np.intp)
+        if len(labels) == self.n_classes and np.array_equal(labels, np.arange(self.n_classes)):
+            return forest
+        arrays = forest.to_arrays()
+        leaf_values = np.zeros((len(forest.leaf_values), self.n_classes))
+        leaf_values[:, labels] = forest.leaf_values
+        arrays["leaf_values"] = leaf_values
+        return FlatForest.from_arrays(arrays, forest.n_features, forest.max_depth)
+
+    def predict_sparse(self, indptr: np.ndarray, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+        """
+        Score binary rows given as CSR indptr/indices.
+        Returns (probabilities, votes, voters): the soft-voted class
+        probabilities, the number of members whose top class is each class,
+        and how many members took part.
+        """
+        if self.engine is not None:
+            rows = self.engine.leaf_row[self.engine.apply_sparse(indptr, indices)]
+            probas = [self.engine.leaf_proba(rows, trees) for trees in self.member_trees]
+        else:
+            probas = self._pooled_probas(indptr, indices)
+        self.predictions += len(indptr) - 1
+        return self.soft_vote(probas, self.n_classes)
+
+    @staticmethod
+    def soft_vote(probas: list, n_classes: int) -> tuple[np.ndarray, np.ndarray, int]:
+        """Combine member probabilities into (mean probabilities, top-class votes, voters)."""
+        n_rows = len(probas[0])
+        votes = np.zeros((n_rows, n_classes), dtype=np.int32)
+        for proba in probas:
+            votes[np.arange(n_rows), proba.argmax(axis=1)] += 1
+        return np.mean(probas, axis=0), votes, len(probas)
+
+    def _pooled_probas(self, indptr: np.ndarray, indices: np.ndarray) -> list:
+        X = csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr),
+            shape=(len(indptr) - 1, self.n_features)
+        )
+        pool = self._pool
+        if pool is None:
+            # Closed (replaced by a reload) while a prediction was on its way: score inline
+            return [self._member_proba(model, X) for model in self.models]
+        futures = [pool.submit(self._member_proba, model, X) for model in self.models]
+        done, pending = wait(futures, timeout=self.latency_budget or None)
+        if not done:
+            # Never answer empty-handed: take whichever member finishes first
+            done, pending = wait(futures, return_when=FIRST_COMPLETED)
+        self.members_dropped += len(pending)
+        # Keep member order so results are reproducible when every member finishes
+        return [f.result() for f in futures if f in done]
+
+    def _member_proba(self, model, X) -> np.ndarray:
+        proba = model.predict_proba(X)
+        if proba.shape[1] == self.n_classes:
+            return proba
+        full = np.zeros((proba.shape[0], self.n_classes))
+        full[:, np.asarray(model.classes_, dtype=np.intp)] = proba
+        return full
+
+    def stats(self) -> dict:
+        return {
+            "members": self.n_members,
+            "engine": "flat" if self.engine is not None else "thread_pool",
+            "latency_budget_ms": self.latency_budget * 1000.0,
+            "predictions": self.predictions,
+            "members_dropped": self.members_dropped,
+        }
+
+    def close(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
@@ -0,0 +1,281 @@
+"""
+Flat-array inference engine for fitted sklearn RandomForest classifiers.
+All trees are compiled into stacked NumPy node arrays at load time and a
+batch is evaluated level by level with vectorized gathers, bypassing
+sklearn's per-call validation and joblib dispatch.
+"""
+import threading
+import numpy as np
+
+# Above this many gathered values, accumulate per tree instead of one big gather
+GATHER_LIMIT = 1 << 20
+# Rows per sparse evaluation chunk (size of the per-thread membership buffer)
+SCRATCH_ROWS = 256
+
+
+def _leaf_distributions(values: np.ndarray) -> np.ndarray:
+    """
+    Class distributions exactly as DecisionTreeClassifier.predict_proba returns them.
+    sklearn >= 1.4 stores fractions in tree_.value and returns them as-is; older
+    releases store (integral) weighted counts and divide by the row sum.
+    """
+    values = np.array(values, dtype=np.float64)
+    counts = np.all(values == np.floor(values), axis=1)
+    normalizer = values[counts].sum(axis=1)[:, np.newaxis]
+    normalizer[normalizer == 0.0] = 1.0
+    values[counts] /= normalizer
+    return values
+
+
+class FlatForest:
+    """
+    Node arrays for every tree, concatenated into one global node space.
+
+    Leaves point to themselves with an infinite threshold, so a fixed number
+    of traversal steps (the deepest tree's depth) lands every row on a leaf.
+    """
+    row_dtype = np.float32  # Dense input rows (see apply_row)
+
+    def __init__(self, feature, threshold, children, leaf_row, leaf_values, roots,
+                 n_features: int, max_depth: int):
+        self.feature = np.asarray(feature, dtype=np.intp)    # (n_nodes,) feature tested at node
+        self.threshold = threshold                           # (n_nodes,) float64, go left if x <= threshold
+        self.children = np.asarray(children, dtype=np.intp)  # (2 * n_nodes,) children[2 * node + go_right]
+        self.leaf_row = leaf_row                             # (n_nodes,) int32 row in leaf_values, -1 for splits
+        self.leaf_values = leaf_values                       # (n_leaves, n_classes) float64 class distribution
+        self.roots = np.asarray(roots, dtype=np.intp)        # (n_trees,) global id of each root
+        self.n_features = n_features
+        self.n_classes = leaf_values.shape[1]
+        self.n_trees = len(roots)
+        self.max_depth = max_depth
+        self._local = threading.local()
+
+    @property
+    def left(self) -> np.ndarray:
+        return self.children[0::2]
+
+    @property
+    def right(self) -> np.ndarray:
+        return self.children[1::2]
+
+    def to_arrays(self) -> dict:
+        """Node arrays by name, for serialization (see model_artifact)."""
+        return {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "children": self.children,
+            "leaf_row": self.leaf_row,
+            "leaf_values": self.leaf_values,
+            "roots": self.roots,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, n_features: int, max_depth: int) -> "FlatForest":
+        """Rebuild from to_arrays() output; arrays may be read-only memory maps."""
+        return cls(n_features=n_features, max_depth=max_depth, **arrays)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        """Compile a fitted RandomForestClassifier (single output)."""
+        n_classes = int(model.n_classes_)
+        features, thresholds, lefts, rights, leaf_rows, leaf_values, roots = [], [], [], [], [], [], []
+        node_offset = 0
+        leaf_offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            local_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, local_ids, tree.children_left) + node_offset)
+            rights.append(np.where(is_leaf, local_ids, tree.children_right) + node_offset)
+
+            rows = np.full(n_nodes, -1)
+            rows[is_leaf] = np.arange(is_leaf.sum()) + leaf_offset
+            leaf_rows.append(rows)
+
+            leaf_values.append(_leaf_distributions(tree.value[is_leaf, 0, :n_classes]))
+
+            roots.append(node_offset)
+            node_offset += n_nodes
+            leaf_offset += int(is_leaf.sum())
+            max_depth = max(max_depth, int(tree.max_depth))
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1).ravel().astype(np.intp),
+            leaf_row=np.concatenate(leaf_rows).astype(np.int32),
+            leaf_values=np.ascontiguousarray(np.concatenate(leaf_values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            n_features=int(model.n_features_in_),
+            max_depth=max_depth,
+        )
+
+    @classmethod
+    def concatenate(cls, forests: list) -> "FlatForest":
+        """
+        Merge several forests into one node space so a single traversal
+        evaluates all of them. Trees keep their order: forest i owns the
+        tree columns returned by tree_slices().
+        """
+        node_offset = 0
+        leaf_offset = 0
+        children, leaf_rows, roots = [], [], []
+        for forest in forests:
+            children.append(forest.children + node_offset)
+            rows = np.array(forest.leaf_row, dtype=np.int32)
+            rows[rows >= 0] += leaf_offset
+            leaf_rows.append(rows)
+            roots.append(forest.roots + node_offset)
+            node_offset += len(forest.feature)
+            leaf_offset += len(forest.leaf_values)
+
+        return cls(
+            feature=np.concatenate([f.feature for f in forests]),
+            threshold=np.concatenate([f.threshold for f in forests]),
+            children=np.concatenate(children),
+            leaf_row=np.concatenate(leaf_rows),
+            leaf_values=np.ascontiguousarray(np.concatenate([f.leaf_values for f in forests])),
+            roots=np.concatenate(roots),
+            n_features=forests[0].n_features,
+            max_depth=max(f.max_depth for f in forests),
+        )
+
+    @staticmethod
+    def tree_slices(forests: list) -> list:
+        """Tree column range of each input forest after concatenate()."""
+        bounds = np.cumsum([0] + [f.n_trees for f in forests])
+        return [slice(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node id reached in every tree, shape (n_samples, n_trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.shape[0] == 1:
+            return self.apply_row(X[0])[np.newaxis, :]
+
+        flat_x = X.ravel()
+        row_base = (np.arange(X.shape[0], dtype=np.int64) * X.shape[1])[:, np.newaxis]
+        nodes = np.tile(self.roots, (X.shape[0], 1))
+        for _ in range(self.max_depth):
+            go_right = flat_x[row_base + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def _step(self, x: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        """Advance nodes one level for the dense row x."""
+        return self.children[2 * nodes + (x[self.feature[nodes]] > self.threshold[nodes])]
+
+    def apply_row(self, x: np.ndarray) -> np.ndarray:
+        """Leaf node id for one dense row in every tree; 1-D gathers over the tree axis only."""
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            nodes = self._step(x, nodes)
+        return nodes
+
+    def trace_row(self, x: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Decision paths of one dense row in every tree: path, shape
+        (n_trees, max_depth + 1), holds the node at each level and ends with
+        the leaf; tested, shape (n_trees, max_depth), holds the feature
+        tested at each level, -1 once the leaf is reached.
+        """
+        path = np.empty((self.n_trees, self.max_depth + 1), dtype=np.int32)
+        nodes = self.roots
+        for depth in range(self.max_depth):
+            path[:, depth] = nodes
+            nodes = self._step(x, nodes)
+        path[:, -1] = nodes
+        levels = path[:, :-1]
+        tested = np.where(self.leaf_row[levels] < 0, self.feature[levels].astype(np.int32), -1)
+        return path, tested
+
+    def _threshold_of(self):
+        """Scalar threshold lookup by node id (go right if x > threshold)."""
+        return self.threshold.item
+
+    def retrace(self, x: np.ndarray, path: np.ndarray, tested: np.ndarray,
+                trees: np.ndarray, starts: np.ndarray):
+        """
+        Walk the given trees' paths again from their start levels, rewriting
+        their path and tested rows (see trace_row) in place. Scalar steps:
+        for a handful of short walks they beat vectorized levels, whose cost
+        is per NumPy call rather than per tree.
+        """
+        leaf_of, feature_of, child_of, x_of = self.leaf_row.item, self.feature.item, self.children.item, x.item
+        threshold_of = self._threshold_of()
+        for tree, depth in zip(trees.tolist(), starts.tolist()):
+            nodes, features = path[tree], tested[tree]
+            node = nodes.item(depth)
+            while leaf_of(node) < 0:
+                feature = feature_of(node)
+                features[depth] = feature
+                node = child_of(2 * node + (x_of(feature) > threshold_of(node)))
+                depth += 1
+                nodes[depth] = node
+            nodes[depth:] = node
+            features[depth:] = -1
+
+    def apply_sparse(self, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """
+        Leaf node ids for binary rows given in CSR form (active feature indices
+        per row). Rows are written into a reusable per-thread membership buffer
+        and cleared again afterwards, so per-request work is proportional to the
+        number of active features; no dense input is allocated.
+        """
+        n_rows = len(indptr) - 1
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.intp)
+        leaves = []
+        for start in range(0, max(n_rows, 1), SCRATCH_ROWS):
+            stop = min(start + SCRATCH_ROWS, n_rows)
+            scratch = self._scratch_rows(stop - start)
+            lo, hi = indptr[start], indptr[stop]
+            rows = np.repeat(np.arange(stop - start), np.diff(indptr[start:stop + 1]))
+            scratch[rows, indices[lo:hi]] = 1.0
+            try:
+                leaves.append(self.apply(scratch))
+            finally:
+                scratch[rows, indices[lo:hi]] = 0.0
+        return leaves[0] if len(leaves) == 1 else np.concatenate(leaves)
+
+    def _scratch_rows(self, n_rows: int) -> np.ndarray:
+        """Zeroed (n_rows, n_features) view of this thread's membership buffer."""
+        buffer = getattr(self._local, "scratch", None)
+        if buffer is None:
+            buffer = np.zeros((SCRATCH_ROWS, self.n_features), dtype=np.float32)
+            self._local.scratch = buffer
+        return buffer[:n_rows]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Mean of per-tree class distributions, matching RandomForestClassifier.predict_proba."""
+        return self.leaf_proba(self.leaf_row[self.apply(X)])
+
+    def predict_proba_sparse(self, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """predict_proba for binary rows given as CSR indptr/indices."""
+        return self.leaf_proba(self.leaf_row[self.apply_sparse(indptr, indices)])
+
+    def leaf_proba(self, rows: np.ndarray, trees: slice = None) -> np.ndarray:
+        """
+        Average the leaf_values rows of shape (n_samples, n_trees), tree by tree
+        like sklearn. trees restricts the average to a range of tree columns.
+        """
+        if trees is not None:
+            rows = rows[:, trees]
+        if rows.size * self.n_classes <= GATHER_LIMIT:
+            # Summing over the tree axis accumulates in tree order
+            proba = self.leaf_values[rows].sum(axis=1)
+        else:
+            proba = np.zeros((rows.shape[0], self.n_classes))
+            for t in range(rows.shape[1]):
+                proba += self.leaf_values[rows[:, t]]
+        proba /= rows.shape[1]
+        return proba
+
+    def matches(self, model, X: np.ndarray) -> bool:
+        """Check the compiled forest against sklearn on a probe batch."""
+        return bool(np.allclose(self.predict_proba(X), model.predict_proba(X), rtol=0.0, atol=1e-12))
@@ -0,0 +1,70 @@
+"""
+Incremental re-scoring of one patient's symptom set during follow-up Q&A.
+
+A session keeps its dense feature row, the leaf every tree reached and
+the features tested along each tree's decision path. When answers add or
+remove symptoms, a tree can only land on a different leaf if its current
+path tests a flipped feature, and only from the first level that tests
+one; every other leaf assignment is reused. Probabilities are then averaged
+from the leaves exactly as a full prediction does, so results are
+identical to predict_proba.
+"""
+import threading
+import numpy as np
+from ensemble_engine import ForestEnsemble
+from forest_engine import FlatForest
+
+# Above this share of affected trees, one vectorized trace beats per-tree scalar walks
+RETRACE_FRACTION = 0.25
+
+
+class ScoringSession:
+    def __init__(self, engine: FlatForest, indices: np.ndarray, member_trees: list = None):
+        """
+        Args:
+            engine: Compiled forest (FlatForest, CompactForest or a merged ensemble)
+            indices: Active feature indices to start from
+            member_trees: Tree columns of each ensemble member; None for a single forest
+        """
+        self.engine = engine
+        self.member_trees = member_trees
+        self.row = np.zeros(engine.n_features, dtype=engine.row_dtype)
+        self.row[np.asarray(indices, dtype=np.intp)] = 1
+        self.features = set(np.asarray(indices).tolist())
+        # Per-tree node at each level and feature tested there (see FlatForest.trace_row)
+        self.path, self.tested = engine.trace_row(self.row)
+        self._flipped = np.zeros(engine.n_features + 1, dtype=bool)  # Last slot absorbs tested == -1
+        self._lock = threading.Lock()
+
+        # Counters
+        self.updates = 0
+        self.trees_rescored = 0
+
+    def set_features(self, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+        """
+        Move the session to a new feature set and score it.
+        Returns (probabilities, votes, voters) for one row, as ModelBundle.predict does.
+        """
+        target = set(np.asarray(indices).tolist())
+        with self._lock:
+            flipped = np.array(sorted(target ^ self.features), dtype=np.intp)
+            if len(flipped):
+                self.row[flipped] = 1 - self.row[flipped]
+                self._flipped[flipped] = True
+                hits = self._flipped[self.tested]  # (n_trees, max_depth)
+                self._flipped[flipped] = False
+                trees = np.flatnonzero(hits.any(axis=1))
+                if len(trees) > RETRACE_FRACTION * self.engine.n_trees:
+                    self.path, self.tested = self.engine.trace_row(self.row)
+                elif len(trees):
+                    # Levels above the first flipped test are unchanged; walk on from there
+                    self.engine.retrace(self.row, self.path, self.tested, trees, hits[trees].argmax(axis=1))
+                self.features = target
+                self.updates += 1
+                self.trees_rescored += len(trees)
+            leaf_rows = self.engine.leaf_row[self.path[:, -1]][np.newaxis, :]
+
+        if self.member_trees is None:
+            return self.engine.leaf_proba(leaf_rows), None, 1
+        probas = [self.engine.leaf_proba(leaf_rows, trees) for trees in self.member_trees]
+        return ForestEnsemble.soft_vote(probas, self.engine.n_classes)
@@ -0,0 +1,98 @@
+"""
+Incremental field parser for a JSON object arriving in chunks.
+Feeds the streamed text of an LLM report and returns each top-level string
+field as soon as its closing quote arrives, so callers can forward the
+report piece by piece instead of waiting for the whole object. Text around
+the object (markdown fences, chatter) is ignored; nested values are skipped
+and left to the full parse at the end.
+
+parse_object() is the tolerant full parse: the outermost object even with
+prose around it or trailing commas, or failing that the string fields the
+field parser can recover from truncated or malformed output.
+"""
+import json
+import re
+from typing import Dict, List, Tuple
+
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class JSONFieldStream:
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expecting = "key"  # At depth 1: "key" or "value"
+        self.key = None
+        self._role = None  # Role of the string being read: "key", "value" or None (nested/ignored)
+        self._buf: List[str] = []
+        self.fields = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk; returns the (key, value) string fields it completed."""
+        done = []
+        for ch in chunk:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self._end_string(done)
+                    continue
+                if self._role:
+                    self._buf.append(ch)
+            elif ch == '"':
+                self.in_string = True
+                self._buf = []
+                if self.depth == 1:
+                    self._role = self.expecting
+                else:
+                    self._role = None
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth = max(0, self.depth - 1)
+            elif self.depth == 1 and ch == ":":
+                self.expecting = "value"
+            elif self.depth == 1 and ch == ",":
+                self.expecting = "key"
+        return done
+
+    def _end_string(self, done: list):
+        raw = "".join(self._buf)
+        try:
+            text = json.loads(f'"{raw}"')
+        except ValueError:
+            text = raw
+        if self._role == "key":
+            self.key = text
+        elif self._role == "value" and self.key is not None and self.key not in self.fields:
+            self.fields[self.key] = text
+            done.append((self.key, text))
+        self._role = None
+
+
+def parse_object(text: str) -> Tuple[Dict, bool]:
+    """
+    (fields, complete) from LLM output expected to hold one JSON object.
+    complete is False when only string fields could be recovered; fields
+    is empty when nothing could.
+    """
+    start = text.find("{")
+    if start < 0:
+        return {}, False
+    end = text.rfind("}")
+    if end > start:
+        candidate = text[start:end + 1]
+        for attempt in (candidate, TRAILING_COMMA.sub(r"\1", candidate)):
+            try:
+                value = json.loads(attempt)
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                return value, True
+    stream = JSONFieldStream()
+    stream.feed(text[start:])
+    return dict(stream.fields), False
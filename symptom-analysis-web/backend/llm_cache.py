@@ -0,0 +1,194 @@
+"""
+Cache for generated LLM reports.
+An in-memory LRU answers repeats in microseconds; an optional SQLite file
+keeps entries across restarts and is read on a memory miss. Keys hash the
+model, the prompt template version, the canonical symptom set, the ranked
+diseases and the Q&A answers, so any change to what the prompt would say
+yields a new key.
+"""
+import copy
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from symptom_resolver import normalize_symptom
+
+
+@functools.lru_cache(maxsize=None)
+def template_version(func) -> str:
+    """Short hash of a prompt-building method's bytecode and constants (its prompt text)."""
+    digest = hashlib.sha256()
+
+    def feed(code):
+        digest.update(code.co_code)
+        for const in code.co_consts:
+            # Nested code objects (comprehensions) are hashed by content; their repr holds an address
+            if hasattr(const, "co_code"):
+                feed(const)
+            else:
+                digest.update(repr(const).encode())
+
+    feed(func.__code__)
+    return digest.hexdigest()[:12]
+
+
+def make_key(kind: str, model: str, version: str, symptoms: Iterable[str],
+             top_diseases: List[Dict], qa_history: Iterable[Dict] = ()) -> str:
+    """
+    Cache key for one report request.
+    Symptoms are order-insensitive; disease order and Q&A order matter.
+    Probabilities are rounded to the precision the prompts show.
+    """
+    payload = {
+        "kind": kind,
+        "model": model,
+        "version": version,
+        "symptoms": sorted({normalize_symptom(s) for s in symptoms}),
+        "diseases": [
+            [str(d.get("name", "")), round(float(d.get("probability", d.get("score", 0)) or 0), 1)]
+            for d in top_diseases
+        ],
+        "qa": [
+            [str(qa.get("question", "")).strip(), str(qa.get("answer", "")).strip().lower()]
+            for qa in qa_history
+        ],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class ReportCache:
+    def __init__(self, max_size: int = 2048, ttl_seconds: float = 86400,
+                 db_path: Optional[str] = None, db_max_entries: int = 100000):
+        """
+        Args:
+            max_size: Entries kept in memory; 0 disables the cache
+            ttl_seconds: Entry lifetime; 0 means entries never expire
+            db_path: SQLite file for persistence; None keeps entries in memory only
+            db_max_entries: Rows kept on disk; the oldest are pruned beyond this
+        """
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.db_path = db_path
+        self.db_max_entries = db_max_entries
+        self._entries: OrderedDict = OrderedDict()  # key -> (stored_at, report)
+        self._lock = threading.Lock()
+        self._db = None
+        if self.enabled and db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS reports (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, report TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS reports_stored_at ON reports (stored_at)")
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return bool(self.ttl) and now - stored_at > self.ttl
+
+    def _remember(self, key: str, stored_at: float, report: dict):
+        self._entries[key] = (stored_at, report)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[dict]:
+        """A copy of the cached report, or None."""
+        if not self.enabled:
+            return None
+        now = time.time()  # Wall clock, so TTLs hold across restarts
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(entry[1])
+                del self._entries[key]
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute("SELECT stored_at, report FROM reports WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[0], now):
+                        report = json.loads(row[1])
+                        self._remember(key, row[0], report)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return copy.deepcopy(report)
+                    self._db.execute("DELETE FROM reports WHERE key = ?", (key,))
+                    self.expirations += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, report: dict):
+        if not self.enabled:
+            return
+        stored_at = time.time()
+        report = copy.deepcopy(report)
+        with self._lock:
+            self._remember(key, stored_at, report)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO reports (key, stored_at, report) VALUES (?, ?, ?)",
+                    (key, stored_at, json.dumps(report)),
+                )
+                self.writes += 1
+                # Prune in batches rather than on every write
+                if self.writes % 256 == 0:
+                    self._prune()
+
+    def _prune(self):
+        if self.ttl:
+            self._db.execute("DELETE FROM reports WHERE stored_at < ?", (time.time() - self.ttl,))
+        self._db.execute(
+            "DELETE FROM reports WHERE key IN (SELECT key FROM reports ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.db_max_entries,),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM reports")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            disk_size = self._db.execute("SELECT COUNT(*) FROM reports").fetchone()[0] if self._db is not None else 0
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "persistent": self._db is not None,
+            "disk_size": disk_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,113 @@
+"""
+Latency tracking and circuit breaking for LLM calls.
+LatencyTracker keeps a rolling window of primary-model latencies for one
+kind of call; its high percentile is how long a call may run before a hedged
+request goes to the fallback model. CircuitBreaker counts consecutive
+primary failures (errors, deadline hits; not calls that merely lost the
+race to a hedge) and, once open, sends traffic straight to the fallback
+until a trial call succeeds.
+"""
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+class LatencyTracker:
+    def __init__(self, percentile: float = 95, window: int = 256, min_samples: int = 20,
+                 default_delay: float = 2.0, min_delay: float = 0.25):
+        """
+        Args:
+            percentile: Latency percentile used as the hedge delay
+            window: Number of recent samples kept
+            min_samples: Samples needed before the percentile is trusted
+            default_delay: Hedge delay until then
+            min_delay: Lower bound, so a fast provider does not get every call hedged
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    def hedge_delay(self) -> float:
+        q = self.quantile()
+        return self.default_delay if q is None else max(self.min_delay, q)
+
+    def stats(self) -> dict:
+        q = self.quantile()
+        return {
+            "samples": len(self._samples),
+            f"p{self.percentile:g}_seconds": round(q, 3) if q is not None else None,
+            "hedge_delay_seconds": round(self.hedge_delay(), 3),
+        }
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit; 0 disables it
+            reset_timeout: Seconds open before a trial call is let through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_at = 0.0
+        self._lock = threading.Lock()
+
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the primary model now."""
+        if not self.failure_threshold:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            # One trial at a time; another is allowed if the last one never reported back
+            if self.state == self.HALF_OPEN and now - self._trial_at >= self.reset_timeout:
+                self._trial_at = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success: bool):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            if success:
+                self.failures = 0
+                self.state = self.CLOSED
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.times_opened += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": bool(self.failure_threshold),
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
@@ -1,53 +1,418 @@
-
 import os
-import json
-from typing import List, Dict
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+import httpx
 from dotenv import load_dotenv
-from groq import Groq
+from groq import APITimeoutError, AsyncGroq
+from json_stream import JSONFieldStream, parse_object
+from llm_cache import ReportCache, make_key, template_version
+from llm_resilience import CircuitBreaker, LatencyTracker
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize Groq client
-client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-
 # Default model - Llama 3.3 70B for high quality responses
 DEFAULT_MODEL = "llama-3.3-70b-versatile"
+# Smaller, faster model for hedged requests and while the primary is failing
+FALLBACK_MODEL = "llama-3.1-8b-instant"
+
+# Seconds each kind of call may take, fallback model and retries included,
+# before the caller gives up and uses its canned fallback
+DEFAULT_DEADLINES = {
+    "default": 10.0,
+    "report": 8.0,
+    "question": 4.0,
+    "question_tree": 8.0,
+    "rephrase": 3.0,
+    "reasoning": 3.0,
+    "extract": 5.0,
+}
+
+# Completion token cap per kind of call: a little above what a good answer needs,
+# so a rambling reply is cut short instead of running to the old 1024
+DEFAULT_MAX_TOKENS = {
+    "default": 1024,
+    "report": 384,
+    "question": 96,
+    "question_tree": 512,
+    "rephrase": 96,
+    "reasoning": 160,
+    "extract": 256,
+}
+
+# Calls that answer with a JSON object use the provider's JSON mode
+JSON_METHODS = {"report", "question_tree", "extract"}
+
+# Depth of the follow-up question tree: one question per Q&A round
+QUESTION_TREE_DEPTH = 3
+
+class Completion(NamedTuple):
+    text: str
+    model: str  # Model that wrote it (primary or fallback)
+    tokens: int  # Completion tokens billed
+
 
 class LLMService:
-    def __init__(self, model: str = None):
+    def __init__(self, model: str = None, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 max_concurrency: int = 64, max_connections: int = 100, max_retries: int = 2,
+                 cache: ReportCache = None, fallback_model: Optional[str] = FALLBACK_MODEL,
+                 deadlines: Dict[str, float] = None, hedge_percentile: float = 95,
+                 breaker_failures: int = 5, breaker_reset: float = 30.0, parse_retries: int = 1):
+        """
+        Args:
+            model: Groq model name
+            connect_timeout: Seconds to establish a connection to the API
+            read_timeout: Seconds to wait for response data
+            max_concurrency: Completions in flight at once; further calls wait their turn
+            max_connections: Size of the keep-alive connection pool
+            max_retries: Client-level retries on connection errors and 429/5xx
+            cache: Report cache; None disables caching
+            fallback_model: Faster model for hedged requests and an open circuit; None disables both
+            deadlines: Per-method seconds (keys of DEFAULT_DEADLINES) overriding the defaults
+            hedge_percentile: Primary latency percentile (per method) after which a hedged request is sent
+            breaker_failures: Consecutive primary failures that open the circuit; 0 disables it
+            breaker_reset: Seconds the circuit stays open before a trial call
+            parse_retries: Extra attempts when a JSON reply yields no usable fields
+        """
         self.model = model or DEFAULT_MODEL
-
-    def _chat_completion(self, prompt: str, system_prompt: str = None) -> str:
-        """Helper method to call Groq chat completion API"""
+        self.fallback_model = fallback_model or None
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.deadlines = dict(DEFAULT_DEADLINES, **(deadlines or {}))
+        self.parse_retries = parse_retries
+        self.hedge_percentile = hedge_percentile
+        self.latency: Dict[str, LatencyTracker] = {}  # Per method: a question and a report take very different times
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        # Created per service instance so importing this module has no side effects.
+        # One pooled HTTP client: calls reuse keep-alive connections instead of new TLS handshakes.
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                                keepalive_expiry=60.0),
+        )
+        self.client = AsyncGroq(api_key=os.environ.get("GROQ_API_KEY"), http_client=self.http_client,
+                                max_retries=max_retries)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        
+        # Counters
+        self.calls = 0
+        self.streams = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self.fallback_calls = 0
+        self.deadlines_exceeded = 0
+        self.completion_tokens = 0
+        self.parsed = 0
+        self.parse_recovered = 0  # Fields salvaged from truncated or malformed JSON
+        self.parse_failures = 0
+        self.parse_retries_used = 0
+        self.wasted_tokens = 0  # Completion tokens of replies thrown away
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Hold one of the max_concurrency completion slots and count the call."""
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.calls += 1
+        try:
+            yield
+        except Exception as e:
+            self.errors += 1
+            if isinstance(e, APITimeoutError):
+                self.timeouts += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def _messages(self, prompt: str, system_prompt: str = None) -> List[Dict]:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
-        
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0.5,
-            max_tokens=1024,
-        )
-        return response.choices[0].message.content
-
-    def _clean_json_response(self, text: str) -> str:
-        """Clean markdown code blocks from JSON response"""
-        text = text.strip()
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.startswith("```"):
-            text = text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
-        return text.strip()
+        return messages
+
+    async def _create(self, model: str, messages: List[Dict], method: str) -> Completion:
+        options = {"response_format": {"type": "json_object"}} if method in JSON_METHODS else {}
+        async with self._slot():
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.5,
+                max_tokens=DEFAULT_MAX_TOKENS.get(method, DEFAULT_MAX_TOKENS["default"]),
+                **options,
+            )
+            tokens = response.usage.completion_tokens if response.usage else 0
+            self.completion_tokens += tokens
+            return Completion(response.choices[0].message.content or "", model, tokens)
+
+    async def _complete(self, prompt: str, system_prompt: str = None, method: str = "default") -> Completion:
+        """
+        One completion within the method's deadline (asyncio.TimeoutError past it)
+        and token cap, in JSON mode for JSON_METHODS. The primary model is
+        hedged with the fallback model once it runs past its usual latency;
+        while the circuit is open the fallback model is used directly.
+        """
+        messages = self._messages(prompt, system_prompt)
+        deadline = self.deadlines.get(method, self.deadlines["default"])
+        if not self.fallback_model:
+            call = self._create(self.model, messages, method)
+        elif not self.breaker.allow():
+            self.fallback_calls += 1
+            call = self._create(self.fallback_model, messages, method)
+        else:
+            call = self._hedged(messages, deadline, method)
+        # wait_for rather than asyncio.timeout(), which needs Python 3.11
+        try:
+            return await asyncio.wait_for(call, deadline)
+        except asyncio.TimeoutError:
+            self.deadlines_exceeded += 1
+            raise asyncio.TimeoutError(f"{method} call exceeded its {deadline:g}s deadline") from None
+
+    async def _hedged(self, messages: List[Dict], deadline: float, method: str) -> Completion:
+        """
+        Race the primary model against a fallback request sent after the hedge
+        delay (or a primary failure). The primary's time is recorded even when
+        it loses or is cut off, so slow calls stay in the percentile; losing
+        the race is not a failure for the circuit breaker, erroring or running
+        into the deadline is.
+        """
+        latency = self.latency.setdefault(method, LatencyTracker(self.hedge_percentile))
+        started = time.monotonic()
+        primary = asyncio.create_task(self._create(self.model, messages, method))
+        tasks = [primary]
+        hedge_won = False
+        try:
+            # Hedge by mid-deadline at the latest, so the fallback model has time to answer
+            done, _ = await asyncio.wait([primary], timeout=min(latency.hedge_delay(), deadline / 2))
+            if primary in done and primary.exception() is None:
+                return primary.result()
+
+            # Slow or failed: race the fallback model against the primary if it is still running
+            self.hedges += 1
+            hedge = asyncio.create_task(self._create(self.fallback_model, messages, method))
+            tasks.append(hedge)
+            pending = {hedge} if primary.done() else {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in (t for t in (primary, hedge) if t in done):
+                    if task.exception() is None:
+                        if task is hedge:
+                            hedge_won = True
+                            self.hedges_won += 1
+                        return task.result()
+            raise hedge.exception()
+        finally:
+            elapsed = time.monotonic() - started
+            if not primary.done():
+                latency.record(elapsed)  # A lower bound of its latency
+                if not hedge_won:
+                    self.breaker.record(False)  # Cut off by the deadline
+            elif not primary.cancelled():
+                if primary.exception() is None:
+                    latency.record(elapsed)
+                self.breaker.record(primary.exception() is None)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # Mark as retrieved: the loser's error is expected
+
+    async def _chat_completion(self, prompt: str, system_prompt: str = None, method: str = "default") -> str:
+        """Helper method to call Groq chat completion API"""
+        return (await self._complete(prompt, system_prompt, method)).text
+
+    async def _stream_completion(self, prompt: str, system_prompt: str = None, method: str = "default",
+                                 used: Dict = None) -> AsyncIterator[str]:
+        """
+        Chat completion in streaming mode; yields text deltas as they arrive.
+        Bounded by the method's deadline (asyncio.TimeoutError) and not hedged; the
+        fallback model is used while the circuit is open. The model used is
+        stored in used["model"].
+        """
+        limit = self.deadlines.get(method, self.deadlines["default"])
+        deadline = time.monotonic() + limit
+        primary = not self.fallback_model or self.breaker.allow()
+        model = self.model if primary else self.fallback_model
+        if used is not None:
+            used["model"] = model
+        if not primary:
+            self.fallback_calls += 1
+        outcome = None
+        try:
+            async with self._slot():
+                self.streams += 1
+                stream = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=model,
+                        messages=self._messages(prompt, system_prompt),
+                        temperature=0.5,
+                        max_tokens=DEFAULT_MAX_TOKENS.get(method, DEFAULT_MAX_TOKENS["default"]),
+                        stream=True,
+                    ),
+                    max(0.0, deadline - time.monotonic())
+                )
+                chunks = stream.__aiter__()
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+                        except StopAsyncIteration:
+                            break
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            yield delta
+                finally:
+                    await stream.close()
+            outcome = True
+        except Exception as e:
+            outcome = False
+            # asyncio.TimeoutError: a distinct class from the builtin TimeoutError before Python 3.11
+            if isinstance(e, asyncio.TimeoutError):
+                self.deadlines_exceeded += 1
+                raise asyncio.TimeoutError(f"streamed {method} call exceeded its {limit:g}s deadline") from None
+            raise
+        finally:
+            # A stream abandoned by its reader says nothing about the provider
+            if primary and self.fallback_model and outcome is not None:
+                self.breaker.record(outcome)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "fallback_model": self.fallback_model,
+            "calls": self.calls,
+            "streams": self.streams,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+            "fallback_calls": self.fallback_calls,
+            "deadlines_exceeded": self.deadlines_exceeded,
+            "completion_tokens": self.completion_tokens,
+            "json": {
+                "parsed": self.parsed,
+                "recovered": self.parse_recovered,
+                "failures": self.parse_failures,
+                "failure_rate": self.parse_failures / max(1, self.parsed + self.parse_recovered + self.parse_failures),
+                "retries": self.parse_retries_used,
+                "wasted_tokens": self.wasted_tokens,
+            },
+            "deadlines_seconds": self.deadlines,
+            "latency": {method: tracker.stats() for method, tracker in self.latency.items()},
+            "circuit": self.breaker.stats(),
+        }
+
+    async def aclose(self):
+        """Close pooled connections (app shutdown)."""
+        await self.http_client.aclose()
+        if self.cache:
+            self.cache.close()
+
+    def _report_key(self, prompt_builder, symptoms: List[str], top_diseases: List[Dict], qa_history: List[Dict] = ()) -> str:
+        """Cache key; the prompt builder's code versions the key, so editing a prompt invalidates old reports."""
+        return make_key(prompt_builder.__name__, self.model, template_version(prompt_builder),
+                        symptoms, top_diseases, qa_history)
+
+    def _parse_json(self, text: str, tokens: int) -> Tuple[Dict, bool]:
+        """parse_object() with the outcome counted; tokens of an unusable reply are counted as wasted."""
+        fields, complete = parse_object(text)
+        if complete:
+            self.parsed += 1
+        elif fields:
+            self.parse_recovered += 1
+        else:
+            self.parse_failures += 1
+            self.wasted_tokens += tokens
+        return fields, complete
+
+    def _finish_report(self, fields: Dict, forced: Dict, fallback: Dict) -> dict:
+        """Report from parsed fields: the fields the ML result dictates win, missing ones come from the fallback."""
+        result = {**fallback, **fields, **forced}
+        # Ensure triage_level exists
+        if not result.get('triage_level'):
+            result['triage_level'] = 'minimal'
+        return result
+
+    async def _report(self, key: str, prompts: tuple, forced: Dict, fallback: Dict, label: str) -> dict:
+        """Cached report, else a completion parsed into a report (fallback on failure)."""
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        for attempt in range(self.parse_retries + 1):
+            try:
+                completion = await self._complete(*prompts, method="report")
+            except Exception as e:
+                print(f"Groq LLM Error in {label}: {e}")
+                return fallback
+            fields, complete = self._parse_json(completion.text, completion.tokens)
+            if fields:
+                result = self._finish_report(fields, forced, fallback)
+                # Only complete reports from the primary model are cached
+                if self.cache and complete and completion.model == self.model:
+                    self.cache.put(key, result)
+                return result
+            if attempt < self.parse_retries:
+                self.parse_retries_used += 1
+        print(f"Groq LLM Error in {label}: no JSON in the reply")
+        return fallback
+
+    async def _stream_report(self, key: str, prompts: tuple, forced: Dict, fallback: Dict,
+                             label: str) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Streaming counterpart of _report. Yields (field, value) pairs: the
+        forced fields at once, then each string field of the LLM's JSON as
+        soon as it is complete, and finally ("report", full report).
+        """
+        for name, value in forced.items():
+            yield name, value
+        cached = self.cache.get(key) if self.cache else None
+        if cached is not None:
+            for name, value in cached.items():
+                if name not in forced:
+                    yield name, value
+            yield "report", cached
+            return
+
+        fields = JSONFieldStream()
+        chunks = []
+        used = {}
+        finished = False
+        try:
+            async for delta in self._stream_completion(*prompts, method="report", used=used):
+                chunks.append(delta)
+                for name, value in fields.feed(delta):
+                    if name not in forced:
+                        yield name, value
+            finished = True
+        except Exception as e:
+            print(f"Groq LLM Error in streamed {label}: {e}")
+        # Whatever arrived is kept, even from a stream cut off mid-report
+        text = "".join(chunks)
+        parsed, complete = self._parse_json(text, len(text) // 4)  # Streams report no usage; ~4 chars a token
+        result = self._finish_report(parsed, forced, fallback)
+        if self.cache and finished and complete and used.get("model") == self.model:
+            self.cache.put(key, result)
+        yield "report", result
 
     # ===== HIGH CONFIDENCE (≥70%) - Direct Report =====
     
-    def generate_comprehensive_report(self, symptoms: List[str], top_diseases: List[Dict]) -> dict:
-        """Generate a comprehensive diagnosis report when ML confidence is high (≥70%)"""
+    def _comprehensive_prompt(self, symptoms: List[str], top_diseases: List[Dict]) -> tuple:
+        """(prompt, system_prompt) for the high-confidence report."""
         
         # Get the top disease name for strict enforcement
         top_disease_name = top_diseases[0]['name'] if top_diseases else "Unknown"
@@ -62,6 +427,7 @@ class LLMService:
 You are NOT allowed to suggest any disease outside the provided ML predictions.
 Always respond with valid JSON only."""
 
+        # Field order matters when streaming: disease and triage level reach the client first
         prompt = f"""Generate a diagnosis report for the #1 ranked ML prediction.
 
 PATIENT SYMPTOMS: {', '.join(symptoms)}
@@ -80,43 +446,81 @@ TRIAGE LEVELS (choose one based on condition severity):
 Generate a JSON report:
 {{
     "disease": "{top_disease_name}",
+    "triage_level": "immediate/delayed/minimal/expectant",
     "confidence": "High",
     "specialist": "Type of specialist",
     "reasoning": "2-3 sentence explanation",
-    "advice": "Actionable next steps",
-    "triage_level": "immediate/delayed/minimal/expectant"
+    "advice": "Actionable next steps"
 }}
 
 Return ONLY valid JSON."""
+        return prompt, system_prompt
+
+    def _comprehensive_fallback(self, top_disease_name: str) -> dict:
+        return {
+            "disease": top_disease_name,
+            "confidence": "High",
+            "specialist": "General Physician",
+            "reasoning": f"Based on ML prediction for {top_disease_name}. Please consult a healthcare professional.",
+            "advice": "Schedule an appointment with a doctor for proper evaluation.",
+            "triage_level": "minimal"
+        }
+
+    async def generate_comprehensive_report(self, symptoms: List[str], top_diseases: List[Dict]) -> dict:
+        """Generate a comprehensive diagnosis report when ML confidence is high (≥70%)"""
+        top_disease_name = top_diseases[0]['name'] if top_diseases else "Unknown"
+        return await self._report(
+            self._report_key(LLMService._comprehensive_prompt, symptoms, top_diseases),
+            self._comprehensive_prompt(symptoms, top_diseases),
+            # Force the disease name to be from ML predictions
+            {"disease": top_disease_name},
+            self._comprehensive_fallback(top_disease_name),
+            "comprehensive report"
+        )
 
+    def stream_comprehensive_report(self, symptoms: List[str], top_diseases: List[Dict]) -> AsyncIterator[Tuple[str, object]]:
+        """generate_comprehensive_report as a stream of (field, value) pairs, ending with ("report", report)"""
+        top_disease_name = top_diseases[0]['name'] if top_diseases else "Unknown"
+        return self._stream_report(
+            self._report_key(LLMService._comprehensive_prompt, symptoms, top_diseases),
+            self._comprehensive_prompt(symptoms, top_diseases),
+            {"disease": top_disease_name},
+            self._comprehensive_fallback(top_disease_name),
+            "comprehensive report"
+        )
+
+    def _reasoning_prompt(self, symptoms: List[str], disease: str) -> str:
+        return f"""In 2 short sentences, explain to the patient why these symptoms point to {disease}.
+Do not suggest any other condition. Do not give advice.
+
+Patient symptoms: {', '.join(symptoms)}
+
+Return ONLY the explanation text."""
+
+    async def personalize_reasoning(self, symptoms: List[str], report: Dict) -> str:
+        """Short patient-specific reasoning for a library report; the report's own reasoning on failure."""
+        key = self._report_key(LLMService._reasoning_prompt, symptoms, [{"name": report["disease"]}])
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached["reasoning"]
         try:
-            text = self._chat_completion(prompt, system_prompt)
-            text = self._clean_json_response(text)
-            result = json.loads(text)
-            # Force the disease name to be from ML predictions
-            result['disease'] = top_disease_name
-            # Ensure triage_level exists
-            if 'triage_level' not in result:
-                result['triage_level'] = 'minimal'
-            return result
+            completion = await self._complete(self._reasoning_prompt(symptoms, report["disease"]), method="reasoning")
+            reasoning = completion.text.strip().strip('"')
+            if not reasoning:
+                return report["reasoning"]
+            if self.cache and completion.model == self.model:
+                self.cache.put(key, {"reasoning": reasoning})
+            return reasoning
         except Exception as e:
-            print(f"Groq LLM Error in comprehensive report: {e}")
-            return {
-                "disease": top_disease_name,
-                "confidence": "High",
-                "specialist": "General Physician",
-                "reasoning": f"Based on ML prediction for {top_disease_name}. Please consult a healthcare professional.",
-                "advice": "Schedule an appointment with a doctor for proper evaluation.",
-                "triage_level": "minimal"
-            }
+            print(f"Groq LLM Error personalizing reasoning: {e}")
+            return report["reasoning"]
 
     # ===== LOW CONFIDENCE (<70%) - Iterative Questions =====
     
-    def generate_single_question(self, symptoms: List[str], top_diseases: List[Dict], 
-                                  qa_history: List[Dict], question_number: int) -> str:
-        """
-        Generate a single diagnostic question to narrow down between ML's top 3 diseases.
-        """
+    def _question_prompt(self, symptoms: List[str], top_diseases: List[Dict], 
+                         qa_history: List[Dict], question_number: int) -> tuple:
+        """(prompt, system_prompt) for one follow-up question."""
         
         # Extract disease names for reference
         disease_names = [d['name'] for d in top_diseases]
@@ -158,29 +562,146 @@ QUESTION {question_number} of 3:
 {"Ask about a symptom that is common in one condition but rare in the others." if question_number == 1 else "Based on previous answers, ask about a distinguishing feature between remaining candidates." if question_number == 2 else "Ask the decisive question to pick the single most likely condition from the 3 options."}
 
 Return ONLY the question text. No numbering, no prefix."""
+        return prompt, system_prompt
+
+    def _fallback_question(self, question_number: int) -> str:
+        fallback_questions = [
+            "Has this condition lasted more than a week?",
+            "Is the symptom getting progressively worse?",
+            "Have you experienced this condition before?"
+        ]
+        return fallback_questions[min(question_number - 1, 2)]
 
+    async def generate_single_question(self, symptoms: List[str], top_diseases: List[Dict], 
+                                  qa_history: List[Dict], question_number: int) -> str:
+        """
+        Generate a single diagnostic question to narrow down between ML's top 3 diseases.
+        """
         try:
-            question = self._chat_completion(prompt, system_prompt)
+            question = await self._chat_completion(
+                *self._question_prompt(symptoms, top_diseases, qa_history, question_number), method="question"
+            )
             return question.strip().strip('"')
         except Exception as e:
             print(f"Groq LLM Error generating question: {e}")
-            fallback_questions = [
-                "Has this condition lasted more than a week?",
-                "Is the symptom getting progressively worse?",
-                "Have you experienced this condition before?"
-            ]
-            return fallback_questions[min(question_number - 1, 2)]
-
-    def generate_final_narrowed_report(self, symptoms: List[str], top_diseases: List[Dict], 
-                                        qa_history: List[Dict]) -> dict:
+            return self._fallback_question(question_number)
+
+    async def stream_single_question(self, symptoms: List[str], top_diseases: List[Dict],
+                                     qa_history: List[Dict], question_number: int) -> AsyncIterator[Tuple[str, str]]:
         """
-        Generate final diagnosis report after 3 Q&A rounds.
-        ALWAYS uses ML's #1 prediction to match the progress bar display.
+        generate_single_question as a stream: ("token", text delta) pairs,
+        then ("question", cleaned question). A failure mid-stream still ends
+        with the fallback question.
         """
+        chunks = []
+        try:
+            async for delta in self._stream_completion(
+                *self._question_prompt(symptoms, top_diseases, qa_history, question_number), method="question"
+            ):
+                chunks.append(delta)
+                yield "token", delta
+            question = "".join(chunks).strip().strip('"')
+        except Exception as e:
+            print(f"Groq LLM Error streaming question: {e}")
+            question = ""
+        yield "question", question or self._fallback_question(question_number)
+
+    def _question_tree_prompt(self, disease_names: List[str]) -> tuple:
+        """(prompt, system_prompt) for a yes/no question tree over the candidate diseases."""
+        candidates = "\n".join([f"{i+1}. {name}" for i, name in enumerate(disease_names)])
+
+        system_prompt = f"""You are a medical diagnostician. Your ONLY goal is to determine which of these conditions is most likely:
+{candidates}
+
+You must ask questions that DIFFERENTIATE between ONLY these options.
+Do NOT consider any other diseases.
+Always respond with valid JSON only."""
+
+        prompt = f"""Plan 3 rounds of yes/no questions that narrow the ML predictions down to ONE condition.
+
+ML's TOP PREDICTIONS:
+{candidates}
+
+Build a decision tree: the first question, then for each answer ("yes"/"no") the next question,
+and for each of those answers the third question. Each later question must take the earlier answers into account.
+
+Return ONLY this JSON (7 questions in total):
+{{
+    "question": "Question 1",
+    "yes": {{
+        "question": "Question 2 if yes",
+        "yes": {{"question": "Question 3"}},
+        "no": {{"question": "Question 3"}}
+    }},
+    "no": {{
+        "question": "Question 2 if no",
+        "yes": {{"question": "Question 3"}},
+        "no": {{"question": "Question 3"}}
+    }}
+}}"""
+        return prompt, system_prompt
+
+    def _clean_tree(self, node, depth: int) -> Optional[dict]:
+        """The tree reduced to question/yes/no keys, or None if a question is missing."""
+        if not isinstance(node, dict) or not isinstance(node.get("question"), str) or not node["question"].strip():
+            return None
+        clean = {"question": node["question"].strip().strip('"')}
+        if depth > 1:
+            for branch in ("yes", "no"):
+                child = self._clean_tree(node.get(branch), depth - 1)
+                if child is None:
+                    return None
+                clean[branch] = child
+        return clean
+
+    async def generate_question_tree(self, top_diseases: List[Dict]) -> Optional[dict]:
+        """
+        All follow-up questions in one call: a depth-3 yes/no tree
+        {"question", "yes": {...}, "no": {...}} over the top 3 diseases.
+        Cached per disease triple. Returns None on failure.
+        """
+        disease_names = [d['name'] for d in top_diseases[:3]]
+        key = self._report_key(LLMService._question_tree_prompt, [], [{"name": name} for name in disease_names])
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        try:
+            completion = await self._complete(*self._question_tree_prompt(disease_names), method="question_tree")
+            tree = self._clean_tree(self._parse_json(completion.text, completion.tokens)[0], QUESTION_TREE_DEPTH)
+            if tree is None:
+                self.wasted_tokens += completion.tokens
+                raise ValueError("incomplete question tree")
+            if self.cache and completion.model == self.model:
+                self.cache.put(key, tree)
+            return tree
+        except Exception as e:
+            print(f"Groq LLM Error generating question tree: {e}")
+            return None
+
+    async def rephrase_question(self, question: str, symptoms: List[str]) -> str:
+        """Reword a templated yes/no question naturally; returns it unchanged on failure."""
+        prompt = f"""Rewrite this yes/no question for a patient so it sounds natural and clear.
+Keep the same meaning and keep it answerable with yes or no.
+
+Patient symptoms: {', '.join(symptoms)}
+Question: {question}
+
+Return ONLY the question text."""
+
+        try:
+            rephrased = await self._chat_completion(prompt, method="rephrase")
+            return rephrased.strip().strip('"') or question
+        except Exception as e:
+            print(f"Groq LLM Error rephrasing question: {e}")
+            return question
+
+    def _narrowed_prompt(self, symptoms: List[str], top_diseases: List[Dict], qa_history: List[Dict]) -> tuple:
+        """(prompt, system_prompt) for the report after the Q&A rounds."""
         
         # ALWAYS use ML's top prediction
         final_disease = top_diseases[0]['name'] if top_diseases else "Unable to determine"
-        other_diseases = [d['name'] for d in top_diseases[1:]] if len(top_diseases) > 1 else []
         
         # Format Q&A for context
         qa_text = "; ".join([
@@ -206,48 +727,82 @@ TRIAGE LEVELS (choose based on severity):
 Generate a SHORT report:
 {{
     "disease": "{final_disease}",
+    "triage_level": "immediate/delayed/minimal/expectant",
     "confidence": "Moderate",
     "specialist": "Specialist type",
     "reasoning": "1-2 sentences explaining match",
-    "advice": "1 sentence advice",
-    "triage_level": "immediate/delayed/minimal/expectant"
+    "advice": "1 sentence advice"
 }}
 
 Return ONLY valid JSON."""
+        return prompt, system_prompt
 
-        try:
-            text = self._chat_completion(prompt, system_prompt)
-            text = self._clean_json_response(text)
-            result = json.loads(text)
-            
+    def _narrowed_report_args(self, symptoms: List[str], top_diseases: List[Dict], qa_history: List[Dict]) -> tuple:
+        """(key, prompts, forced fields, fallback, label) for the narrowed report."""
+        final_disease = top_diseases[0]['name'] if top_diseases else "Unable to determine"
+        other_diseases = [d['name'] for d in top_diseases[1:]] if len(top_diseases) > 1 else []
+        fallback = {
+            "disease": final_disease,
+            "confidence": "Moderate",
+            "specialist": "General Physician",
+            "reasoning": f"Symptoms align with {final_disease}. Consult a doctor for confirmation.",
+            "ruled_out": other_diseases,
+            "advice": "Schedule an appointment for evaluation.",
+            "triage_level": "minimal"
+        }
+        return (
+            self._report_key(LLMService._narrowed_prompt, symptoms, top_diseases, qa_history),
+            self._narrowed_prompt(symptoms, top_diseases, qa_history),
             # FORCE the disease to be ML's #1 - no exceptions
-            result['disease'] = final_disease
-            result['ruled_out'] = other_diseases
-            # Ensure triage_level exists
-            if 'triage_level' not in result:
-                result['triage_level'] = 'minimal'
-            
-            return result
+            {"disease": final_disease, "ruled_out": other_diseases},
+            fallback,
+            "final narrowed report"
+        )
+
+    async def generate_final_narrowed_report(self, symptoms: List[str], top_diseases: List[Dict], 
+                                        qa_history: List[Dict]) -> dict:
+        """
+        Generate final diagnosis report after 3 Q&A rounds.
+        ALWAYS uses ML's #1 prediction to match the progress bar display.
+        """
+        return await self._report(*self._narrowed_report_args(symptoms, top_diseases, qa_history))
+
+    def stream_final_narrowed_report(self, symptoms: List[str], top_diseases: List[Dict],
+                                     qa_history: List[Dict]) -> AsyncIterator[Tuple[str, object]]:
+        """generate_final_narrowed_report as a stream of (field, value) pairs, ending with ("report", report)"""
+        return self._stream_report(*self._narrowed_report_args(symptoms, top_diseases, qa_history))
+
+    # ===== Free-text symptom extraction (fallback for the local extractor) =====
+    
+    async def extract_symptoms(self, text: str, valid_symptoms: List[str]) -> List[str]:
+        """Map a free-text complaint onto names from valid_symptoms. Returns [] on failure."""
+        prompt = f"""Parse the following patient description and extract the symptoms it mentions.
+Map them EXACTLY to names from this list of valid symptoms:
+{", ".join(valid_symptoms)}
+
+Patient description: "{text}"
+
+Return ONLY this JSON: {{"symptoms": [matching names from the list]}}. If nothing matches, return {{"symptoms": []}}."""
+
+        try:
+            completion = await self._complete(prompt, "You are a medical assistant that extracts symptoms.",
+                                              method="extract")
+            extracted = self._parse_json(completion.text, completion.tokens)[0].get("symptoms")
+            if not isinstance(extracted, list):
+                return []
+            return [s for s in extracted if isinstance(s, str)]
         except Exception as e:
-            print(f"Groq LLM Error in final narrowed report: {e}")
-            return {
-                "disease": final_disease,
-                "confidence": "Moderate",
-                "specialist": "General Physician",
-                "reasoning": f"Symptoms align with {final_disease}. Consult a doctor for confirmation.",
-                "ruled_out": other_diseases,
-                "advice": "Schedule an appointment for evaluation.",
-                "triage_level": "minimal"
-            }
+            print(f"Groq LLM Error extracting symptoms: {e}")
+            return []
 
     # ===== Legacy methods for backward compatibility =====
     
-    def generate_filtering_questions(self, symptoms: List[str], top_diseases: List[Dict]) -> List[str]:
+    async def generate_filtering_questions(self, symptoms: List[str], top_diseases: List[Dict]) -> List[str]:
         """Legacy method - now wraps generate_single_question for first question"""
-        question = self.generate_single_question(symptoms, top_diseases, [], 1)
+        question = await self.generate_single_question(symptoms, top_diseases, [], 1)
         return [question]
 
-    def generate_final_diagnosis(self, symptoms: List[str], top_diseases: List[dict], 
+    async def generate_final_diagnosis(self, symptoms: List[str], top_diseases: List[dict], 
                                   user_input_history: str) -> dict:
         """Legacy method for compatibility"""
-        return self.generate_comprehensive_report(symptoms, top_diseases)
+        return await self.generate_comprehensive_report(symptoms, top_diseases)
@@ -1,24 +1,278 @@
 
 from fastapi import FastAPI, HTTPException, Header, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict
+from contextlib import asynccontextmanager
 from ml_service import MLService
 from llm_service import LLMService
+from llm_cache import ReportCache
+from prediction_batcher import PredictionBatcher
+from service_state import ComponentDisabled, ComponentState
+from symptom_extractor import SymptomExtractor, load_symptom_list
+from question_engine import QuestionEngine, parse_answer
+from session_store import SessionStore
+from report_library import ReportLibrary
+import asyncio
+import json
+import logging
+import time
 import os
+import numpy as np
 
 from fastapi.middleware.cors import CORSMiddleware
 
-# Try to import Supabase service (graceful fallback if not configured)
-try:
+logger = logging.getLogger(__name__)
+
+# Paths - Using relative paths for portability
+# Backend is in: Dataset 2/symptom-analysis-web/backend
+# ML folder is in: Dataset 2/ML
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)  # symptom-analysis-web
+DATASET_ROOT = os.path.dirname(PROJECT_ROOT)  # Dataset 2
+
+ML_PATH = os.path.join(DATASET_ROOT, "ML")
+MODEL_PATH = os.path.join(ML_PATH, "model_100percent.pkl")
+MAPPINGS_PATH = os.path.join(ML_PATH, "mappings_100percent.pkl")
+# Extra symptom vocabulary for free-text extraction (names the LLM pipeline uses)
+SYMPTOMS_JSON_PATH = os.path.join(DATASET_ROOT, "LLM", "symptoms.json")
+# /extract calls the LLM only when the weakest local match scores below this
+EXTRACT_LLM_THRESHOLD = float(os.getenv("EXTRACT_LLM_THRESHOLD", "0.75"))
+
+# Follow-up questions: "local" picks them by information gain (ML/build_question_table.py), "llm" asks Groq
+QUESTION_ENGINE = os.getenv("QUESTION_ENGINE", "local").lower()
+QUESTION_TABLE_PATH = os.getenv("QUESTION_TABLE_PATH", os.path.join(ML_PATH, "symptom_frequencies.npz"))
+
+# High-confidence reports from the per-disease library (ML/build_report_library.py); LLM if missing
+REPORT_LIBRARY_PATH = os.getenv("REPORT_LIBRARY_PATH", os.path.join(ML_PATH, "report_library.npz"))
+# Optionally let the LLM write patient-specific reasoning for library reports (one short call)
+REPORT_LLM_REASONING = os.getenv("REPORT_LLM_REASONING", "false").lower() == "true"
+# Optionally let the LLM reword the locally chosen question (one extra round trip)
+QUESTION_LLM_REPHRASE = os.getenv("QUESTION_LLM_REPHRASE", "false").lower() == "true"
+# When the LLM writes the questions, get all three for a session in one call as a yes/no tree
+QUESTION_LLM_TREE = os.getenv("QUESTION_LLM_TREE", "true").lower() == "true"
+
+# Memory-mappable export of the model (see model_artifact.py); pickle is the fallback
+ARTIFACT_PATH = os.getenv("ML_ARTIFACT_PATH", os.path.join(ML_PATH, "model_100percent.forest"))
+ML_ARTIFACT_VERIFY = os.getenv("ML_ARTIFACT_VERIFY", "false").lower() == "true"
+# Set by serve.py: name of the shared memory block holding the model for all workers
+ML_SHARED_MODEL = os.getenv("ML_SHARED_MODEL")
+
+# Optional multi-forest ensemble (ML/train_ensemble.py output) served instead of the single model
+ML_ENSEMBLE_PATH = os.getenv("ML_ENSEMBLE_PATH")
+# Per-prediction time allowed for ensemble members when they run on the thread pool (sklearn engine)
+ML_ENSEMBLE_BUDGET_MS = float(os.getenv("ML_ENSEMBLE_BUDGET_MS", "50"))
+
+# Inference engine: "flat" (compiled NumPy node arrays) or "sklearn" (predict_proba)
+ML_ENGINE = os.getenv("ML_ENGINE", "flat").lower()
+
+# Quantized compact engine for pickled models: "float16" or "uint8" (empty keeps exact float64 leaves)
+ML_COMPACT_PRECISION = os.getenv("ML_COMPACT_PRECISION") or None
+
+# Prediction cache keyed by canonical symptom set (size 0 disables, TTL 0 never expires)
+ML_CACHE_SIZE = int(os.getenv("ML_CACHE_SIZE", "4096"))
+ML_CACHE_TTL_SECONDS = float(os.getenv("ML_CACHE_TTL_SECONDS", "0"))
+# Q&A sessions whose per-tree leaf assignments are kept for incremental re-scoring in /ask
+ML_SCORING_SESSIONS = int(os.getenv("ML_SCORING_SESSIONS", "1024"))
+
+# Groq client: pooled keep-alive connections, timeouts and a cap on completions in flight
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_READ_TIMEOUT_SECONDS = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+
+# Groq resilience: per-method deadlines ("report=8,question=4"), hedging to a faster model, circuit breaker
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "llama-3.1-8b-instant")  # Empty disables hedging and fallback
+LLM_DEADLINES = {
+    name.strip(): float(seconds)
+    for name, seconds in (item.split("=") for item in os.getenv("LLM_DEADLINES", "").split(",") if item.strip())
+}
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Generated report cache (size 0 disables, TTL 0 never expires); set a DB path to persist across restarts
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH")
+LLM_CACHE_DB_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DB_MAX_ENTRIES", "100000"))
+
+# Server-side Q&A sessions: /diagnose opens one, /ask then only sends {session_id, answer}
+QA_SESSION_TTL_SECONDS = float(os.getenv("QA_SESSION_TTL_SECONDS", "1800"))
+QA_SESSION_MAX = int(os.getenv("QA_SESSION_MAX", "10000"))
+# Generate the final report for "yes" and "no" in the background while the last question is pending
+QA_PREFETCH_REPORTS = os.getenv("QA_PREFETCH_REPORTS", "true").lower() == "true"
+# Sessions whose questions come from an LLM question tree are not prefetched by default:
+# the tree call plus the final report already use the 2-call budget
+QA_PREFETCH_TREE_SESSIONS = os.getenv("QA_PREFETCH_TREE_SESSIONS", "false").lower() == "true"
+
+# Confidence threshold
+CONFIDENCE_THRESHOLD = 70
+
+# Upper bound on cases accepted by /diagnose/batch
+MAX_BATCH_CASES = 1000
+
+# Opt-in micro-batching: coalesce concurrent /diagnose predictions into one model call
+ML_BATCHING_ENABLED = os.getenv("ML_BATCHING_ENABLED", "false").lower() == "true"
+ML_BATCH_WINDOW_MS = float(os.getenv("ML_BATCH_WINDOW_MS", "2"))
+ML_BATCH_MAX_SIZE = int(os.getenv("ML_BATCH_MAX_SIZE", "64"))
+
+# Hot reload: poll the model files every N seconds (0 disables); POST /admin/reload needs ADMIN_TOKEN
+ML_RELOAD_INTERVAL_SECONDS = float(os.getenv("ML_RELOAD_INTERVAL_SECONDS", "10"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# ===== Services (loaded in the background at startup) =====
+
+ml_service: Optional[MLService] = None
+llm_service: Optional[LLMService] = None
+supabase_service = None
+SUPABASE_ENABLED = False
+prediction_batcher: Optional[PredictionBatcher] = None
+symptom_extractor: Optional[SymptomExtractor] = None
+question_engine: Optional[QuestionEngine] = None
+report_library: Optional[ReportLibrary] = None
+qa_sessions = SessionStore(QA_SESSION_MAX, QA_SESSION_TTL_SECONDS)
+report_prefetch = {"started": 0, "used": 0, "missed": 0, "skipped_tree_sessions": 0}
+model_watch = {"errors": 0, "last_error": None}
+
+components = {
+    "ml": ComponentState("ml"),
+    "llm": ComponentState("llm"),
+    "supabase": ComponentState("supabase", required=False),  # Auth is optional
+    "extractor": ComponentState("extractor", required=False),
+    "questions": ComponentState("questions", required=False),  # Falls back to LLM questions
+    "reports": ComponentState("reports", required=False),  # Falls back to LLM reports
+}
+STARTED_AT = time.time()
+
+def _create_ml_service() -> MLService:
+    return MLService(
+        MODEL_PATH, MAPPINGS_PATH,
+        use_flat_engine=(ML_ENGINE == "flat"),
+        cache_size=ML_CACHE_SIZE,
+        cache_ttl=ML_CACHE_TTL_SECONDS,
+        artifact_path=ARTIFACT_PATH,
+        verify_artifact=ML_ARTIFACT_VERIFY,
+        shared_model=ML_SHARED_MODEL,
+        ensemble_path=ML_ENSEMBLE_PATH,
+        ensemble_budget_ms=ML_ENSEMBLE_BUDGET_MS,
+        compact_precision=ML_COMPACT_PRECISION,
+        max_scoring_sessions=ML_SCORING_SESSIONS
+    )
+
+def _create_supabase_service():
+    # Graceful fallback if not configured
+    if not os.getenv("SUPABASE_URL"):
+        raise ComponentDisabled("SUPABASE_URL not set")
     from supabase_service import SupabaseService
-    supabase_service = SupabaseService()
-    SUPABASE_ENABLED = True
-except Exception as e:
-    print(f"Supabase not configured: {e}")
-    supabase_service = None
-    SUPABASE_ENABLED = False
+    return SupabaseService()
+
+async def _load_ml():
+    global ml_service, prediction_batcher
+    service = await components["ml"].load(_create_ml_service, warm_up=MLService.warm_up)
+    if service:
+        if ML_BATCHING_ENABLED:
+            prediction_batcher = PredictionBatcher(service.predict_batch, ML_BATCH_WINDOW_MS, ML_BATCH_MAX_SIZE)
+        ml_service = service
+        await _load_extractor(service)
+
+def _create_symptom_extractor(service: MLService) -> SymptomExtractor:
+    extra = load_symptom_list(SYMPTOMS_JSON_PATH) if os.path.exists(SYMPTOMS_JSON_PATH) else []
+    return SymptomExtractor.from_vocabularies(service.symptom_to_idx, extra)
+
+async def _load_extractor(service: MLService):
+    global symptom_extractor
+    symptom_extractor = await components["extractor"].load(lambda: _create_symptom_extractor(service))
+
+def _create_llm_service() -> LLMService:
+    return LLMService(
+        connect_timeout=LLM_CONNECT_TIMEOUT_SECONDS,
+        read_timeout=LLM_READ_TIMEOUT_SECONDS,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        max_connections=LLM_MAX_CONNECTIONS,
+        cache=ReportCache(LLM_CACHE_SIZE, LLM_CACHE_TTL_SECONDS, LLM_CACHE_DB_PATH, LLM_CACHE_DB_MAX_ENTRIES),
+        fallback_model=LLM_FALLBACK_MODEL,
+        deadlines=LLM_DEADLINES,
+        hedge_percentile=LLM_HEDGE_PERCENTILE,
+        breaker_failures=LLM_BREAKER_FAILURES,
+        breaker_reset=LLM_BREAKER_RESET_SECONDS
+    )
+
+async def _load_llm():
+    global llm_service
+    llm_service = await components["llm"].load(_create_llm_service)
+
+async def _load_supabase():
+    global supabase_service, SUPABASE_ENABLED
+    supabase_service = await components["supabase"].load(_create_supabase_service)
+    SUPABASE_ENABLED = supabase_service is not None
+    if not SUPABASE_ENABLED:
+        print(f"Supabase not configured: {components['supabase'].error}")
+
+def _create_question_engine() -> QuestionEngine:
+    if QUESTION_ENGINE != "local":
+        raise ComponentDisabled(f"QUESTION_ENGINE={QUESTION_ENGINE}")
+    if not os.path.exists(QUESTION_TABLE_PATH):
+        raise ComponentDisabled(f"{QUESTION_TABLE_PATH} not found (run ML/build_question_table.py)")
+    return QuestionEngine.from_file(QUESTION_TABLE_PATH)
+
+async def _load_questions():
+    global question_engine
+    question_engine = await components["questions"].load(_create_question_engine)
+
+def _create_report_library() -> ReportLibrary:
+    if not os.path.exists(REPORT_LIBRARY_PATH):
+        raise ComponentDisabled(f"{REPORT_LIBRARY_PATH} not found (run ML/build_report_library.py)")
+    return ReportLibrary.from_file(REPORT_LIBRARY_PATH)
+
+async def _load_reports():
+    global report_library
+    report_library = await components["reports"].load(_create_report_library)
+
+async def load_services():
+    """Load all components concurrently; failures are recorded, not fatal."""
+    await asyncio.gather(_load_ml(), _load_llm(), _load_supabase(), _load_questions(), _load_reports())
+
+async def watch_model_files():
+    """Reload the ML model in the background whenever its files change on disk."""
+    while True:
+        await asyncio.sleep(ML_RELOAD_INTERVAL_SECONDS)
+        # A failed check (half-written file, stat race) is logged and retried on the next poll
+        try:
+            if ml_service and ml_service.changed_on_disk():
+                print("Model files changed, reloading")
+                result = await asyncio.to_thread(ml_service.reload)
+                print(f"Model reload: {result}")
+                if result["reloaded"]:
+                    await _load_extractor(ml_service)
+        except Exception as e:
+            model_watch["errors"] += 1
+            model_watch["last_error"] = str(e)
+            logger.exception("Model file watcher failed; will retry")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [asyncio.create_task(load_services())]
+    if ML_RELOAD_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(watch_model_files()))
+    yield
+    for task in tasks:
+        task.cancel()
+    if prediction_batcher:
+        await prediction_batcher.aclose()
+    if ml_service:
+        ml_service.close()
+    if llm_service:
+        await llm_service.aclose()
 
-app = FastAPI()
+def require(*names: str):
+    """Raise 503 unless every named component is loaded."""
+    for name in names:
+        state = components[name]
+        if state.status != "ready":
+            raise HTTPException(status_code=503, detail=f"{name} service is {state.status}")
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,23 +290,197 @@ def read_root():
         "supabase_enabled": SUPABASE_ENABLED
     }
 
-# Paths - Using relative paths for portability
-# Backend is in: Dataset 2/symptom-analysis-web/backend
-# ML folder is in: Dataset 2/ML
-BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(BACKEND_DIR)  # symptom-analysis-web
-DATASET_ROOT = os.path.dirname(PROJECT_ROOT)  # Dataset 2
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok", "uptime_seconds": round(time.time() - STARTED_AT, 1)}
 
-ML_PATH = os.path.join(DATASET_ROOT, "ML")
-MODEL_PATH = os.path.join(ML_PATH, "model_100percent.pkl")
-MAPPINGS_PATH = os.path.join(ML_PATH, "mappings_100percent.pkl")
+@app.get("/readyz")
+def readyz():
+    """Readiness: every required component is loaded. 503 until then."""
+    ready = all(state.ready for state in components.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "components": {name: state.to_dict() for name, state in components.items()}
+        }
+    )
+
+async def local_question(symptoms: List[str], top_diseases: List[Dict], qa_history: List[Dict],
+                         rescored: bool = False) -> Optional[tuple]:
+    """(question, symptom) chosen by information gain, or None if the question engine cannot pick one."""
+    if not question_engine:
+        return None
+    selected = question_engine.select(top_diseases, symptoms, qa_history, apply_answers=not rescored)
+    if not selected:
+        return None
+    question = selected["question"]
+    if QUESTION_LLM_REPHRASE:
+        question = await llm_service.rephrase_question(question, symptoms)
+    return question, selected["symptom"]
 
-# Initialize Services
-ml_service = MLService(MODEL_PATH, MAPPINGS_PATH)
-llm_service = LLMService()
+async def tree_question(session, qa_history: List[Dict]) -> Optional[str]:
+    """
+    Next question from the session's LLM question tree, generated on the
+    first question for the session's disease triple. None when tree mode
+    is off, the tree is unavailable, or the answers left it (unclear answer,
+    question not from the tree).
+    """
+    if not QUESTION_LLM_TREE or session is None:
+        return None
+    if session.question_tree is None and not qa_history:
+        session.question_tree = await llm_service.generate_question_tree(session.top_diseases) or {}
+    node = session.question_tree
+    for qa in qa_history:
+        answer = parse_answer(qa.get("answer", ""))
+        if not node or node.get("question") != qa.get("question") or answer is None:
+            return None
+        node = node.get("yes" if answer else "no")
+    return node.get("question") if node else None
 
-# Confidence threshold
-CONFIDENCE_THRESHOLD = 70
+async def next_question(symptoms: List[str], top_diseases: List[Dict], qa_history: List[Dict],
+                  question_number: int, rescored: bool = False, session=None) -> tuple:
+    """
+    Pick the next follow-up question as (question, symptom asked about).
+    Chosen locally by information gain when possible, otherwise by the LLM (symptom None):
+    from the session's question tree, or one call per question.
+    rescored: top_diseases already account for the answers in qa_history.
+    """
+    selected = await local_question(symptoms, top_diseases, qa_history, rescored)
+    if selected:
+        return selected
+    question = await tree_question(session, qa_history)
+    if question:
+        return question, None
+    
+    question = await llm_service.generate_single_question(
+        symptoms=symptoms,
+        top_diseases=top_diseases,
+        qa_history=qa_history,
+        question_number=question_number
+    )
+    return question, None
+
+async def stream_next_question(symptoms: List[str], top_diseases: List[Dict], qa_history: List[Dict],
+                               question_number: int, rescored: bool = False, session=None):
+    """next_question for SSE: yields ("token", delta) while the LLM writes, then ("question", (question, symptom))."""
+    selected = await local_question(symptoms, top_diseases, qa_history, rescored)
+    if not selected:
+        question = await tree_question(session, qa_history)
+        selected = (question, None) if question else None
+    if selected:
+        yield "question", selected
+        return
+    async for kind, text in llm_service.stream_single_question(symptoms, top_diseases, qa_history, question_number):
+        yield kind, (text, None) if kind == "question" else text
+
+def answered_symptoms(qa_history: List[Dict]) -> tuple:
+    """
+    (present, absent) symptom names from yes/no answers. The symptom a
+    question asked about comes from its "symptom" field, the local question
+    template, or failing that the extractor's single match in the question text.
+    """
+    present, absent = [], []
+    for qa in qa_history:
+        answer = parse_answer(qa.get("answer", ""))
+        if answer is None:
+            continue
+        symptom = qa.get("symptom") or (question_engine.question_symptom(qa) if question_engine else None)
+        if not symptom and symptom_extractor:
+            matches = symptom_extractor.extract(str(qa.get("question", "")))
+            symptom = matches[0]["symptom"] if len(matches) == 1 else None
+        if symptom:
+            (present if answer else absent).append(symptom)
+    return present, absent
+
+def rescore_session(symptoms: List[str], qa_history: List[Dict], key=None, base: np.ndarray = None,
+                    speculative: bool = False) -> tuple:
+    """
+    Re-score the reported symptoms updated with the Q&A answers.
+    Keyed by the Q&A session id (or, for stateless clients, the reported
+    symptom indices), so every step of a Q&A flow reuses the per-tree leaf
+    assignments of the previous one. A speculative score (an answer that
+    may never arrive) is a plain prediction that leaves the scoring
+    session and its counters alone.
+    Returns (top_diseases, confidence), or None if no symptom is recognized.
+    """
+    if base is None:
+        base = ml_service.resolve_indices(symptoms)
+    present, absent = answered_symptoms(qa_history)
+    indices = set(base.tolist()) | set(ml_service.resolve_indices(present).tolist())
+    indices -= set(ml_service.resolve_indices(absent).tolist()) - set(base.tolist())
+    if not indices:
+        return None
+    indices = np.array(sorted(indices), dtype=np.int32)
+    if speculative:
+        return ml_service.predict_indices_batch([indices])[0]
+    key = key or ("qa", tuple(base.tolist()))
+    return ml_service.rescore(key, indices)
+
+async def high_confidence_report(symptoms: List[str], top_diseases: List[Dict]) -> dict:
+    """
+    Report for a confident prediction: from the disease library when it has
+    the top disease (reasoning optionally personalized by the LLM), else
+    generated by the LLM.
+    """
+    report = report_library.base_report(symptoms, top_diseases) if report_library else None
+    if report is None:
+        return await llm_service.generate_comprehensive_report(symptoms, top_diseases)
+    if REPORT_LLM_REASONING:
+        report["reasoning"] = await llm_service.personalize_reasoning(symptoms, report)
+    return report
+
+def report_fields(report: Dict):
+    """A finished report's (field, value) pairs in streaming order: disease and triage level first."""
+    for name in ("disease", "triage_level"):
+        if name in report:
+            yield name, report[name]
+    for name, value in report.items():
+        if name not in ("disease", "triage_level"):
+            yield name, value
+
+async def stream_high_confidence_report(symptoms: List[str], top_diseases: List[Dict]):
+    """high_confidence_report as (field, value) pairs, ending with ("report", report)."""
+    report = report_library.base_report(symptoms, top_diseases) if report_library else None
+    if report is None:
+        async for name, value in llm_service.stream_comprehensive_report(symptoms, top_diseases):
+            yield name, value
+        return
+    for name, value in report_fields(report):
+        if name != "reasoning" or not REPORT_LLM_REASONING:
+            yield name, value
+    if REPORT_LLM_REASONING:
+        report["reasoning"] = await llm_service.personalize_reasoning(symptoms, report)
+        yield "reasoning", report["reasoning"]
+    yield "report", report
+
+async def predict_symptoms(symptoms: List[str]):
+    """Run an ML prediction, through the micro-batcher when enabled."""
+    if prediction_batcher:
+        return await prediction_batcher.predict(symptoms)
+    return ml_service.predict(symptoms)
+
+@app.get("/metrics")
+def get_metrics():
+    """Runtime counters for the prediction pipeline."""
+    if ml_service is None:
+        return {"ml": components["ml"].to_dict()}
+    return {
+        "model_version": ml_service.model_version,
+        "model_source": ml_service.model_source,
+        "model_reload": dict(ml_service.reload_stats(), watcher_errors=model_watch["errors"],
+                             last_watcher_error=model_watch["last_error"]),
+        "ml_ensemble": ml_service.bundle.ensemble.stats() if ml_service.bundle.ensemble else {"enabled": False},
+        "ml_cache": ml_service.cache.stats(),
+        "ml_rescoring": ml_service.rescoring_stats(),
+        "ml_batching": prediction_batcher.stats() if prediction_batcher else {"enabled": False},
+        "qa_sessions": qa_sessions.stats(),
+        "qa_report_prefetch": dict(report_prefetch, enabled=QA_PREFETCH_REPORTS),
+        "llm": llm_service.stats() if llm_service else components["llm"].to_dict(),
+        "llm_cache": llm_service.cache.stats() if llm_service and llm_service.cache else None,
+        "report_library": report_library.stats() if report_library else components["reports"].to_dict()
+    }
 
 # ===== Auth Helper =====
 
@@ -76,28 +504,50 @@ class DiagnoseRequest(BaseModel):
     history: Optional[str] = ""
     medications: Optional[str] = ""
 
+class ExtractRequest(BaseModel):
+    text: str
+
+class BatchDiagnoseRequest(BaseModel):
+    cases: List[List[str]]  # One symptom list per case
+    top_k: Optional[int] = 3
+
 class AskRequest(BaseModel):
-    """Request for iterative Q&A (questions 2 and 3)"""
-    symptoms: List[str]
-    top_diseases: List[Dict]
-    question_number: int  # Current question number (1, 2, or 3)
-    qa_history: List[Dict]  # Previous Q&A: [{"question": "...", "answer": "yes/no"}, ...]
+    """
+    Request for iterative Q&A (questions 2 and 3).
+    Either {session_id, answer} for a session opened by /diagnose, or the
+    full state for stateless clients.
+    """
+    session_id: Optional[str] = None
+    answer: Optional[str] = None  # Answer to the session's pending question
+    # Stateless clients
+    symptoms: Optional[List[str]] = None
+    top_diseases: Optional[List[Dict]] = None
+    question_number: Optional[int] = None  # Current question number (1, 2, or 3)
+    qa_history: Optional[List[Dict]] = None  # Previous Q&A: [{"question": "...", "answer": "yes/no", "symptom": optional}, ...]
 
 class DiagnoseResponse(BaseModel):
     action: str  # "show_report" or "ask_question"
     confidence_score: float
     top_diseases: Optional[List[Dict]] = None
+    model_version: Optional[str] = None
     # For show_report
     report: Optional[Dict] = None
     # For ask_question
     question: Optional[str] = None
     question_number: Optional[int] = None
+    question_symptom: Optional[str] = None  # Symptom the question asks about (local question engine)
+    session_id: Optional[str] = None  # Send with the answer to /ask
 
 class AskResponse(BaseModel):
     action: str  # "ask_question" or "show_report"
+    # Model output re-scored with the answers so far (None if the model is unavailable)
+    confidence_score: Optional[float] = None
+    top_diseases: Optional[List[Dict]] = None
     # For ask_question
     question: Optional[str] = None
     question_number: Optional[int] = None
+    question_symptom: Optional[str] = None
+    session_id: Optional[str] = None
     # For show_report (after 3rd question answered)
     report: Optional[Dict] = None
 
@@ -249,6 +699,45 @@ async def get_events(user: Optional[Dict] = Depends(get_current_user)):
 
 # ===== Diagnosis Endpoints =====
 
+def log_report(user: Optional[Dict], symptoms: List[str], report: Dict, confidence: Optional[float],
+               top_diseases: List[Dict] = ()):
+    """Log a diagnosis event if the user is authenticated."""
+    if user and SUPABASE_ENABLED:
+        # Without a model confidence, use the first disease's
+        if confidence is None:
+            confidence = top_diseases[0].get("probability", 0) if top_diseases else 0
+        supabase_service.log_diagnostic_event(user["user_id"], {
+            "symptoms": symptoms,
+            "disease": report.get("disease"),
+            "confidence": confidence,
+            "triage_level": report.get("triage_level"),
+            "specialist": report.get("specialist")
+        })
+
+def open_session(symptoms: List[str], top_diseases: List[Dict], confidence: float, user: Optional[Dict]):
+    """Open the Q&A session /ask continues, with its incremental scoring session. Set its first question next."""
+    session = qa_sessions.create(
+        symptoms=symptoms,
+        indices=ml_service.resolve_indices(symptoms),
+        top_diseases=top_diseases,
+        confidence=confidence,
+        question=None,
+        model_version=ml_service.model_version,
+        user_id=user["user_id"] if user else None
+    )
+    # Start the incremental scoring session the answers will update
+    rescore_session(symptoms, [], session.session_id, session.indices)
+    return session
+
+def sse(event: str, data) -> str:
+    """One Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    # No caching or proxy buffering, so each event reaches the client as it is written
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/diagnose", response_model=DiagnoseResponse)
 async def diagnose(
     request: DiagnoseRequest,
@@ -259,47 +748,46 @@ async def diagnose(
     - If confidence >= 70%: Returns comprehensive report directly
     - If confidence < 70%: Returns first question for iterative Q&A
     """
+    require("ml", "llm")
     try:
         # Get ML Prediction
         current_symptoms = request.symptoms
-        top_diseases, confidence = ml_service.predict(current_symptoms)
+        top_diseases, confidence = await predict_symptoms(current_symptoms)
         
         # Check Confidence Threshold
         if confidence >= CONFIDENCE_THRESHOLD:
             # HIGH CONFIDENCE - Generate comprehensive report directly
-            report = llm_service.generate_comprehensive_report(current_symptoms, top_diseases)
-            
-            # Log event if user is authenticated
-            if user and SUPABASE_ENABLED:
-                supabase_service.log_diagnostic_event(user["user_id"], {
-                    "symptoms": current_symptoms,
-                    "disease": report.get("disease"),
-                    "confidence": confidence,
-                    "triage_level": report.get("triage_level"),
-                    "specialist": report.get("specialist")
-                })
+            report = await high_confidence_report(current_symptoms, top_diseases)
+            log_report(user, current_symptoms, report, confidence)
             
             return {
                 "action": "show_report",
                 "confidence_score": confidence,
                 "top_diseases": top_diseases,
+                "model_version": ml_service.model_version,
                 "report": report
             }
         else:
             # LOW CONFIDENCE - Start iterative Q&A
             # Generate first question
-            question = llm_service.generate_single_question(
-                symptoms=current_symptoms,
-                top_diseases=top_diseases,
-                qa_history=[],
-                question_number=1
-            )
+            session = open_session(current_symptoms, top_diseases, confidence, user)
+            try:
+                question, question_symptom = await next_question(current_symptoms, top_diseases, [], 1,
+                                                                 session=session)
+            except BaseException:
+                # No question reached the client, so nothing can continue this session
+                close_session(session)
+                raise
+            session.question, session.question_symptom = question, question_symptom
             return {
                 "action": "ask_question",
                 "confidence_score": confidence,
                 "top_diseases": top_diseases,
+                "model_version": ml_service.model_version,
                 "question": question,
-                "question_number": 1
+                "question_number": 1,
+                "question_symptom": question_symptom,
+                "session_id": session.session_id
             }
 
     except Exception as e:
@@ -307,65 +795,294 @@ async def diagnose(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/ask", response_model=AskResponse)
-async def ask_followup(
-    request: AskRequest,
+@app.post("/diagnose/stream")
+async def diagnose_stream(
+    request: DiagnoseRequest,
     user: Optional[Dict] = Depends(get_current_user)
 ):
     """
-    Iterative Q&A endpoint for low-confidence diagnoses.
-    
-    - Call after receiving an answer to generate the next question
-    - After 3 Q&A rounds, returns the final narrowed report
+    /diagnose as Server-Sent Events. The ML result is sent as soon as the
+    model has scored the symptoms; the LLM output follows as it is generated.
+
+    Events:
+    - prediction: {action, confidence_score, top_diseases, model_version}
+    - field: {name, value} per report field (disease and triage_level first), then
+      report: the complete report (high confidence)
+    - token: {text} question text as the LLM writes it, then
+      question: {question, question_number, question_symptom, session_id} (low confidence)
+    - error: {detail}; done: {} ends the stream
+    """
+    require("ml", "llm")
+    current_symptoms = request.symptoms
+    try:
+        top_diseases, confidence = await predict_symptoms(current_symptoms)
+    except Exception as e:
+        print(f"Error in /diagnose/stream: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    high_confidence = confidence >= CONFIDENCE_THRESHOLD
+
+    async def events():
+        session = None
+        yield sse("prediction", {
+            "action": "show_report" if high_confidence else "ask_question",
+            "confidence_score": confidence,
+            "top_diseases": top_diseases,
+            "model_version": ml_service.model_version
+        })
+        try:
+            if high_confidence:
+                async for name, value in stream_high_confidence_report(current_symptoms, top_diseases):
+                    if name == "report":
+                        log_report(user, current_symptoms, value, confidence)
+                        yield sse("report", value)
+                    else:
+                        yield sse("field", {"name": name, "value": value})
+            else:
+                session = open_session(current_symptoms, top_diseases, confidence, user)
+                async for kind, value in stream_next_question(current_symptoms, top_diseases, [], 1, session=session):
+                    if kind == "token":
+                        yield sse("token", {"text": value})
+                        continue
+                    question, question_symptom = value
+                    session.question, session.question_symptom = question, question_symptom
+                    yield sse("question", {
+                        "question": question,
+                        "question_number": 1,
+                        "question_symptom": question_symptom,
+                        "session_id": session.session_id
+                    })
+        except Exception as e:
+            print(f"Error in /diagnose/stream: {e}")
+            yield sse("error", {"detail": str(e)})
+        finally:
+            # Failed or disconnected before the first question: nothing can continue the session
+            if session is not None and session.question is None:
+                close_session(session)
+        yield sse("done", {})
+
+    return sse_response(events())
+
+
+@app.post("/extract")
+async def extract_symptoms(request: ExtractRequest):
+    """
+    Map a free-text complaint to canonical symptoms for /diagnose.
+    Matching runs locally; the LLM is asked only when local confidence is low.
     """
+    require("extractor")
+    matches = symptom_extractor.extract(request.text)
+    confidence = SymptomExtractor.confidence(matches)
+    symptoms = [m["symptom"] for m in matches]
+    source = "local"
+
+    if confidence < EXTRACT_LLM_THRESHOLD and components["llm"].status == "ready":
+        llm_symptoms = await llm_service.extract_symptoms(request.text, symptom_extractor.symptoms)
+        # Keep confident local matches, replace the weak ones with the LLM's (vocabulary names only)
+        llm_symptoms = symptom_extractor.canonicalize(llm_symptoms)
+        if llm_symptoms:
+            confident = [m["symptom"] for m in matches if m["score"] >= EXTRACT_LLM_THRESHOLD]
+            symptoms = confident + [s for s in llm_symptoms if s not in confident]
+            source = "local+llm" if confident else "llm"
+
+    return {
+        "symptoms": symptoms,
+        "matches": matches,
+        "confidence": confidence,
+        "source": source
+    }
+
+
+@app.post("/diagnose/batch")
+async def diagnose_batch(request: BatchDiagnoseRequest):
+    """
+    ML-only batch diagnosis for bulk triage.
+    All cases are scored with one model call; no LLM report is generated.
+    """
+    require("ml")
+    if len(request.cases) > MAX_BATCH_CASES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_CASES} cases per batch")
+    if request.top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be at least 1")
+
     try:
+        # Up to MAX_BATCH_CASES rows: score off the event loop so other requests are not held up
+        predictions = await asyncio.to_thread(ml_service.predict_batch, request.cases, top_k=request.top_k)
+        return {
+            "model_version": ml_service.model_version,
+            "results": [
+                {
+                    "top_diseases": top_diseases,
+                    "confidence_score": confidence,
+                    "needs_followup": confidence < CONFIDENCE_THRESHOLD
+                }
+                for top_diseases, confidence in predictions
+            ]
+        }
+    except Exception as e:
+        print(f"Error in /diagnose/batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def answer_step(request: AskRequest) -> tuple:
+    """
+    Validate an /ask request, record the answer and re-score the model output.
+    Returns (session or None, symptoms, top_diseases, qa_history, question_number, confidence, rescored).
+    """
+    session = None
+    if request.session_id:
+        session = qa_sessions.get(request.session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Q&A session not found or expired; call /diagnose again")
+        if not request.answer:
+            raise HTTPException(status_code=400, detail="answer is required with session_id")
+        if session.question is None:
+            raise HTTPException(status_code=409, detail="No question is awaiting an answer in this session")
+        symptoms, top_diseases = session.symptoms, session.top_diseases
+        qa_history = session.record_answer(request.answer)
+        question_number = len(qa_history)
+    else:
+        if None in (request.symptoms, request.top_diseases, request.question_number, request.qa_history):
+            raise HTTPException(
+                status_code=400,
+                detail="Send session_id and answer, or symptoms, top_diseases, question_number and qa_history"
+            )
+        symptoms, top_diseases = request.symptoms, request.top_diseases
+        question_number, qa_history = request.question_number, request.qa_history
+        
         # Validate question number
-        if request.question_number < 1 or request.question_number > 3:
+        if question_number < 1 or question_number > 3:
             raise HTTPException(status_code=400, detail="question_number must be 1, 2, or 3")
         
         # Check if we have enough Q&A history
-        if len(request.qa_history) != request.question_number:
+        if len(qa_history) != question_number:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Expected {request.question_number} Q&A pairs in history, got {len(request.qa_history)}"
+                detail=f"Expected {question_number} Q&A pairs in history, got {len(qa_history)}"
             )
+    
+    top_diseases, confidence, rescored = rescore_answers(session, symptoms, top_diseases, qa_history)
+    return session, symptoms, top_diseases, qa_history, question_number, confidence, rescored
+
+def rescore_answers(session, symptoms: List[str], top_diseases: List[Dict], qa_history: List[Dict],
+                    speculative: bool = False) -> tuple:
+    """
+    Update the prediction with the answers (only trees testing the changed symptoms are re-run).
+    speculative: score without touching the session's scoring state, for answers not given yet.
+    Returns (top_diseases, confidence, rescored); the input diseases and None if the model cannot re-score.
+    """
+    if components["ml"].ready:
+        key = base = None
+        if session:
+            key = session.session_id
+            # Indices resolved by a previous model version may not line up with the current one
+            base = session.indices if session.model_version == ml_service.model_version else None
+        result = rescore_session(symptoms, qa_history, key, base, speculative)
+        if result:
+            return result[0], result[1], True
+    return top_diseases, None, False
+
+def prefetch_final_report(session):
+    """
+    With the last question pending, start generating the final report for
+    a "yes" and a "no" answer so the matching one is ready when it arrives.
+    Skipped for LLM question-tree sessions unless QA_PREFETCH_TREE_SESSIONS.
+    """
+    if not QA_PREFETCH_REPORTS:
+        return
+    if session.question_tree and not QA_PREFETCH_TREE_SESSIONS:
+        report_prefetch["skipped_tree_sessions"] += 1
+        return
+    session.cancel_prefetch()
+    for answer in (True, False):
+        qa_history = session.qa_history + [session.answer_entry("yes" if answer else "no")]
+        top_diseases, _, _ = rescore_answers(session, session.symptoms, session.top_diseases, qa_history,
+                                             speculative=True)
+        task = asyncio.create_task(llm_service.generate_final_narrowed_report(
+            symptoms=session.symptoms,
+            top_diseases=top_diseases,
+            qa_history=qa_history
+        ))
+        session.prefetch[answer] = ([d["name"] for d in top_diseases], task)
+        report_prefetch["started"] += 1
+
+def take_prefetched_report(session, answer: str, top_diseases: List[Dict]):
+    """
+    The speculative report task for this answer, if it was generated for the
+    same diseases; other candidates are cancelled. None when nothing matches.
+    """
+    if not session or not session.prefetch:
+        return None
+    candidate = session.prefetch.pop(parse_answer(answer), None)
+    session.cancel_prefetch()
+    if candidate and candidate[0] == [d["name"] for d in top_diseases]:
+        report_prefetch["used"] += 1
+        return candidate[1]
+    if candidate:
+        candidate[1].cancel()
+    report_prefetch["missed"] += 1
+    return None
+
+def close_session(session):
+    """Drop a finished Q&A session and its scoring state."""
+    if session:
+        qa_sessions.delete(session.session_id)
+        if ml_service:
+            ml_service.end_session(session.session_id)
+
+@app.post("/ask", response_model=AskResponse)
+async def ask_followup(
+    request: AskRequest,
+    user: Optional[Dict] = Depends(get_current_user)
+):
+    """
+    Iterative Q&A endpoint for low-confidence diagnoses.
+    
+    - Call after receiving an answer to generate the next question
+    - After 3 Q&A rounds, returns the final narrowed report
+    - Sessions from /diagnose send only {session_id, answer}
+    """
+    require("llm")
+    try:
+        session, symptoms, top_diseases, qa_history, question_number, confidence, rescored = answer_step(request)
         
-        if request.question_number < 3:
+        if question_number < 3:
             # Generate next question (2 or 3)
-            next_question_number = request.question_number + 1
-            question = llm_service.generate_single_question(
-                symptoms=request.symptoms,
-                top_diseases=request.top_diseases,
-                qa_history=request.qa_history,
-                question_number=next_question_number
+            next_question_number = question_number + 1
+            question, question_symptom = await next_question(
+                symptoms, top_diseases, qa_history, next_question_number, rescored, session
             )
+            if session:
+                session.top_diseases, session.confidence = top_diseases, confidence
+                session.question, session.question_symptom = question, question_symptom
+                if next_question_number == 3:
+                    prefetch_final_report(session)
             return {
                 "action": "ask_question",
+                "confidence_score": confidence,
+                "top_diseases": top_diseases if rescored else None,
                 "question": question,
-                "question_number": next_question_number
+                "question_number": next_question_number,
+                "question_symptom": question_symptom,
+                "session_id": session.session_id if session else None
             }
         else:
-            # All 3 questions answered - Generate final narrowed report
-            report = llm_service.generate_final_narrowed_report(
-                symptoms=request.symptoms,
-                top_diseases=request.top_diseases,
-                qa_history=request.qa_history
-            )
-            
-            # Log event if user is authenticated
-            if user and SUPABASE_ENABLED:
-                # Get confidence from first disease
-                confidence = request.top_diseases[0].get("probability", 0) if request.top_diseases else 0
-                supabase_service.log_diagnostic_event(user["user_id"], {
-                    "symptoms": request.symptoms,
-                    "disease": report.get("disease"),
-                    "confidence": confidence,
-                    "triage_level": report.get("triage_level"),
-                    "specialist": report.get("specialist")
-                })
+            # All 3 questions answered - Generate final narrowed report (usually already prefetched)
+            prefetched = take_prefetched_report(session, request.answer, top_diseases)
+            close_session(session)
+            if prefetched:
+                report = await prefetched
+            else:
+                report = await llm_service.generate_final_narrowed_report(
+                    symptoms=symptoms,
+                    top_diseases=top_diseases,
+                    qa_history=qa_history
+                )
+            log_report(user, symptoms, report, confidence, top_diseases)
             
             return {
                 "action": "show_report",
+                "confidence_score": confidence,
+                "top_diseases": top_diseases if rescored else None,
                 "report": report
             }
 
@@ -376,6 +1093,97 @@ async def ask_followup(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/ask/stream")
+async def ask_followup_stream(
+    request: AskRequest,
+    user: Optional[Dict] = Depends(get_current_user)
+):
+    """
+    /ask as Server-Sent Events, with the same events as /diagnose/stream.
+    The re-scored prediction is sent first (top_diseases null if the model
+    is unavailable), then the next question or the final report.
+    """
+    require("llm")
+    try:
+        session, symptoms, top_diseases, qa_history, question_number, confidence, rescored = answer_step(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in /ask/stream: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    final = question_number >= 3
+    prefetched = None
+    if final:
+        prefetched = take_prefetched_report(session, request.answer, top_diseases)
+        close_session(session)
+
+    async def events():
+        yield sse("prediction", {
+            "action": "show_report" if final else "ask_question",
+            "confidence_score": confidence,
+            "top_diseases": top_diseases if rescored else None
+        })
+        try:
+            if final and prefetched:
+                report = await prefetched
+                for name, value in report_fields(report):
+                    yield sse("field", {"name": name, "value": value})
+                log_report(user, symptoms, report, confidence, top_diseases)
+                yield sse("report", report)
+            elif final:
+                async for name, value in llm_service.stream_final_narrowed_report(symptoms, top_diseases, qa_history):
+                    if name == "report":
+                        log_report(user, symptoms, value, confidence, top_diseases)
+                        yield sse("report", value)
+                    else:
+                        yield sse("field", {"name": name, "value": value})
+            else:
+                next_question_number = question_number + 1
+                async for kind, value in stream_next_question(
+                    symptoms, top_diseases, qa_history, next_question_number, rescored, session
+                ):
+                    if kind == "token":
+                        yield sse("token", {"text": value})
+                        continue
+                    question, question_symptom = value
+                    if session:
+                        session.top_diseases, session.confidence = top_diseases, confidence
+                        session.question, session.question_symptom = question, question_symptom
+                        if next_question_number == 3:
+                            prefetch_final_report(session)
+                    yield sse("question", {
+                        "question": question,
+                        "question_number": next_question_number,
+                        "question_symptom": question_symptom,
+                        "session_id": session.session_id if session else None
+                    })
+        except Exception as e:
+            print(f"Error in /ask/stream: {e}")
+            yield sse("error", {"detail": str(e)})
+        yield sse("done", {})
+
+    return sse_response(events())
+
+
+# ===== Admin Endpoints =====
+
+@app.post("/admin/reload")
+async def reload_model(x_admin_token: Optional[str] = Header(None)):
+    """
+    Load the model files again and swap the new model in once it passes a smoke test.
+    Requests already running finish on the previous model.
+    """
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+    require("ml")
+    
+    result = await asyncio.to_thread(ml_service.reload)
+    if not result["reloaded"]:
+        raise HTTPException(status_code=422, detail=result)
+    await _load_extractor(ml_service)  # The symptom vocabulary may have changed
+    return result
+
+
 # ===== Legacy Endpoint (for compatibility) =====
 
 class FinalizeRequest(BaseModel):
@@ -386,8 +1194,9 @@ class FinalizeRequest(BaseModel):
 @app.post("/finalize")
 async def finalize_diagnosis(request: FinalizeRequest):
     """Legacy endpoint - kept for backward compatibility"""
+    require("llm")
     try:
-        report = llm_service.generate_comprehensive_report(
+        report = await llm_service.generate_comprehensive_report(
             request.symptoms, 
             request.top_diseases
         )
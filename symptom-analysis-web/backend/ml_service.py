@@ -1,110 +1,536 @@
 import pickle
 import numpy as np
+from scipy.sparse import csr_matrix
 import logging
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from symptom_resolver import SymptomResolver
+from forest_engine import FlatForest
+from compact_forest import CompactForest
+from ensemble_engine import ForestEnsemble
+from incremental_scoring import ScoringSession
+from prediction_cache import PredictionCache
+from model_artifact import attach_shared, load_artifact
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def file_version(*paths: str) -> str:
+    """Short content hash identifying a set of model artifacts."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+class ModelBundle:
+    """
+    Everything one model version needs to serve predictions. A bundle is never
+    mutated after it is built; reloads build a new one and swap the reference.
+    A replaced bundle is retired: its ensemble thread pool is closed once the
+    predictions already running on it finish.
+    """
+    def __init__(self, model, engine, symptom_to_idx: dict, idx_to_disease: dict,
+                 version: str, source: str, ensemble: ForestEnsemble = None):
+        self.model = model  # sklearn estimator, None when serving from an artifact
+        self.engine = engine  # FlatForest, None when predicting through sklearn
+        self.ensemble = ensemble  # Set instead of model/engine when serving an ensemble
+        self.symptom_to_idx = symptom_to_idx
+        self.idx_to_disease = idx_to_disease
+        self.version = version
+        self.source = source  # "shared", "artifact", "pickle" or "ensemble"
+        # Precompiled resolver: normalized lookups + n-gram partial-match index
+        self.resolver = SymptomResolver(symptom_to_idx)
+        self.loaded_at = time.time()
+        self._in_flight = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    @property
+    def n_classes(self) -> int:
+        if self.ensemble is not None:
+            return self.ensemble.n_classes
+        return self.engine.n_classes if self.engine is not None else len(self.model.classes_)
+
+    @property
+    def n_features(self) -> int:
+        if self.ensemble is not None:
+            return self.ensemble.n_features
+        return self.engine.n_features if self.engine is not None else int(self.model.n_features_in_)
+
+    def predict(self, indptr: np.ndarray, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+        """(probabilities, votes, voters) for CSR rows; votes is None for a single model."""
+        if self.ensemble is None:
+            return self.predict_proba(indptr, indices), None, 1
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return self.ensemble.predict_sparse(indptr, indices)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                idle = self._retired and not self._in_flight
+            if idle:
+                self.close()
+
+    def predict_proba(self, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """Class probabilities for binary symptom rows given as CSR indptr/indices."""
+        if self.ensemble is not None:
+            return self.predict(indptr, indices)[0]
+        if self.engine is not None:
+            return self.engine.predict_proba_sparse(indptr, indices)
+        input_matrix = csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr),
+            shape=(len(indptr) - 1, len(self.symptom_to_idx))
+        )
+        return self.model.predict_proba(input_matrix)
+
+    def scoring_session(self, indices: np.ndarray) -> ScoringSession:
+        """Incremental scorer for one row, or None without a compiled engine."""
+        if self.ensemble is not None:
+            if self.ensemble.engine is None:
+                return None
+            return ScoringSession(self.ensemble.engine, indices, self.ensemble.member_trees)
+        return ScoringSession(self.engine, indices) if self.engine is not None else None
+
+    def retire(self):
+        """Mark the bundle replaced; it is closed now, or when its last running prediction ends."""
+        with self._lock:
+            self._retired = True
+            idle = not self._in_flight
+        if idle:
+            self.close()
+
+    def close(self):
+        """Release the ensemble's thread pool. Safe to call more than once."""
+        if self.ensemble is not None:
+            self.ensemble.close()
+
 class MLService:
-    def __init__(self, model_path: str, mappings_path: str):
-        self.model = None
-        self.symptom_to_idx = {}
-        self.idx_to_disease = {}
-        self.normalized_symptoms = {}  # Clean name -> original key
+    def __init__(self, model_path: str, mappings_path: str, use_flat_engine: bool = False,
+                 cache_size: int = 4096, cache_ttl: float = 0,
+                 artifact_path: str = None, verify_artifact: bool = False,
+                 shared_model: str = None, ensemble_path: str = None,
+                 ensemble_budget_ms: float = 0, compact_precision: str = None,
+                 max_scoring_sessions: int = 1024):
+        self.model_path = model_path
+        self.mappings_path = mappings_path
+        self.artifact_path = artifact_path  # Memory-mapped .forest artifact, preferred over pickle
+        self.verify_artifact = verify_artifact
+        self.shared_model = shared_model  # Shared memory block published by serve.py, preferred over files
+        self._shm = None
+        # Ensemble package from ML/train_ensemble.py; replaces the single model when set
+        self.ensemble_path = ensemble_path
+        self.ensemble_budget_ms = ensemble_budget_ms
+        self.use_flat_engine = use_flat_engine
+        # Quantize pickled models into a CompactForest ("float16" or "uint8"); artifacts carry their own kind
+        self.compact_precision = compact_precision
+        self.bundle: ModelBundle = None  # Active model; replaced atomically by reload()
+        # Top-k results keyed by (model_version, top_k, symptom indices)
+        self.cache = PredictionCache(cache_size, cache_ttl)
+        
+        # Q&A sessions being re-scored incrementally: key -> (bundle, ScoringSession), least recent first
+        self.max_scoring_sessions = max_scoring_sessions
+        self._scoring_sessions: OrderedDict = OrderedDict()
+        self._scoring_lock = threading.Lock()
+        self.full_rescores = 0  # Re-scores that had to traverse every tree
+        self.incremental_updates = 0
+        self.trees_rescored = 0.0  # Sum over incremental updates of the share of trees walked again
+        
+        # Reload bookkeeping
+        self._reload_lock = threading.Lock()
+        self._disk_signature = None  # Model files as of the last load attempt
+        self.reloads = 0
+        self.reload_failures = 0
+        self.last_reload_error = None
         
+        self.load_model()
+
+    # The active bundle's fields, for callers that predate hot reload
+    @property
+    def model(self):
+        return self.bundle.model
+
+    @property
+    def engine(self):
+        return self.bundle.engine
+
+    @property
+    def model_version(self) -> str:
+        return self.bundle.version
+
+    @property
+    def model_source(self) -> str:
+        return self.bundle.source
+
+    @property
+    def symptom_to_idx(self) -> dict:
+        return self.bundle.symptom_to_idx
+
+    @property
+    def idx_to_disease(self) -> dict:
+        return self.bundle.idx_to_disease
+
+    @property
+    def resolver(self) -> SymptomResolver:
+        return self.bundle.resolver
+
+    @property
+    def normalized_symptoms(self) -> dict:
+        return self.bundle.resolver.normalized_symptoms
+
+    def load_model(self):
+        """Load model and mappings from disk, replacing any cached predictions."""
         try:
-            with open(model_path, 'rb') as f:
-                self.model = pickle.load(f)
-                
-            with open(mappings_path, 'rb') as f:
-                mappings = pickle.load(f)
-                
-            self.symptom_to_idx = mappings['symptom_to_idx']
-            self.idx_to_disease = mappings['idx_to_disease']
-            
-            # Pre-build normalized lookup: clean versions -> original key
-            for original_key, idx in self.symptom_to_idx.items():
-                # Normalize: strip spaces, lowercase, replace underscore with space
-                clean = original_key.strip().lower().replace('_', ' ')
-                self.normalized_symptoms[clean] = original_key
-                # Also store underscore version
-                self.normalized_symptoms[clean.replace(' ', '_')] = original_key
-                # Also store just the key words (for partial matching)
-                words = clean.split()
-                for word in words:
-                    if len(word) > 3:  # Only meaningful words
-                        if word not in self.normalized_symptoms:
-                            self.normalized_symptoms[word] = original_key
-            
-            logger.info(f"ML Model loaded with {len(self.symptom_to_idx)} symptoms, {len(self.normalized_symptoms)} normalized variants")
-            
+            self._disk_signature = self.disk_signature()
+            bundle = self._attach_shared() if self.shared_model and not self.ensemble_path else None
+            self._activate(bundle or self._load_from_files())
         except Exception as e:
             logger.error(f"Error loading ML assets: {e}")
             raise e
 
+    def _activate(self, bundle: ModelBundle):
+        # A single reference assignment: in-flight predictions keep the bundle they started with
+        previous, self.bundle = self.bundle, bundle
+        self.cache.clear()
+        with self._scoring_lock:
+            self._scoring_sessions.clear()
+        if previous is not None:
+            previous.retire()
+        logger.info(f"ML Model {bundle.version} loaded from {bundle.source} with {len(bundle.symptom_to_idx)} symptoms, {len(bundle.resolver.normalized_symptoms)} normalized variants")
+
+    def _load_from_files(self) -> ModelBundle:
+        if self.ensemble_path:
+            return self._load_ensemble()
+        bundle = None
+        if self.artifact_path and os.path.exists(self.artifact_path):
+            bundle = self._load_artifact()
+        return bundle or self._load_pickle()
+
+    def disk_signature(self) -> tuple:
+        """(path, mtime, size) of each model file, used to notice retrained models."""
+        signature = []
+        paths = (self.ensemble_path,) if self.ensemble_path else (self.model_path, self.mappings_path, self.artifact_path)
+        for path in paths:
+            if path and os.path.exists(path):
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def changed_on_disk(self) -> bool:
+        """True if the model files changed since the last load attempt."""
+        return self.disk_signature() != self._disk_signature
+
+    def reload(self) -> dict:
+        """
+        Load the model files again, smoke-test the result, then swap it in.
+        The current model keeps serving during the load and stays active if
+        the new one fails to load or validate. Always loads from files: a
+        shared memory block is fixed for the lifetime of serve.py.
+        """
+        with self._reload_lock:
+            previous = self.bundle.version
+            self._disk_signature = self.disk_signature()
+            start = time.perf_counter()
+            candidate = None
+            try:
+                candidate = self._load_from_files()
+                self.validate(candidate)
+            except Exception as e:
+                if candidate is not None:
+                    candidate.close()
+                self.reload_failures += 1
+                self.last_reload_error = str(e)
+                logger.error(f"Model reload failed, keeping {previous}: {e}")
+                return {"reloaded": False, "model_version": previous, "error": str(e)}
+            if candidate.version == previous:
+                # Same model files (e.g. only touched): nothing to swap in
+                candidate.close()
+                return {"reloaded": False, "model_version": previous, "error": "Model files are unchanged"}
+            
+            self._activate(candidate)
+            self.reloads += 1
+            self.last_reload_error = None
+            return {
+                "reloaded": True,
+                "model_version": candidate.version,
+                "previous_version": previous,
+                "load_seconds": round(time.perf_counter() - start, 3)
+            }
+
+    @staticmethod
+    def validate(bundle: ModelBundle, n_rows: int = 32):
+        """Smoke-test a freshly loaded bundle on a probe batch; raises ValueError on failure."""
+        n_features = len(bundle.symptom_to_idx)
+        if bundle.n_features != n_features:
+            raise ValueError(f"Model expects {bundle.n_features} features but mappings define {n_features}")
+        if bundle.n_classes != len(bundle.idx_to_disease):
+            raise ValueError(f"Model has {bundle.n_classes} classes but mappings define {len(bundle.idx_to_disease)}")
+        
+        rng = np.random.default_rng(0)
+        rows = [np.flatnonzero(rng.random(n_features) < 0.05).astype(np.int32) for _ in range(n_rows)]
+        indptr = np.concatenate(([0], np.cumsum([len(r) for r in rows]))).astype(np.int64)
+        probabilities = bundle.predict_proba(indptr, np.concatenate(rows))
+        if probabilities.shape != (n_rows, bundle.n_classes):
+            raise ValueError(f"Probe batch returned shape {probabilities.shape}")
+        if not np.all(np.isfinite(probabilities)) or not np.allclose(probabilities.sum(axis=1), 1.0):
+            raise ValueError("Probe batch returned invalid probabilities")
+        
+        # Every symptom name must resolve to a valid column
+        for _, original_key, _ in bundle.resolver.resolve_many(list(bundle.symptom_to_idx)[:n_rows]):
+            if not 0 <= bundle.symptom_to_idx[original_key] < n_features:
+                raise ValueError(f"Symptom {original_key!r} maps outside the feature range")
+
+    def reload_stats(self) -> dict:
+        return {
+            "loaded_at": self.bundle.loaded_at,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "last_reload_error": self.last_reload_error,
+        }
+
+    def _attach_shared(self) -> ModelBundle:
+        """Attach to the model published in shared memory. Returns None to fall back to files."""
+        try:
+            engine, mappings, header, shm = attach_shared(self.shared_model)
+        except Exception as e:
+            logger.warning(f"Could not attach shared model {self.shared_model}, falling back to files: {e}")
+            return None
+        
+        self._shm = shm  # Keeps the mapping alive while the engine uses it
+        return self._artifact_bundle(engine, mappings, header, "shared")
+
+    @staticmethod
+    def _artifact_bundle(engine, mappings: dict, header: dict, source: str) -> ModelBundle:
+        version = header.get('model_version') or header['payload_sha256'][:12]
+        return ModelBundle(None, engine, mappings['symptom_to_idx'], mappings['idx_to_disease'], version, source)
+
+    def _load_artifact(self) -> ModelBundle:
+        """Memory-map the exported forest artifact. Returns None to fall back to pickle."""
+        try:
+            engine, mappings, header = load_artifact(self.artifact_path, verify=self.verify_artifact)
+        except Exception as e:
+            logger.warning(f"Could not load model artifact {self.artifact_path}, falling back to pickle: {e}")
+            return None
+        
+        # An artifact exported from an older pickle would hide a retrained model
+        if header.get('model_version') and os.path.exists(self.model_path) and os.path.exists(self.mappings_path):
+            pickle_version = file_version(self.model_path, self.mappings_path)
+            if header['model_version'] != pickle_version:
+                logger.warning(f"Model artifact {self.artifact_path} was exported from model {header['model_version']} "
+                               f"but the pickle is {pickle_version}; loading the pickle (re-export with model_artifact.py)")
+                return None
+        return self._artifact_bundle(engine, mappings, header, "artifact")
+
+    def _load_pickle(self) -> ModelBundle:
+        with open(self.model_path, 'rb') as f:
+            model = pickle.load(f)
+            
+        with open(self.mappings_path, 'rb') as f:
+            mappings = pickle.load(f)
+            
+        engine = self._compile_engine(model, len(mappings['symptom_to_idx'])) if self.use_flat_engine else None
+        if engine is not None and self.compact_precision:
+            engine = self._compact_engine(engine, model, len(mappings['symptom_to_idx']))
+        return ModelBundle(model, engine, mappings['symptom_to_idx'], mappings['idx_to_disease'],
+                           file_version(self.model_path, self.mappings_path), "pickle")
+
+    def _load_ensemble(self) -> ModelBundle:
+        with open(self.ensemble_path, 'rb') as f:
+            package = pickle.load(f)
+        
+        mappings = package['mappings']
+        if isinstance(mappings, (tuple, list)):
+            # create_training_data() order: symptom_to_idx, idx_to_symptom, disease_to_idx, idx_to_disease
+            mappings = {'symptom_to_idx': mappings[0], 'idx_to_disease': mappings[3]}
+        
+        ensemble = ForestEnsemble(package['models'], len(mappings['idx_to_disease']),
+                                  use_flat_engine=self.use_flat_engine,
+                                  latency_budget_ms=self.ensemble_budget_ms)
+        return ModelBundle(None, None, mappings['symptom_to_idx'], mappings['idx_to_disease'],
+                           file_version(self.ensemble_path), "ensemble", ensemble=ensemble)
+
+    @staticmethod
+    def _compile_engine(model, n_features: int):
+        """Compile the forest into flat arrays and verify it against sklearn."""
+        engine = FlatForest.from_sklearn(model)
+        rng = np.random.default_rng(0)
+        probe = (rng.random((32, n_features)) < 0.05).astype(np.float32)
+        if not engine.matches(model, probe):
+            logger.error("Flat engine output differs from sklearn, falling back to predict_proba")
+            return None
+        logger.info(f"Flat engine compiled: {engine.n_trees} trees, {len(engine.feature)} nodes")
+        return engine
+
+    def _compact_engine(self, engine: FlatForest, model, n_features: int) -> FlatForest:
+        """Quantize a compiled forest; keeps the exact engine if top-3 rankings would change."""
+        try:
+            compact = CompactForest.from_flat(engine, self.compact_precision)
+        except ValueError as e:
+            logger.error(f"Cannot compact the model, keeping the flat engine: {e}")
+            return engine
+        rng = np.random.default_rng(0)
+        probe = (rng.random((256, n_features)) < 0.05).astype(np.float32)
+        if not compact.matches(model, probe, k=3):
+            logger.error("Compact engine changes top-3 rankings, keeping the flat engine")
+            return engine
+        logger.info(f"Compact engine: {compact.nbytes() / 1e6:.1f} MB ({self.compact_precision}), max error {compact.max_error:.2e}")
+        return compact
+
+    def warm_up(self):
+        """Run one uncached prediction so the first real request pays no first-call costs."""
+        bundle = self.bundle
+        bundle.resolver.resolve(next(iter(bundle.symptom_to_idx)))
+        bundle.predict(np.array([0, 1], dtype=np.int64), np.array([0], dtype=np.int32))
+
+    def resolve_indices(self, symptoms: list[str], bundle: ModelBundle = None) -> np.ndarray:
+        """Resolve raw symptoms to the sorted, unique feature indices they activate."""
+        bundle = bundle or self.bundle
+        matched = []
+        strategies = []
+        indices = set()
+        for _, original_key, strategy in bundle.resolver.resolve_many(symptoms):
+            indices.add(bundle.symptom_to_idx[original_key])
+            matched.append(original_key.strip())
+            strategies.append(strategy)
+
+        logger.debug(f"Matched {len(matched)} symptoms: {list(zip(matched, strategies))}")
+        return np.array(sorted(indices), dtype=np.int32)
+
     def predict(self, symptoms: list[str]) -> tuple[list[dict], float]:
         """Predicts disease based on symptoms."""
-        try:
-            input_vector = np.zeros((1, len(self.symptom_to_idx)))
-            matched = []
-
-            for s in symptoms:
-                # Normalize user input
-                clean_s = s.strip().lower().replace('_', ' ')
-                
-                original_key = None
-                
-                # Strategy 1: Direct lookup
-                if clean_s in self.normalized_symptoms:
-                    original_key = self.normalized_symptoms[clean_s]
-                
-                # Strategy 2: Underscore version
-                if not original_key:
-                    underscore_s = clean_s.replace(' ', '_')
-                    if underscore_s in self.normalized_symptoms:
-                        original_key = self.normalized_symptoms[underscore_s]
-                
-                # Strategy 3: Keyword extraction
-                # "Itching of skin" -> try "itching", "skin"
-                if not original_key:
-                    words = clean_s.split()
-                    for word in words:
-                        if word in self.normalized_symptoms:
-                            original_key = self.normalized_symptoms[word]
-                            break
-                
-                # Strategy 4: Partial match
-                if not original_key:
-                    for norm_key, orig_key in self.normalized_symptoms.items():
-                        if clean_s in norm_key or norm_key in clean_s:
-                            original_key = orig_key
-                            break
-                
-                if original_key:
-                    idx = self.symptom_to_idx[original_key]
-                    input_vector[0, idx] = 1
-                    matched.append(original_key.strip())
-
-            logger.info(f"Matched {len(matched)} symptoms: {matched}")
-
-            if not matched:
-                return [{"name": "No symptoms recognized", "prob": 0}], 0.0
-
-            # Predict
-            probabilities = self.model.predict_proba(input_vector)[0]
-            sorted_indices = probabilities.argsort()[::-1]
-
-            results = []
-            for i in range(3):
-                idx = sorted_indices[i]
-                prob = probabilities[idx]
-                results.append({
-                    "name": self.idx_to_disease[idx].title(),
-                    "prob": float(prob * 100)
-                })
-
-            return results, results[0]['prob']
+        return self.predict_batch([symptoms])[0]
 
+    def predict_batch(self, symptom_lists: list[list[str]], top_k: int = 3) -> list[tuple[list[dict], float]]:
+        """
+        Predicts diseases for many symptom lists with a single model call.
+        Returns one (top_k results, top confidence) tuple per input row.
+        """
+        bundle = self.bundle  # Resolve and predict against the same model version
+        try:
+            index_sets = [self.resolve_indices(symptoms, bundle) for symptoms in symptom_lists]
+            logger.info(f"Scoring {len(index_sets)} case(s), {sum(map(len, index_sets))} matched symptoms")
+            return self.predict_indices_batch(index_sets, top_k, bundle)
         except Exception as e:
             logger.error(f"Prediction error: {e}")
-            return [{"name": f"Error: {str(e)[:50]}", "prob": 0}], 0.0
+            return [([{"name": f"Error: {str(e)[:50]}", "prob": 0}], 0.0) for _ in symptom_lists]
+
+    def predict_indices_batch(self, index_sets: list[np.ndarray], top_k: int = 3,
+                              bundle: ModelBundle = None) -> list[tuple[list[dict], float]]:
+        """
+        Predicts diseases for rows given as sorted symptom index arrays.
+        Rows travel as CSR indptr/indices all the way to the model, so no
+        dense (rows, n_symptoms) matrix is ever built.
+        """
+        bundle = bundle or self.bundle
+        outputs = [([{"name": "No symptoms recognized", "prob": 0}], 0.0) for _ in index_sets]
+        keys = {}
+        for row, indices in enumerate(index_sets):
+            if not len(indices):
+                continue
+            key = (bundle.version, top_k, tuple(np.asarray(indices).tolist()))
+            cached = self.cache.get(key)
+            if cached is not None:
+                outputs[row] = self._copy_output(cached)
+            else:
+                keys[row] = key
+        if not keys:
+            return outputs
+
+        # Predict all uncached rows at once
+        matched_rows = list(keys)
+        lengths = [len(index_sets[row]) for row in matched_rows]
+        indptr = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        indices = np.concatenate([index_sets[row] for row in matched_rows])
+        probabilities, votes, voters = bundle.predict(indptr, indices)
+
+        for i, row in enumerate(matched_rows):
+            output = self._top_k(bundle, probabilities[i], top_k, None if votes is None else votes[i], voters)
+            self.cache.put(keys[row], self._copy_output(output))
+            outputs[row] = output
+
+        return outputs
+
+    @staticmethod
+    def _top_k(bundle: ModelBundle, row_probs: np.ndarray, top_k: int,
+               row_votes: np.ndarray = None, voters: int = 1) -> tuple[list[dict], float]:
+        results = []
+        for idx in row_probs.argsort()[::-1][:top_k]:
+            result = {
+                "name": bundle.idx_to_disease[idx].title(),
+                "prob": float(row_probs[idx] * 100)
+            }
+            if row_votes is not None:
+                # Ensemble agreement: members whose top prediction is this disease
+                result["votes"] = int(row_votes[idx])
+                result["voters"] = voters
+            results.append(result)
+        return results, results[0]['prob']
+
+    def rescore(self, key, indices: np.ndarray, top_k: int = 3) -> tuple[list[dict], float]:
+        """
+        Score a Q&A session's current symptom indices.
+        The session's per-tree leaf assignments are kept under key, so when
+        answers add or remove symptoms only the trees that split on them are
+        traversed again. Sessions are dropped least-recently-used and after
+        a model reload; without a compiled engine this is a full prediction.
+        """
+        bundle = self.bundle
+        if not len(indices):
+            return [{"name": "No symptoms recognized", "prob": 0}], 0.0
+        
+        with self._scoring_lock:
+            entry = self._scoring_sessions.get(key)
+            if entry is not None and entry[0] is bundle:
+                self._scoring_sessions.move_to_end(key)
+                session = entry[1]
+            else:
+                session = None
+        
+        if session is None:
+            session = bundle.scoring_session(indices)
+            if session is None:
+                return self.predict_indices_batch([indices], top_k, bundle)[0]
+            self.full_rescores += 1
+            with self._scoring_lock:
+                self._scoring_sessions[key] = (bundle, session)
+                self._scoring_sessions.move_to_end(key)
+                while len(self._scoring_sessions) > self.max_scoring_sessions:
+                    self._scoring_sessions.popitem(last=False)
+        
+        updates, trees = session.updates, session.trees_rescored
+        probabilities, votes, voters = session.set_features(indices)
+        if session.updates != updates:
+            self.incremental_updates += 1
+            self.trees_rescored += (session.trees_rescored - trees) / session.engine.n_trees
+        return self._top_k(bundle, probabilities[0], top_k, None if votes is None else votes[0], voters)
+
+    def close(self):
+        """Release the active model's resources at shutdown."""
+        self.bundle.close()
+
+    def end_session(self, key):
+        """Drop a finished Q&A session's scoring state."""
+        with self._scoring_lock:
+            self._scoring_sessions.pop(key, None)
+
+    def rescoring_stats(self) -> dict:
+        updates = self.incremental_updates
+        return {
+            "sessions": len(self._scoring_sessions),
+            "max_sessions": self.max_scoring_sessions,
+            "full_rescores": self.full_rescores,
+            "incremental_updates": updates,
+            # Mean share of the forest walked again per incremental update
+            "trees_rescored_fraction": round(self.trees_rescored / updates, 4) if updates else None,
+        }
+
+    @staticmethod
+    def _copy_output(output: tuple[list[dict], float]) -> tuple[list[dict], float]:
+        """Copy result dicts so callers never mutate cached entries."""
+        results, confidence = output
+        return [dict(r) for r in results], confidence
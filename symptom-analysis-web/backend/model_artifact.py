@@ -0,0 +1,266 @@
+"""
+Memory-mappable model artifact format.
+
+Layout of a .forest file:
+    magic (8 bytes) | header length (uint64 LE) | JSON header | padding | payload
+
+The JSON header records the format version, model version, symptom/disease
+mappings, and the dtype, shape and payload offset of every node array. Each
+array starts on a 64-byte boundary so it can be mapped read-only with
+np.memmap; workers mapping the same file share its page-cache memory.
+The payload is covered by a SHA-256 checksum stored in the header.
+The header's "kind" says which engine the arrays belong to: "flat_forest"
+(FlatForest) or "compact_forest" (CompactForest, quantized leaves).
+The same layout can be published into a multiprocessing shared memory block
+(publish_shared / attach_shared) for multi-worker serving, see serve.py.
+
+Export from the pickled model:
+    python model_artifact.py --model ../../ML/model_100percent.pkl \
+        --mappings ../../ML/mappings_100percent.pkl --out ../../ML/model_100percent.forest
+    (add --compact float16 to export the quantized CompactForest instead)
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import struct
+import sys
+from multiprocessing import shared_memory
+import numpy as np
+from forest_engine import FlatForest
+from compact_forest import PRECISIONS, CompactForest
+
+MAGIC = b"NIDANFST"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREFIX = struct.Struct("<8sQ")
+
+
+class ArtifactError(ValueError):
+    """Raised when an artifact is missing, truncated, corrupt or of an unknown version."""
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _plan(engine: FlatForest, symptom_to_idx: dict, idx_to_disease: dict,
+          model_version: str = None) -> tuple[bytes, dict, dict, int]:
+    """Lay out an artifact. Returns (header_bytes, header, arrays, payload_start)."""
+    arrays = {name: np.ascontiguousarray(a) for name, a in engine.to_arrays().items()}
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        layout[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+            "nbytes": int(array.nbytes),
+        }
+        offset += array.nbytes
+    payload_size = offset
+
+    digest = hashlib.sha256()
+    position = 0
+    for name, array in arrays.items():
+        start = layout[name]["offset"]
+        digest.update(b"\0" * (start - position))
+        digest.update(array.tobytes())
+        position = start + array.nbytes
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "kind": "compact_forest" if isinstance(engine, CompactForest) else "flat_forest",
+        "model_version": model_version,
+        "n_features": engine.n_features,
+        "n_classes": engine.n_classes,
+        "n_trees": engine.n_trees,
+        "max_depth": engine.max_depth,
+        "payload_size": payload_size,
+        "payload_sha256": digest.hexdigest(),
+        "arrays": layout,
+        "symptom_to_idx": {key: int(idx) for key, idx in symptom_to_idx.items()},
+        "idx_to_disease": [[int(i), name] for i, name in idx_to_disease.items()],
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    return header_bytes, header, arrays, _align(_PREFIX.size + len(header_bytes))
+
+
+def export_artifact(engine: FlatForest, symptom_to_idx: dict, idx_to_disease: dict,
+                    path: str, model_version: str = None) -> dict:
+    """Write a compiled forest and its mappings to path (atomically). Returns the header."""
+    header_bytes, header, arrays, payload_start = _plan(engine, symptom_to_idx, idx_to_disease, model_version)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (payload_start - _PREFIX.size - len(header_bytes)))
+        position = 0
+        for name, array in arrays.items():
+            start = header["arrays"][name]["offset"]
+            f.write(b"\0" * (start - position))
+            f.write(array.tobytes())
+            position = start + array.nbytes
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return header
+
+
+def publish_shared(engine: FlatForest, symptom_to_idx: dict, idx_to_disease: dict,
+                   model_version: str = None, name: str = None) -> shared_memory.SharedMemory:
+    """
+    Copy an artifact into a new shared memory block (same layout as the file).
+    The caller owns the block and must close() and unlink() it on shutdown.
+    """
+    header_bytes, header, arrays, payload_start = _plan(engine, symptom_to_idx, idx_to_disease, model_version)
+    shm = shared_memory.SharedMemory(name=name, create=True, size=payload_start + header["payload_size"])
+    shm.buf[:_PREFIX.size] = _PREFIX.pack(MAGIC, len(header_bytes))
+    shm.buf[_PREFIX.size:_PREFIX.size + len(header_bytes)] = header_bytes
+    for array_name, array in arrays.items():
+        spec = header["arrays"][array_name]
+        target = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=payload_start + spec["offset"])
+        target[...] = array
+        del target
+    return shm
+
+
+def parse_header(prefix: bytes) -> tuple[dict, int]:
+    """Parse the header from the start of an artifact. Returns (header, payload_start)."""
+    if len(prefix) < _PREFIX.size:
+        raise ArtifactError("Artifact is truncated")
+    magic, header_len = _PREFIX.unpack_from(prefix)
+    if magic != MAGIC:
+        raise ArtifactError("Not a model artifact (bad magic)")
+    if len(prefix) < _PREFIX.size + header_len:
+        raise ArtifactError("Artifact header is truncated")
+    header = json.loads(prefix[_PREFIX.size:_PREFIX.size + header_len].decode("utf-8"))
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format version {header.get('format_version')}")
+    return header, _align(_PREFIX.size + header_len)
+
+
+def _read_header(path: str) -> tuple[dict, int]:
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) == _PREFIX.size:
+            _, header_len = _PREFIX.unpack(prefix)
+            prefix += f.read(header_len)
+    return parse_header(prefix)
+
+
+def _build(header: dict, arrays: dict) -> tuple[FlatForest, dict]:
+    kind = header.get("kind", "flat_forest")
+    if kind == "compact_forest":
+        engine = CompactForest.from_arrays(arrays, n_features=header["n_features"], max_depth=header["max_depth"],
+                                           n_classes=header["n_classes"])
+    elif kind == "flat_forest":
+        engine = FlatForest.from_arrays(arrays, n_features=header["n_features"], max_depth=header["max_depth"])
+    else:
+        raise ArtifactError(f"Unknown artifact kind {kind!r}")
+    mappings = {
+        "symptom_to_idx": header["symptom_to_idx"],
+        "idx_to_disease": {int(i): name for i, name in header["idx_to_disease"]},
+    }
+    return engine, mappings
+
+
+def load_artifact(path: str, verify: bool = False) -> tuple[FlatForest, dict, dict]:
+    """
+    Map an artifact read-only. Returns (engine, mappings, header).
+    With verify=True the payload checksum is checked first (reads the whole file).
+    """
+    header, payload_start = _read_header(path)
+    if os.path.getsize(path) < payload_start + header["payload_size"]:
+        raise ArtifactError("Artifact payload is truncated")
+
+    if verify:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            f.seek(payload_start)
+            remaining = header["payload_size"]
+            while remaining:
+                chunk = f.read(min(remaining, 1 << 20))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+        if digest.hexdigest() != header["payload_sha256"]:
+            raise ArtifactError("Artifact checksum mismatch")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        arrays[name] = np.memmap(path, dtype=np.dtype(spec["dtype"]), mode="r",
+                                 offset=payload_start + spec["offset"], shape=tuple(spec["shape"]))
+    engine, mappings = _build(header, arrays)
+    return engine, mappings, header
+
+
+def attach_shared(name: str) -> tuple[FlatForest, dict, dict, shared_memory.SharedMemory]:
+    """
+    Attach to a block created by publish_shared without copying. Returns
+    (engine, mappings, header, shm); keep shm referenced while the engine is in use.
+    """
+    if sys.version_info >= (3, 13):
+        # Only the publishing process may unlink the block
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        # Older versions always register the block with the resource tracker.
+        # Workers spawned by the publisher share its tracker, where the entry
+        # already exists, so nothing is unlinked when a worker exits.
+        shm = shared_memory.SharedMemory(name=name)
+
+    header_len = _PREFIX.unpack_from(shm.buf)[1]
+    header, payload_start = parse_header(bytes(shm.buf[:_PREFIX.size + header_len]))
+    arrays = {}
+    for array_name, spec in header["arrays"].items():
+        array = np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=shm.buf,
+                           offset=payload_start + spec["offset"])
+        array.flags.writeable = False
+        arrays[array_name] = array
+    engine, mappings = _build(header, arrays)
+    return engine, mappings, header, shm
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a pickled RandomForest to a memory-mappable artifact")
+    parser.add_argument("--model", required=True, help="Path to the pickled RandomForestClassifier")
+    parser.add_argument("--mappings", required=True, help="Path to the pickled symptom/disease mappings")
+    parser.add_argument("--out", required=True, help="Output .forest path")
+    parser.add_argument("--compact", choices=sorted(PRECISIONS),
+                        help="Export a CompactForest with leaf probabilities quantized to this type")
+    args = parser.parse_args()
+
+    from ml_service import file_version
+
+    with open(args.model, "rb") as f:
+        model = pickle.load(f)
+    with open(args.mappings, "rb") as f:
+        mappings = pickle.load(f)
+
+    engine = FlatForest.from_sklearn(model)
+    if args.compact:
+        engine = CompactForest.from_flat(engine, args.compact)
+    header = export_artifact(engine, mappings["symptom_to_idx"], mappings["idx_to_disease"], args.out,
+                             model_version=file_version(args.model, args.mappings))
+
+    # Round-trip check against sklearn before declaring success
+    loaded, _, _ = load_artifact(args.out, verify=True)
+    rng = np.random.default_rng(0)
+    probe = (rng.random((64, engine.n_features)) < 0.05).astype(np.float32)
+    if not loaded.matches(model, probe):
+        raise SystemExit("❌ Exported artifact does not reproduce the model's predictions")
+
+    print(f"✅ Wrote {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB)")
+    print(f"   Model version: {header['model_version']}")
+    print(f"   Trees: {header['n_trees']}, classes: {header['n_classes']}, features: {header['n_features']}")
+    if args.compact:
+        print(f"   Leaf probabilities: {args.compact}, max error {engine.max_error:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Async micro-batching for ML predictions.
+Concurrent requests arriving within a short window are coalesced into a
+single MLService.predict_batch call, and each caller gets its own row back.
+"""
+import asyncio
+import logging
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionBatcher:
+    def __init__(self, predict_batch: Callable[[List[List[str]]], List[Tuple[list, float]]],
+                 window_ms: float = 2.0, max_batch_size: int = 64):
+        """
+        Args:
+            predict_batch: Function scoring a list of symptom lists in one call
+            window_ms: How long the first request of a batch waits for company
+            max_batch_size: Flush immediately once this many rows are queued
+        """
+        self.predict_batch = predict_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._pending: List[Tuple[List[str], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()  # Batches being scored; asyncio itself only keeps weak references
+
+        # Counters
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.batch_size_histogram = {}  # size bucket upper bound -> count
+
+    async def predict(self, symptoms: List[str]) -> Tuple[list, float]:
+        """Queue one prediction and wait for its batch to be scored."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((symptoms, future))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        self._record(len(batch))
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[List[str], asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        try:
+            # Model work runs off the event loop so new requests keep queueing
+            outputs = await loop.run_in_executor(None, self.predict_batch, [s for s, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Batched prediction failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), output in zip(batch, outputs):
+            if not future.done():
+                future.set_result(output)
+
+    async def aclose(self):
+        """Score what is still queued and wait for the batches in flight."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _record(self, size: int):
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, size)
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "batch_size_histogram": {f"<={k}": v for k, v in sorted(self.batch_size_histogram.items())},
+        }
@@ -0,0 +1,130 @@
+"""
+Local follow-up question selection.
+Uses precomputed P(symptom | disease) tables (ML/build_question_table.py) to
+pick the yes/no symptom question with the highest expected information gain
+about which of the current candidate diseases is correct. Every candidate
+symptom is scored at once with NumPy; no LLM call is needed. The wording of
+each question is built and stored with the table.
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from symptom_resolver import normalize_symptom
+
+QUESTION_TEMPLATE = "Are you experiencing {phrase}?"
+YES_ANSWERS = {"yes", "y", "yeah", "yep", "true", "sometimes", "a little"}
+NO_ANSWERS = {"no", "n", "nope", "false", "never", "not really"}
+WORD = re.compile(r"[a-z']+")
+CLAUSE_END = re.compile(r"[,.;:!?]|\s[-–—]")  # A spaced dash ends a clause; "no-one" does not
+
+
+def _entropy(p: np.ndarray, axis: int = 0) -> np.ndarray:
+    """Shannon entropy in bits along axis (0 * log 0 taken as 0)."""
+    logs = np.log2(np.where(p > 0, p, 1.0))
+    return -(p * logs).sum(axis=axis)
+
+
+def parse_answer(answer: str) -> Optional[bool]:
+    """
+    True for yes, False for no, None when the answer is not a clear yes/no.
+    The whole answer, or its first clause when punctuation follows ("no,
+    never"), must be one of the known answers; "not sure" or "no idea" is None.
+    """
+    text = str(answer).strip().lower()
+    phrases = {" ".join(WORD.findall(text)), " ".join(WORD.findall(CLAUSE_END.split(text, 1)[0]))}
+    for answers, value in ((YES_ANSWERS, True), (NO_ANSWERS, False)):
+        if phrases & answers:
+            return value
+    return None
+
+
+class QuestionEngine:
+    def __init__(self, likelihood: np.ndarray, disease_names: List[str], symptom_names: List[str],
+                 questions: Optional[List[str]] = None):
+        """
+        Args:
+            likelihood: (n_diseases, n_symptoms) P(symptom present | disease)
+            disease_names: Disease name of each row
+            symptom_names: Symptom key of each column
+            questions: Question asked for each column; QUESTION_TEMPLATE if not given
+        """
+        self.likelihood = np.clip(np.asarray(likelihood, dtype=np.float64), 1e-6, 1 - 1e-6)
+        self.symptom_names = list(symptom_names)
+        self.disease_rows = {name.strip().lower(): i for i, name in enumerate(disease_names)}
+        self.symptom_columns = {normalize_symptom(name): i for i, name in enumerate(self.symptom_names)}
+        self.questions = list(questions) if questions is not None else [
+            QUESTION_TEMPLATE.format(phrase=" ".join(normalize_symptom(name).split())) for name in self.symptom_names
+        ]
+        self._question_columns = {q: i for i, q in enumerate(self.questions)}
+
+    @classmethod
+    def from_file(cls, path: str) -> "QuestionEngine":
+        data = np.load(path)
+        # Tables built before questions were stored fall back to the template
+        questions = [str(q) for q in data["questions"]] if "questions" in data.files else None
+        return cls(data["likelihood"], [str(n) for n in data["disease_names"]],
+                   [str(n) for n in data["symptom_names"]], questions)
+
+    def _column(self, symptom: str) -> Optional[int]:
+        return self.symptom_columns.get(normalize_symptom(symptom))
+
+    def question_symptom(self, qa: Dict) -> Optional[str]:
+        """Symptom a Q&A entry asked about: its 'symptom' field, or a templated question we generated."""
+        if qa.get("symptom") and self._column(qa["symptom"]) is not None:
+            return self.symptom_names[self._column(qa["symptom"])]
+        column = self._question_columns.get(str(qa.get("question", "")).strip())
+        return self.symptom_names[column] if column is not None else None
+
+    def posterior(self, top_diseases: List[Dict], qa_history: Iterable[Dict] = ()) -> tuple:
+        """(disease rows, probabilities) over the known candidates, updated with yes/no answers."""
+        rows, prior = [], []
+        for d in top_diseases:
+            row = self.disease_rows.get(str(d.get("name", "")).strip().lower())
+            if row is not None and row not in rows:
+                rows.append(row)
+                prior.append(float(d.get("prob", d.get("probability", 0))) or 1e-3)
+        if not rows:
+            return np.array([], dtype=int), np.array([])
+
+        p = np.array(prior) / sum(prior)
+        for qa in qa_history:
+            symptom = self.question_symptom(qa)
+            answer = parse_answer(qa.get("answer", ""))
+            if symptom is None or answer is None:
+                continue
+            column = self.likelihood[rows, self._column(symptom)]
+            p = p * (column if answer else 1 - column)
+            p /= p.sum()
+        return np.array(rows), p
+
+    def select(self, top_diseases: List[Dict], known_symptoms: Iterable[str] = (),
+               qa_history: Iterable[Dict] = (), apply_answers: bool = True) -> Optional[Dict]:
+        """
+        Best next question for the candidate diseases, or None if the
+        candidates are unknown to the table. Symptoms already reported or
+        asked about are never chosen. Pass apply_answers=False when
+        top_diseases already reflect the answers (re-scored by the model).
+        """
+        qa_history = list(qa_history)
+        rows, p = self.posterior(top_diseases, qa_history if apply_answers else ())
+        if len(rows) < 2:
+            return None
+
+        L = self.likelihood[rows]                      # (k, n_symptoms)
+        p_yes = p @ L                                  # (n_symptoms,)
+        post_yes = p[:, np.newaxis] * L / p_yes
+        post_no = p[:, np.newaxis] * (1 - L) / (1 - p_yes)
+        gain = _entropy(p) - (p_yes * _entropy(post_yes) + (1 - p_yes) * _entropy(post_no))
+
+        excluded = [self._column(s) for s in known_symptoms]
+        excluded += [self._column(s) for s in map(self.question_symptom, qa_history) if s]
+        gain[[c for c in excluded if c is not None]] = -np.inf
+
+        best = int(np.argmax(gain))
+        if not np.isfinite(gain[best]):
+            return None
+        return {
+            "symptom": self.symptom_names[best],
+            "question": self.questions[best],
+            "information_gain": float(gain[best]),
+        }
@@ -0,0 +1,68 @@
+"""
+Precomputed base reports per disease (ML/build_report_library.py).
+Specialist, triage level and advice depend on the disease, not the
+patient, so the high-confidence path reads them from this table instead of
+asking the LLM. Only the reasoning mentions the patient's symptoms; it is
+filled from a template or, optionally, by a short LLM call.
+"""
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class ReportLibrary:
+    def __init__(self, reports: Dict[str, Dict], model: Optional[str] = None):
+        """
+        Args:
+            reports: Disease name -> {"specialist", "triage_level", "advice"}
+            model: LLM that wrote the library
+        """
+        self.reports = {name.strip().lower(): report for name, report in reports.items()}
+        self.model = model
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path: str) -> "ReportLibrary":
+        data = np.load(path)
+        specialists, triage_levels = data["specialists"], data["triage_levels"]
+        reports = {
+            str(name): {
+                "specialist": str(specialists[s]),
+                "triage_level": str(triage_levels[t]),
+                "advice": str(advice),
+            }
+            for name, s, t, advice, ok in zip(data["disease_names"], data["specialist_idx"], data["triage_idx"],
+                                              data["advice"], data["valid"])
+            if ok
+        }
+        return cls(reports, str(data["model"]) if "model" in data else None)
+
+    def __len__(self) -> int:
+        return len(self.reports)
+
+    def base_report(self, symptoms: List[str], top_diseases: List[Dict]) -> Optional[dict]:
+        """High-confidence report for the top disease, or None if it is not in the library."""
+        disease = top_diseases[0]["name"] if top_diseases else None
+        entry = self.reports.get(str(disease).strip().lower()) if disease else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {
+            "disease": disease,
+            "triage_level": entry["triage_level"],
+            "confidence": "High",
+            "specialist": entry["specialist"],
+            "reasoning": f"Your symptoms ({', '.join(symptoms)}) closely match the pattern of {disease}. "
+                         f"Please confirm with a healthcare professional.",
+            "advice": entry["advice"],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "diseases": len(self.reports),
+            "model": self.model,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,58 @@
+"""
+Multi-worker launcher with a single shared copy of the model.
+
+The parent process loads the model once (artifact or pickle), publishes the
+compiled forest and mappings into a shared memory block, and starts uvicorn
+workers. Each worker attaches to that block through ML_SHARED_MODEL instead
+of loading its own copy, so resident memory stays flat as workers are added.
+
+Usage:
+    python serve.py --workers 8 --port 8000
+"""
+import argparse
+import os
+import uvicorn
+from ml_service import MLService
+from model_artifact import publish_shared
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ML_PATH = os.path.join(os.path.dirname(os.path.dirname(BACKEND_DIR)), "ML")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API on several workers sharing one model copy")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if os.getenv("ML_ENSEMBLE_PATH"):
+        # The shared block holds a single forest; ensemble workers load their own members
+        print("⚠️  ML_ENSEMBLE_PATH is set, starting workers without a shared model")
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+        return
+
+    service = MLService(
+        os.path.join(ML_PATH, "model_100percent.pkl"),
+        os.path.join(ML_PATH, "mappings_100percent.pkl"),
+        use_flat_engine=True,
+        artifact_path=os.getenv("ML_ARTIFACT_PATH", os.path.join(ML_PATH, "model_100percent.forest")),
+        compact_precision=os.getenv("ML_COMPACT_PRECISION") or None
+    )
+    if service.engine is None:
+        raise SystemExit("❌ Shared serving needs the flat engine, but the model could not be compiled")
+
+    shm = publish_shared(service.engine, service.symptom_to_idx, service.idx_to_disease, service.model_version)
+    del service  # The parent no longer needs its private copy
+    print(f"✅ Model published to shared memory '{shm.name}' ({shm.size / 1e6:.1f} MB)")
+
+    os.environ["ML_SHARED_MODEL"] = shm.name
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+if __name__ == "__main__":
+    main()
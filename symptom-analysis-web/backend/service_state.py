@@ -0,0 +1,63 @@
+"""
+Background loading and readiness tracking for backend components.
+Each component is built off the event loop so the app can accept requests
+(and answer health checks) while models and clients are still loading.
+"""
+import asyncio
+import time
+from typing import Any, Callable, Optional
+
+
+class ComponentDisabled(Exception):
+    """Raised by a component factory when the component is intentionally not configured."""
+
+
+class ComponentState:
+    def __init__(self, name: str, required: bool = True):
+        """
+        Args:
+            name: Component name shown by /readyz
+            required: Whether the app is unready until this component is loaded
+        """
+        self.name = name
+        self.required = required
+        self.status = "pending"  # pending -> loading -> ready | failed | disabled
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.ready_at: Optional[float] = None
+
+    async def load(self, factory: Callable[[], Any], warm_up: Callable[[Any], None] = None) -> Optional[Any]:
+        """Build the component in a worker thread. Returns it, or None if loading failed."""
+        self.status = "loading"
+        start = time.perf_counter()
+        try:
+            component = await asyncio.to_thread(factory)
+            if warm_up:
+                await asyncio.to_thread(warm_up, component)
+        except ComponentDisabled as e:
+            self.status = "disabled"
+            self.error = str(e)
+            return None
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            print(f"Failed to load {self.name}: {e}")
+            return None
+        finally:
+            self.load_seconds = time.perf_counter() - start
+
+        self.status = "ready"
+        self.ready_at = time.time()
+        return component
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready" or (not self.required and self.status in ("disabled", "failed"))
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "required": self.required,
+            "load_seconds": round(self.load_seconds, 4) if self.load_seconds is not None else None,
+            "error": self.error,
+        }
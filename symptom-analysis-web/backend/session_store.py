@@ -0,0 +1,146 @@
+"""
+In-process store for low-confidence Q&A sessions.
+/diagnose opens a session holding everything the follow-up steps need
+(resolved symptoms, model output, asked questions), so /ask only sends
+{session_id, answer}. Sessions expire after a TTL of inactivity and the
+store is bounded; the least recently used session is evicted first.
+While the last question is pending, a session may hold speculative final
+reports (one per likely answer); they are cancelled when it is removed.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class QASession:
+    __slots__ = (
+        "session_id", "user_id", "symptoms", "indices", "top_diseases", "confidence",
+        "qa_history", "question", "question_symptom", "model_version", "question_tree", "prefetch", "created_at", "touched_at",
+    )
+
+    def __init__(self, session_id: str, symptoms: List[str], indices, top_diseases: List[Dict],
+                 confidence: float, question: str, question_symptom: Optional[str] = None,
+                 model_version: Optional[str] = None, user_id: Optional[str] = None):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.symptoms = symptoms
+        self.indices = indices  # Resolved symptom indices (np.int32), the re-scoring baseline
+        self.top_diseases = top_diseases  # Latest model output
+        self.confidence = confidence
+        self.qa_history: List[Dict] = []
+        self.question = question  # Question awaiting an answer
+        self.question_symptom = question_symptom
+        self.model_version = model_version
+        self.question_tree: Optional[Dict] = None  # LLM yes/no question tree; {} if generating it failed
+        self.prefetch: Dict = {}  # Parsed answer (True/False) -> (expected disease names, report task)
+        self.created_at = self.touched_at = time.monotonic()
+
+    @property
+    def question_number(self) -> int:
+        """Number of the question awaiting an answer."""
+        return len(self.qa_history) + 1
+
+    def answer_entry(self, answer: str) -> Dict:
+        """Q&A history entry for an answer to the pending question."""
+        entry = {"question": self.question, "answer": answer}
+        if self.question_symptom:
+            entry["symptom"] = self.question_symptom
+        return entry
+
+    def record_answer(self, answer: str) -> List[Dict]:
+        """Append the answer to the pending question and return the history."""
+        self.qa_history.append(self.answer_entry(answer))
+        self.question = self.question_symptom = None
+        return self.qa_history
+
+    def cancel_prefetch(self):
+        """Cancel speculative reports that are still being generated."""
+        for _, task in self.prefetch.values():
+            # Thread-safe: expired sessions can be purged from worker threads (e.g. /metrics)
+            task.get_loop().call_soon_threadsafe(task.cancel)
+        self.prefetch = {}
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 1800):
+        """
+        Args:
+            max_sessions: Maximum number of live sessions
+            ttl_seconds: Idle lifetime of a session; 0 means sessions never expire
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl_seconds
+        self._sessions: OrderedDict = OrderedDict()  # session_id -> QASession, least recently used first
+        self._lock = threading.Lock()
+
+        self.created = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, session: QASession, now: float) -> bool:
+        return bool(self.ttl) and now - session.touched_at > self.ttl
+
+    def _purge_expired(self, now: float):
+        # Least recently used first, so stop at the first live session
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if not self._expired(session, now):
+                break
+            self._sessions.popitem(last=False)[1].cancel_prefetch()
+            self.expirations += 1
+
+    def create(self, **fields) -> QASession:
+        """Open a session (fields as QASession) under a new random id."""
+        session = QASession(secrets.token_urlsafe(16), **fields)
+        with self._lock:
+            self._purge_expired(session.created_at)
+            self._sessions[session.session_id] = session
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)[1].cancel_prefetch()
+                self.evictions += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[QASession]:
+        """The live session with this id, or None if unknown or expired."""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                self.misses += 1
+                return None
+            if self._expired(session, now):
+                del self._sessions[session_id]
+                session.cancel_prefetch()
+                self.expirations += 1
+                self.misses += 1
+                return None
+            session.touched_at = now
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return session
+
+    def delete(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session:
+            session.cancel_prefetch()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            size = len(self._sessions)
+        return {
+            "sessions": size,
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "created": self.created,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
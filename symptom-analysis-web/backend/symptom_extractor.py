@@ -0,0 +1,180 @@
+"""
+Local free-text symptom extraction.
+Every known symptom phrase is precomputed as an L2-normalized TF-IDF vector
+of character n-grams. A complaint is split into sliding word windows, the
+windows are vectorized the same way, and one matrix product scores every
+window against every symptom (cosine similarity). Non-overlapping windows
+are then assigned greedily, best score first. Windows and negations stay
+within a clause: punctuation and contrastive words ("but") end one.
+"""
+import json
+import re
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from symptom_resolver import normalize_symptom
+
+NGRAM_RANGE = (3, 4)
+MAX_WINDOW_WORDS = 4
+MATCH_THRESHOLD = 0.6  # Minimum cosine similarity for a window to count as a symptom
+
+TOKEN_PATTERN = re.compile(r"[a-z]+|[.,;:!?]")
+NEGATIONS = {"no", "not", "without", "denies", "never", "nor"}
+NEGATION_SCOPE = 3  # Words after a negation that it applies to, within the clause
+CLAUSE_PUNCTUATION = set(".,;:!?")
+CONTRASTIVES = {"but", "however", "although", "though", "yet", "except", "whereas"}
+STOPWORDS = {
+    "a", "an", "and", "am", "are", "as", "at", "be", "been", "but", "by", "for", "from", "feel", "feeling",
+    "got", "had", "has", "have", "having", "i", "im", "in", "is", "it", "its", "ive", "me", "my", "of",
+    "on", "or", "really", "since", "so", "some", "the", "there", "this", "to", "very", "was", "with",
+    "days", "day", "week", "weeks", "lot", "little", "bit", "also", "past", "last", "get", "getting",
+} | CONTRASTIVES
+
+
+def load_symptom_list(path: str) -> List[str]:
+    """Symptom names from a JSON list such as LLM/symptoms.json."""
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _grams(text: str) -> List[str]:
+    padded = f" {text} "
+    return [padded[i:i + n] for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1)
+            for i in range(len(padded) - n + 1)]
+
+
+class SymptomExtractor:
+    def __init__(self, phrases: Dict[str, str]):
+        """
+        Args:
+            phrases: Searchable phrase -> canonical symptom name returned to callers
+        """
+        self.phrases = list(phrases)
+        self.canonical = [phrases[p] for p in self.phrases]
+        self.symptoms = sorted(set(self.canonical))
+
+        # Vocabulary and smoothed IDF over the symptom phrases
+        phrase_grams = [_grams(p) for p in self.phrases]
+        self.gram_ids: Dict[str, int] = {}
+        for grams in phrase_grams:
+            for g in grams:
+                self.gram_ids.setdefault(g, len(self.gram_ids))
+        doc_freq = np.zeros(len(self.gram_ids))
+        for grams in phrase_grams:
+            doc_freq[[self.gram_ids[g] for g in set(grams)]] += 1
+        n_docs = len(self.phrases)
+        self.idf = (np.log((1 + n_docs) / (1 + doc_freq)) + 1).astype(np.float32)
+        self.oov_idf = float(np.log(1 + n_docs) + 1)  # Weight of n-grams no symptom contains
+
+        self.matrix = self._vectorize(self.phrases, phrase_grams)  # (n_phrases, n_grams)
+
+    @classmethod
+    def from_vocabularies(cls, symptom_to_idx: Dict[str, int], extra_symptoms: Iterable[str] = ()) -> "SymptomExtractor":
+        """
+        Build from the ML vocabulary plus extra symptom names (LLM/symptoms.json).
+        ML symptoms are returned as their model keys; extra names that normalize
+        to an ML symptom are folded into it, the rest are returned as given.
+        """
+        phrases = {}
+        for key in symptom_to_idx:
+            phrases[normalize_symptom(key)] = key.strip()
+        for name in extra_symptoms:
+            phrases.setdefault(normalize_symptom(name), name)
+        phrases.pop("", None)
+        return cls(phrases)
+
+    def _vectorize(self, texts: List[str], gram_lists: List[List[str]] = None) -> np.ndarray:
+        gram_lists = gram_lists or [_grams(t) for t in texts]
+        vectors = np.zeros((len(texts), len(self.gram_ids)), dtype=np.float32)
+        oov_weight = np.zeros(len(texts), dtype=np.float32)
+        for row, grams in enumerate(gram_lists):
+            for g in grams:
+                gram_id = self.gram_ids.get(g)
+                if gram_id is None:
+                    oov_weight[row] += self.oov_idf ** 2
+                else:
+                    vectors[row, gram_id] += 1.0
+        vectors *= self.idf
+        # Unknown n-grams still count towards the norm, so padding words lower the score
+        norms = np.sqrt((vectors ** 2).sum(axis=1) + oov_weight)
+        norms[norms == 0] = 1.0
+        return vectors / norms[:, np.newaxis]
+
+    @staticmethod
+    def _clauses(tokens: List[str]) -> tuple:
+        """(words, clause number of each word): punctuation is dropped, it and contrastive words start a clause."""
+        words, clauses = [], []
+        clause = 0
+        for token in tokens:
+            if token in CLAUSE_PUNCTUATION or token in CONTRASTIVES:
+                clause += 1
+            if token not in CLAUSE_PUNCTUATION:
+                words.append(token)
+                clauses.append(clause)
+        return words, clauses
+
+    def _windows(self, tokens: List[str], clauses: List[int]) -> List[tuple]:
+        """(start, end) word spans worth scoring: within one clause, no stopword at either edge, not negated."""
+        spans = []
+        for start in range(len(tokens)):
+            if tokens[start] in STOPWORDS or tokens[start] in NEGATIONS:
+                continue
+            scope = range(max(0, start - NEGATION_SCOPE), start)
+            if any(tokens[i] in NEGATIONS and clauses[i] == clauses[start] for i in scope):
+                continue
+            for end in range(start + 1, min(start + MAX_WINDOW_WORDS, len(tokens)) + 1):
+                if clauses[end - 1] != clauses[start]:
+                    break
+                if tokens[end - 1] not in STOPWORDS:
+                    spans.append((start, end))
+        return spans
+
+    def extract(self, text: str, threshold: float = MATCH_THRESHOLD) -> List[dict]:
+        """
+        Map free text to canonical symptoms.
+        Returns [{"symptom", "score", "text"}] in order of appearance.
+        """
+        tokens, clauses = self._clauses(TOKEN_PATTERN.findall(text.lower()))
+        spans = self._windows(tokens, clauses)
+        if not spans:
+            return []
+
+        windows = [" ".join(tokens[a:b]) for a, b in spans]
+        scores = self._vectorize(windows) @ self.matrix.T  # (n_windows, n_phrases)
+
+        # Greedy assignment: best (window, phrase) pairs first, no overlapping words.
+        # Scores are compared at 4 decimals so float noise does not beat a longer exact span.
+        best_phrase = scores.argmax(axis=1)
+        best_score = scores[np.arange(len(spans)), best_phrase]
+        lengths = np.array([b - a for a, b in spans])
+        used_words = np.zeros(len(tokens), dtype=bool)
+        found = {}
+        for w in np.lexsort((-lengths, -np.round(best_score, 4))):
+            if best_score[w] < threshold:
+                break
+            start, end = spans[w]
+            symptom = self.canonical[best_phrase[w]]
+            if used_words[start:end].any() or symptom in found:
+                continue
+            used_words[start:end] = True
+            found[symptom] = {"symptom": symptom, "score": round(float(best_score[w]), 3),
+                              "text": windows[w], "_start": start}
+
+        matches = sorted(found.values(), key=lambda m: m["_start"])
+        for m in matches:
+            del m["_start"]
+        return matches
+
+    @staticmethod
+    def confidence(matches: List[dict]) -> float:
+        """Weakest match score; 0 when nothing was found."""
+        return min((m["score"] for m in matches), default=0.0)
+
+    def canonicalize(self, names: Iterable[str]) -> List[str]:
+        """Map names (e.g. from an LLM) onto canonical symptoms, dropping unknown ones."""
+        lookup = dict(zip(self.phrases, self.canonical))
+        result = []
+        for name in names:
+            symptom: Optional[str] = lookup.get(normalize_symptom(str(name)))
+            if symptom and symptom not in result:
+                result.append(symptom)
+        return result
@@ -0,0 +1,140 @@
+"""
+Symptom resolver for the ML model vocabulary.
+Maps raw user symptom strings onto the model's symptom keys using
+precomputed lookup tables, so free-text input never triggers a scan of
+the whole vocabulary on the request path.
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Strategy names reported alongside every match
+STRATEGY_DIRECT = "direct"
+STRATEGY_UNDERSCORE = "underscore"
+STRATEGY_KEYWORD = "keyword"
+STRATEGY_PARTIAL = "partial"
+
+NGRAM_SIZE = 3
+
+
+def normalize_symptom(text: str) -> str:
+    """Normalize: strip spaces, lowercase, replace underscore with space."""
+    return text.strip().lower().replace('_', ' ')
+
+
+class SymptomResolver:
+    def __init__(self, symptom_to_idx: Dict[str, int], memo_size: int = 4096):
+        self.symptom_to_idx = symptom_to_idx
+        self.normalized_symptoms = {}  # Clean name -> original key
+
+        for original_key in symptom_to_idx:
+            clean = normalize_symptom(original_key)
+            self.normalized_symptoms[clean] = original_key
+            # Also store underscore version
+            self.normalized_symptoms[clean.replace(' ', '_')] = original_key
+            # Also store just the key words (for partial matching)
+            for word in clean.split():
+                if len(word) > 3:  # Only meaningful words
+                    if word not in self.normalized_symptoms:
+                        self.normalized_symptoms[word] = original_key
+
+        # Partial-match index. Key ids follow insertion order, so the lowest
+        # matching id is the entry the old linear scan would have hit first.
+        self._keys = [k for k in self.normalized_symptoms if k]
+        self._key_ids = {k: i for i, k in enumerate(self._keys)}
+        # n-gram -> ids of keys containing it (all grams up to NGRAM_SIZE)
+        self._gram_index: Dict[str, frozenset] = {}
+        # leading n-gram -> ids of keys starting with it (keys >= NGRAM_SIZE)
+        self._prefix_index: Dict[str, List[int]] = {}
+
+        grams: Dict[str, set] = {}
+        for key_id, key in enumerate(self._keys):
+            for size in range(1, NGRAM_SIZE + 1):
+                for start in range(len(key) - size + 1):
+                    grams.setdefault(key[start:start + size], set()).add(key_id)
+            if len(key) >= NGRAM_SIZE:
+                self._prefix_index.setdefault(key[:NGRAM_SIZE], []).append(key_id)
+        self._gram_index = {g: frozenset(ids) for g, ids in grams.items()}
+
+        # Bounded per-raw-string memo
+        self.resolve = lru_cache(maxsize=memo_size)(self._resolve)
+
+    def _resolve(self, raw: str) -> Optional[Tuple[str, str]]:
+        """Resolve one raw symptom string to (original_key, strategy)."""
+        clean_s = normalize_symptom(raw)
+        if not clean_s:
+            return None
+
+        # Strategy 1: Direct lookup
+        if clean_s in self.normalized_symptoms:
+            return self.normalized_symptoms[clean_s], STRATEGY_DIRECT
+
+        # Strategy 2: Underscore version
+        underscore_s = clean_s.replace(' ', '_')
+        if underscore_s in self.normalized_symptoms:
+            return self.normalized_symptoms[underscore_s], STRATEGY_UNDERSCORE
+
+        # Strategy 3: Keyword extraction
+        # "Itching of skin" -> try "itching", "skin"
+        for word in clean_s.split():
+            if word in self.normalized_symptoms:
+                return self.normalized_symptoms[word], STRATEGY_KEYWORD
+
+        # Strategy 4: Partial match via the n-gram index
+        key_id = self._partial_match(clean_s)
+        if key_id is not None:
+            return self.normalized_symptoms[self._keys[key_id]], STRATEGY_PARTIAL
+
+        return None
+
+    def _partial_match(self, clean_s: str) -> Optional[int]:
+        """Lowest key id where clean_s is inside the key or the key is inside clean_s."""
+        best = None
+
+        # Keys containing the input: intersect n-gram postings, then verify
+        if len(clean_s) <= NGRAM_SIZE:
+            candidates = self._gram_index.get(clean_s, ())
+        else:
+            postings = []
+            for start in range(len(clean_s) - NGRAM_SIZE + 1):
+                ids = self._gram_index.get(clean_s[start:start + NGRAM_SIZE])
+                if not ids:
+                    postings = None
+                    break
+                postings.append(ids)
+            if postings:
+                postings.sort(key=len)
+                candidates = postings[0].intersection(*postings[1:])
+                candidates = [i for i in candidates if clean_s in self._keys[i]]
+            else:
+                candidates = ()
+        if candidates:
+            best = min(candidates)
+
+        # Keys contained in the input: one probe per position of the input
+        for start in range(len(clean_s)):
+            for size in range(1, NGRAM_SIZE):
+                key_id = self._key_ids.get(clean_s[start:start + size])
+                if key_id is not None and (best is None or key_id < best):
+                    best = key_id
+            for key_id in self._prefix_index.get(clean_s[start:start + NGRAM_SIZE], ()):
+                if best is not None and key_id >= best:
+                    break
+                key = self._keys[key_id]
+                if clean_s.startswith(key, start):
+                    best = key_id
+                    break
+
+        return best
+
+    def resolve_many(self, symptoms: List[str]) -> List[Tuple[str, str, str]]:
+        """Resolve a list of raw symptoms to (raw, original_key, strategy), skipping misses."""
+        matches = []
+        for s in symptoms:
+            hit = self.resolve(s)
+            if hit:
+                matches.append((s, hit[0], hit[1]))
+        return matches
+
+    def memo_stats(self) -> dict:
+        info = self.resolve.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
@@ -0,0 +1,45 @@
+"""
+Unit tests for the backend modules. Run from symptom-analysis-web/backend:
+    python -m pytest tests
+The scripts next to main.py (test_ml.py, verify_behavior.py, ...) need a
+running server and are not part of this suite.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def forest_data():
+    """A small fitted RandomForestClassifier on binary symptom rows, plus probe rows."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(0)
+    n_features, n_classes = 40, 8
+    # Each class has a few characteristic features, plus noise, like the symptom data
+    signature = rng.random((n_classes, n_features)) < 0.15
+    y = np.repeat(np.arange(n_classes), 60)
+    X = (signature[y] ^ (rng.random((len(y), n_features)) < 0.05)).astype(np.float32)
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+    probe = (rng.random((200, n_features)) < 0.2).astype(np.float32)
+    return model, probe
+
+
+@pytest.fixture
+def model_files(tmp_path, forest_data):
+    """Pickled model and mappings for forest_data in tmp_path, as (model_path, mappings_path)."""
+    import pickle
+
+    model, _ = forest_data
+    mappings = {
+        "symptom_to_idx": {f"symptom_{i}": i for i in range(model.n_features_in_)},
+        "idx_to_disease": {i: f"Disease {i}" for i in range(model.n_classes_)},
+    }
+    model_path, mappings_path = tmp_path / "model.pkl", tmp_path / "mappings.pkl"
+    model_path.write_bytes(pickle.dumps(model))
+    mappings_path.write_bytes(pickle.dumps(mappings))
+    return str(model_path), str(mappings_path)
@@ -0,0 +1,145 @@
+import contextlib
+import json
+import pickle
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("httpx")  # TestClient transport
+from fastapi.testclient import TestClient
+
+import main
+from llm_service import Completion, LLMService
+
+SYMPTOMS = ["itching", "skin_rash", "continuous_sneezing", "shivering", "chills", "joint_pain", "stomach_pain",
+            "acidity", "vomiting", "fatigue", "weight_gain", "anxiety", "mood_swings", "weight_loss", "restlessness",
+            "lethargy", "cough", "high_fever", "sunken_eyes", "breathlessness", "sweating", "dehydration",
+            "indigestion", "headache", "yellowish_skin", "dark_urine", "nausea", "loss_of_appetite", "back_pain",
+            "constipation", "abdominal_pain", "diarrhoea", "mild_fever", "yellow_urine", "malaise", "phlegm",
+            "throat_irritation", "redness_of_eyes", "sinus_pressure", "runny_nose"]
+REPORT = {"disease": "Disease 0", "triage_level": "minimal", "confidence": "High", "specialist": "General Physician",
+          "reasoning": "Typical presentation.", "ruled_out": [], "advice": "Rest."}
+
+
+async def fake_create(self, model, messages, method):
+    if method == "extract":
+        return Completion(json.dumps({"symptoms": ["headache", "not a symptom"]}), model, 10)
+    return Completion(json.dumps(REPORT), model, 10)
+
+
+async def fake_stream(self, prompt, system_prompt=None, method="default", used=None):
+    if used is not None:
+        used["model"] = self.model
+    text = json.dumps(REPORT) if method == "report" else "Do you also have a cough?"
+    for start in range(0, len(text), 7):
+        yield text[start:start + 7]
+
+
+@contextlib.contextmanager
+def app_client(tmp_path, forest_data, monkeypatch, gate: threading.Event = None):
+    """TestClient for main.app serving the test forest, with a fake LLM and no optional assets."""
+    model, _ = forest_data
+    model_path, mappings_path = tmp_path / "model.pkl", tmp_path / "mappings.pkl"
+    model_path.write_bytes(pickle.dumps(model))
+    mappings_path.write_bytes(pickle.dumps({
+        "symptom_to_idx": {name: i for i, name in enumerate(SYMPTOMS)},
+        "idx_to_disease": {i: f"disease {i}" for i in range(model.n_classes_)},
+    }))
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    for name, value in {
+        "MODEL_PATH": str(model_path), "MAPPINGS_PATH": str(mappings_path),
+        "ARTIFACT_PATH": str(tmp_path / "missing.forest"), "SYMPTOMS_JSON_PATH": str(tmp_path / "missing.json"),
+        "REPORT_LIBRARY_PATH": str(tmp_path / "missing.npz"), "QUESTION_ENGINE": "llm",
+        "QUESTION_LLM_TREE": False, "ML_RELOAD_INTERVAL_SECONDS": 0, "LLM_CACHE_DB_PATH": None,
+    }.items():
+        monkeypatch.setattr(main, name, value)
+    monkeypatch.setattr(LLMService, "_create", fake_create)
+    monkeypatch.setattr(LLMService, "_stream_completion", fake_stream)
+    if gate is not None:
+        create_ml_service = main._create_ml_service
+        monkeypatch.setattr(main, "_create_ml_service", lambda: gate.wait(10) and create_ml_service())
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+def wait_ready(client):
+    for _ in range(200):
+        if client.get("/readyz").status_code == 200:
+            return
+        time.sleep(0.05)
+    raise AssertionError(client.get("/readyz").json())
+
+
+@pytest.fixture
+def client(tmp_path, forest_data, monkeypatch):
+    with app_client(tmp_path, forest_data, monkeypatch) as client:
+        wait_ready(client)
+        yield client
+
+
+def events(response):
+    """(event, data) pairs of an SSE response."""
+    parsed = []
+    for message in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.split("\n"))
+        parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+def test_readyz_waits_for_required_components(tmp_path, forest_data, monkeypatch):
+    gate = threading.Event()
+    with app_client(tmp_path, forest_data, monkeypatch, gate) as client:
+        assert client.get("/healthz").json()["status"] == "ok"  # Live while the model loads
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["components"]["ml"]["status"] == "loading"
+        assert client.post("/diagnose", json={"symptoms": ["cough"]}).status_code == 503
+
+        gate.set()
+        wait_ready(client)
+        components = client.get("/readyz").json()["components"]
+        assert components["ml"]["status"] == "ready" and components["llm"]["status"] == "ready"
+        # Optional components that are not configured do not block readiness
+        assert components["questions"]["status"] == "disabled"
+        assert components["reports"]["status"] == "disabled"
+
+
+def test_extract_uses_local_matches(client):
+    body = client.post("/extract", json={"text": "I have a headache, no cough, and joint pain"}).json()
+    assert body["symptoms"] == ["headache", "joint_pain"]
+    assert body["source"] == "local"
+
+
+def test_extract_asks_the_llm_when_unsure(client, monkeypatch):
+    monkeypatch.setattr(main, "EXTRACT_LLM_THRESHOLD", 1.01)
+    body = client.post("/extract", json={"text": "my head is pounding"}).json()
+    # Only names from the vocabulary are kept from the LLM's answer
+    assert body["symptoms"] == ["headache"]
+    assert body["source"] == "llm"
+
+
+def test_diagnose_stream_high_confidence_report(client, monkeypatch):
+    monkeypatch.setattr(main, "CONFIDENCE_THRESHOLD", -1)
+    stream = events(client.post("/diagnose/stream", json={"symptoms": ["itching", "skin_rash"]}))
+    names = [event for event, _ in stream]
+    assert names[0] == "prediction" and names[-2:] == ["report", "done"]
+    assert stream[0][1]["action"] == "show_report"
+    fields = [data["name"] for event, data in stream if event == "field"]
+    assert fields[:2] == ["disease", "triage_level"]
+    report = stream[-2][1]
+    assert report["disease"] == stream[0][1]["top_diseases"][0]["name"]
+    assert report["advice"] == "Rest."
+
+
+def test_diagnose_stream_opens_a_session_with_the_first_question(client, monkeypatch):
+    monkeypatch.setattr(main, "CONFIDENCE_THRESHOLD", 101)
+    stream = events(client.post("/diagnose/stream", json={"symptoms": ["cough", "high_fever"]}))
+    assert [event for event, _ in stream][0] == "prediction"
+    tokens = "".join(data["text"] for event, data in stream if event == "token")
+    question = next(data for event, data in stream if event == "question")
+    assert question["question"] == tokens == "Do you also have a cough?"
+    assert question["question_number"] == 1
+    assert main.qa_sessions.get(question["session_id"]).question == question["question"]
+    assert stream[-1] == ("done", {})
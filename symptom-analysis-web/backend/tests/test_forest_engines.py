@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from compact_forest import PRECISIONS, CompactForest
+from forest_engine import FlatForest
+from incremental_scoring import ScoringSession
+from model_artifact import ArtifactError, export_artifact, load_artifact
+
+
+def csr(X):
+    """indptr/indices of the active features of binary rows."""
+    indices = [np.flatnonzero(row) for row in X]
+    indptr = np.concatenate(([0], np.cumsum([len(i) for i in indices])))
+    return indptr, np.concatenate(indices)
+
+
+def test_flat_forest_matches_sklearn(forest_data):
+    model, X = forest_data
+    engine = FlatForest.from_sklearn(model)
+    expected = model.predict_proba(X)
+
+    np.testing.assert_allclose(engine.predict_proba(X), expected, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(engine.predict_proba(X[:1]), expected[:1], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(engine.predict_proba_sparse(*csr(X)), expected, rtol=0, atol=1e-12)
+    assert engine.matches(model, X)
+
+
+@pytest.mark.parametrize("precision", sorted(PRECISIONS))
+def test_compact_forest_within_quantization_error(forest_data, precision):
+    model, X = forest_data
+    engine = CompactForest.from_sklearn(model, precision)
+    expected = model.predict_proba(X)
+
+    for proba in (engine.predict_proba(X), engine.predict_proba_sparse(*csr(X))):
+        assert np.max(np.abs(proba - expected)) <= engine.max_error + 1e-12
+    assert engine.matches(model, X)
+    # Same leaves as the exact engine
+    np.testing.assert_array_equal(engine.apply(X), FlatForest.from_sklearn(model).apply(X))
+
+
+def test_compact_forest_rejects_non_binary_splits():
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(1)
+    X = rng.random((50, 4)) * 10  # Continuous features: thresholds outside [0, 1)
+    model = RandomForestClassifier(n_estimators=3, random_state=0).fit(X, rng.integers(0, 2, 50))
+    with pytest.raises(ValueError):
+        CompactForest.from_sklearn(model)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_scoring_session_matches_full_prediction(forest_data, compact):
+    model, X = forest_data
+    engine = CompactForest.from_sklearn(model) if compact else FlatForest.from_sklearn(model)
+    rng = np.random.default_rng(2)
+
+    indices = np.flatnonzero(X[0])
+    session = ScoringSession(engine, indices)
+    for _ in range(30):
+        # Flip a few features per step, as follow-up answers do (sometimes many, to hit the full re-trace)
+        flips = rng.choice(engine.n_features, size=rng.choice([1, 2, 3, 20]), replace=False)
+        indices = np.array(sorted(set(indices.tolist()) ^ set(flips.tolist())), dtype=np.intp)
+        proba, _, voters = session.set_features(indices)
+
+        row = np.zeros((1, engine.n_features), dtype=np.float32)
+        row[0, indices] = 1
+        np.testing.assert_allclose(proba, engine.predict_proba(row), rtol=0, atol=1e-12)
+        if not compact:
+            np.testing.assert_allclose(proba, model.predict_proba(row), rtol=0, atol=1e-12)
+        assert voters == 1
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_artifact_round_trip(forest_data, tmp_path, compact):
+    model, X = forest_data
+    engine = CompactForest.from_sklearn(model) if compact else FlatForest.from_sklearn(model)
+    symptom_to_idx = {f"symptom_{i}": i for i in range(engine.n_features)}
+    idx_to_disease = {i: f"Disease {i}" for i in range(engine.n_classes)}
+    path = str(tmp_path / "model.forest")
+
+    export_artifact(engine, symptom_to_idx, idx_to_disease, path, model_version="v1")
+    loaded, mappings, header = load_artifact(path, verify=True)
+
+    assert type(loaded) is type(engine)
+    assert header["model_version"] == "v1"
+    assert mappings == {"symptom_to_idx": symptom_to_idx, "idx_to_disease": idx_to_disease}
+    np.testing.assert_array_equal(loaded.predict_proba(X), engine.predict_proba(X))
+
+
+def test_artifact_checks(forest_data, tmp_path):
+    model, _ = forest_data
+    path = tmp_path / "model.forest"
+    export_artifact(FlatForest.from_sklearn(model), {}, {}, str(path))
+
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    load_artifact(str(path))  # Checksum is only read on request
+    with pytest.raises(ArtifactError, match="checksum"):
+        load_artifact(str(path), verify=True)
+
+    path.write_bytes(bytes(data[:len(data) // 2]))
+    with pytest.raises(ArtifactError, match="truncated"):
+        load_artifact(str(path))
+
+    path.write_bytes(b"NOTAFORE" + bytes(data[8:]))
+    with pytest.raises(ArtifactError, match="magic"):
+        load_artifact(str(path))
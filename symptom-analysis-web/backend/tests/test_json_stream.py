@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from json_stream import JSONFieldStream, parse_object
+
+REPORT = {
+    "disease": "Migraine",
+    "triage_level": "minimal",
+    "reasoning": 'Throbbing "one-sided" pain\nwith light sensitivity',
+    "ruled_out": ["Tension headache", "Sinusitis"],
+    "details": {"disease": "nested, not a field"},
+    "advice": "Rest in a dark room \\ see a GP",
+}
+
+
+def stream_fields(text, size):
+    stream = JSONFieldStream()
+    fields = []
+    for i in range(0, len(text), size):
+        fields += stream.feed(text[i:i + size])
+    return fields
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_fields_arrive_in_order_for_any_chunking(size):
+    text = "Here is the report:\n```json\n" + json.dumps(REPORT, indent=2) + "\n```"
+    assert stream_fields(text, size) == [
+        ("disease", "Migraine"),
+        ("triage_level", "minimal"),
+        ("reasoning", REPORT["reasoning"]),
+        ("advice", REPORT["advice"]),
+    ]
+
+
+def test_field_is_released_once_its_closing_quote_arrives():
+    stream = JSONFieldStream()
+    assert stream.feed('{"disease": "Mig') == []
+    assert stream.feed('raine", "triage') == [("disease", "Migraine")]
+    assert stream.feed('_level": "minimal"}') == [("triage_level", "minimal")]
+
+
+def test_repeated_key_keeps_the_first_value():
+    assert stream_fields('{"disease": "A", "disease": "B"}', 4) == [("disease", "A")]
+
+
+def test_invalid_escape_falls_back_to_raw_text():
+    assert stream_fields('{"advice": "see \\q doctor"}', 5) == [("advice", "see \\q doctor")]
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(REPORT),
+    "Sure! " + json.dumps(REPORT) + " Hope this helps.",
+    "```json\n" + json.dumps(REPORT) + "\n```",
+    json.dumps(REPORT)[:-1] + ",}",  # Trailing comma
+])
+def test_parse_object_complete(text):
+    assert parse_object(text) == (REPORT, True)
+
+
+def test_parse_object_trailing_comma_in_list():
+    assert parse_object('{"ruled_out": ["A", "B",], "disease": "C"}') == (
+        {"ruled_out": ["A", "B"], "disease": "C"}, True)
+
+
+def test_parse_object_recovers_string_fields_from_truncated_output():
+    text = json.dumps(REPORT)
+    fields, complete = parse_object(text[:text.index('"advice"') + 20])
+    assert not complete
+    assert fields == {"disease": "Migraine", "triage_level": "minimal", "reasoning": REPORT["reasoning"]}
+
+
+def test_parse_object_recovers_fields_from_malformed_output():
+    fields, complete = parse_object('{"disease": "Flu", "triage_level": "delayed" "advice": "rest"}')
+    assert not complete
+    assert fields["disease"] == "Flu"
+
+
+@pytest.mark.parametrize("text", ["", "I cannot help with that.", "[1, 2, 3]", '{"disease": "Fl'])
+def test_parse_object_without_usable_fields(text):
+    assert parse_object(text) == ({}, False)
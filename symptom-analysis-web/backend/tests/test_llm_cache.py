@@ -0,0 +1,69 @@
+import pytest
+
+import llm_cache
+from llm_cache import ReportCache, make_key
+
+REPORT = {"disease": "Flu", "triage_level": "minimal", "ruled_out": ["Cold"]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time for llm_cache."""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_key_ignores_symptom_order_but_not_answers():
+    diseases = [{"name": "Flu", "probability": 61.04}, {"name": "Cold", "probability": 20}]
+    key = make_key("final", "m", "v1", ["Fever", "cough"], diseases, [{"question": "Q?", "answer": "Yes"}])
+    assert make_key("final", "m", "v1", ["cough", "fever", "fever"], diseases, [{"question": "Q?", "answer": "yes "}]) == key
+    assert make_key("final", "m", "v1", ["cough", "fever"], diseases, [{"question": "Q?", "answer": "no"}]) != key
+    assert make_key("final", "m", "v2", ["cough", "fever"], diseases, [{"question": "Q?", "answer": "yes"}]) != key
+    assert make_key("final", "m", "v1", ["cough", "fever"], diseases[::-1], [{"question": "Q?", "answer": "yes"}]) != key
+
+
+def test_memory_lru_returns_copies():
+    cache = ReportCache(max_size=2)
+    cache.put("a", REPORT)
+    cache.put("b", REPORT)
+    cache.get("a")["ruled_out"].append("Measles")  # Callers cannot change the cached report
+    cache.put("c", REPORT)  # Evicts "b", the least recently used
+    assert cache.get("a") == REPORT
+    assert cache.get("b") is None
+    assert cache.evictions == 1 and cache.stats()["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ReportCache(ttl_seconds=60)
+    cache.put("a", REPORT)
+    clock[0] += 61
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+
+
+def test_sqlite_entries_survive_a_restart(tmp_path, clock):
+    path = str(tmp_path / "reports.db")
+    cache = ReportCache(db_path=path, ttl_seconds=3600)
+    cache.put("a", REPORT)
+    cache.put("old", REPORT)
+    cache.close()
+
+    restarted = ReportCache(db_path=path, ttl_seconds=3600)
+    assert restarted.get("a") == REPORT
+    assert restarted.disk_hits == 1
+    assert restarted.get("a") == REPORT and restarted.disk_hits == 1  # Now answered from memory
+    clock[0] += 3601
+    assert restarted.get("old") is None
+    assert restarted.stats()["disk_size"] == 1
+    restarted.close()
+
+
+def test_sqlite_is_pruned_to_max_entries(tmp_path, clock):
+    cache = ReportCache(db_path=str(tmp_path / "reports.db"), db_max_entries=100)
+    for i in range(256):
+        clock[0] += 1
+        cache.put(str(i), REPORT)
+    assert cache.stats()["disk_size"] == 100
+    assert ReportCache(max_size=0, db_path=str(tmp_path / "reports.db")).stats()["persistent"] is False
+    cache.close()
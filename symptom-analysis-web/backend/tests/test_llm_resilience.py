@@ -0,0 +1,93 @@
+import pytest
+
+import llm_resilience
+from llm_resilience import CircuitBreaker, LatencyTracker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for llm_resilience."""
+    now = [1000.0]
+    monkeypatch.setattr(llm_resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record(False)
+    breaker.record(True)  # A success resets the count
+    for _ in range(2):
+        breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 1
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+
+def test_breaker_half_open_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record(False)
+    clock[0] += 29
+    assert not breaker.allow()
+
+    clock[0] += 1
+    assert breaker.allow()  # One trial call
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # Others wait for its outcome
+
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record(False)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    clock[0] += 10
+    assert not breaker.allow()
+
+
+def test_breaker_lost_trial_is_retried(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record(False)
+    clock[0] += 30
+    assert breaker.allow()  # Trial that never reports back
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()
+
+
+def test_breaker_disabled():
+    breaker = CircuitBreaker(failure_threshold=0)
+    for _ in range(100):
+        breaker.record(False)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert not breaker.stats()["enabled"]
+
+
+def test_latency_tracker_hedge_delay():
+    tracker = LatencyTracker(percentile=90, window=100, min_samples=10, default_delay=2.0, min_delay=0.25)
+    for seconds in range(9):
+        tracker.record(seconds / 10)
+    assert tracker.quantile() is None
+    assert tracker.hedge_delay() == 2.0
+
+    for seconds in range(9, 100):
+        tracker.record(seconds / 10)
+    assert tracker.quantile() == pytest.approx(9.0)
+    assert tracker.hedge_delay() == pytest.approx(9.0)
+
+    for _ in range(100):  # Window keeps only the recent samples
+        tracker.record(0.01)
+    assert tracker.hedge_delay() == 0.25
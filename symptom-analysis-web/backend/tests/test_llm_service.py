@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from llm_service import Completion, LLMService
+
+PRIMARY, FALLBACK = "primary-model", "fallback-model"
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """LLMService whose provider is replaced by per-model fake behaviors."""
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    behavior = {}
+
+    async def create(self, model, messages, method):
+        delay, error = behavior[model]
+        await asyncio.sleep(delay)
+        if error:
+            raise RuntimeError(f"{model} failed")
+        return Completion(f"answer from {model}", model, 5)
+
+    monkeypatch.setattr(LLMService, "_create", create)
+    llm = LLMService(model=PRIMARY, fallback_model=FALLBACK, deadlines={"question": 0.4, "report": 0.4},
+                     breaker_failures=1)
+    llm.behavior = behavior
+    return llm
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_fast_primary_is_recorded_per_method(service):
+    service.behavior.update({PRIMARY: (0.01, False), FALLBACK: (0.01, False)})
+    assert run(service._complete("q", method="question")).model == PRIMARY
+    assert set(service.latency) == {"question"}
+    assert service.latency["question"].stats()["samples"] == 1
+    assert service.breaker.failures == 0
+
+
+def test_primary_losing_to_hedge_is_not_a_failure(service):
+    # Hedge fires at half the deadline (0.2s); the fallback answers long before the slow primary
+    service.behavior.update({PRIMARY: (0.35, False), FALLBACK: (0.01, False)})
+    completion = run(service._complete("q", method="question"))
+    assert completion.model == FALLBACK
+    assert service.hedges_won == 1
+    assert service.breaker.state == "closed" and service.breaker.failures == 0
+    # The primary's time so far is still recorded, so slow calls are not censored out
+    assert service.latency["question"].stats()["samples"] == 1
+
+
+def test_failed_primary_opens_the_breaker(service):
+    service.behavior.update({PRIMARY: (0.01, True), FALLBACK: (0.01, False)})
+    assert run(service._complete("q", method="question")).model == FALLBACK
+    assert service.breaker.state == "open"
+    assert "question" not in service.latency or service.latency["question"].stats()["samples"] == 0
+
+
+def test_deadline_counts_as_failure(service):
+    service.behavior.update({PRIMARY: (5, False), FALLBACK: (5, False)})
+    with pytest.raises(asyncio.TimeoutError, match="deadline"):
+        run(service._complete("q", method="report"))
+    assert service.deadlines_exceeded == 1
+    assert service.breaker.state == "open"
@@ -0,0 +1,101 @@
+import pickle
+
+from forest_engine import FlatForest
+from ml_service import MLService, file_version
+from model_artifact import export_artifact
+
+
+def retrain(model_path, forest_data):
+    """Overwrite the pickle with a different model."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    model, X = forest_data
+    retrained = RandomForestClassifier(n_estimators=10, random_state=1).fit(X, model.predict(X))
+    with open(model_path, "wb") as f:
+        pickle.dump(retrained, f)
+
+
+def test_stale_artifact_falls_back_to_the_retrained_pickle(model_files, forest_data, tmp_path):
+    model_path, mappings_path = model_files
+    model, _ = forest_data
+    with open(mappings_path, "rb") as f:
+        mappings = pickle.load(f)
+    artifact_path = str(tmp_path / "model.forest")
+    export_artifact(FlatForest.from_sklearn(model), mappings["symptom_to_idx"], mappings["idx_to_disease"],
+                    artifact_path, model_version=file_version(model_path, mappings_path))
+
+    service = MLService(model_path, mappings_path, use_flat_engine=True, artifact_path=artifact_path)
+    assert service.model_source == "artifact"
+    first = service.model_version
+
+    retrain(model_path, forest_data)
+    result = service.reload()
+    assert result["reloaded"]
+    assert result["previous_version"] == first
+    assert service.model_version == file_version(model_path, mappings_path) != first
+    assert service.model_source == "pickle"
+
+
+def test_reload_of_unchanged_files_is_not_reported_as_success(model_files):
+    service = MLService(*model_files, use_flat_engine=True)
+    result = service.reload()
+    assert not result["reloaded"]
+    assert result["model_version"] == service.model_version
+    assert service.reloads == 0 and service.reload_failures == 0
+
+
+def ensemble_service(tmp_path, forest_data, model_files):
+    """MLService serving a two-member ensemble on the thread pool."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    model, X = forest_data
+    with open(model_files[1], "rb") as f:
+        mappings = pickle.load(f)
+    second = RandomForestClassifier(n_estimators=10, random_state=1).fit(X, model.predict(X))
+    path = tmp_path / "ensemble.pkl"
+    path.write_bytes(pickle.dumps({"models": [model, second], "mappings": mappings}))
+    return MLService(*model_files, use_flat_engine=False, ensemble_path=str(path)), path
+
+
+def test_reload_closes_the_replaced_ensemble(tmp_path, forest_data, model_files):
+    service, path = ensemble_service(tmp_path, forest_data, model_files)
+    old = service.bundle.ensemble
+    assert old._pool is not None
+
+    package = pickle.loads(path.read_bytes())
+    package["models"] = package["models"][:1]
+    path.write_bytes(pickle.dumps(package))
+    assert service.reload()["reloaded"]
+    assert old._pool is None
+    assert service.bundle.ensemble._pool is not None
+
+
+def test_retired_bundle_closes_after_its_running_prediction(tmp_path, forest_data, model_files):
+    import numpy as np
+
+    service, _ = ensemble_service(tmp_path, forest_data, model_files)
+    bundle = service.bundle
+    predict_sparse = bundle.ensemble.predict_sparse
+
+    def retire_midway(indptr, indices):
+        bundle.retire()  # A reload lands while this prediction runs
+        assert bundle.ensemble._pool is not None
+        return predict_sparse(indptr, indices)
+
+    bundle.ensemble.predict_sparse = retire_midway
+    bundle.predict(np.array([0, 2], dtype=np.int64), np.array([0, 1], dtype=np.int32))
+    bundle.ensemble.predict_sparse = predict_sparse
+    assert bundle.ensemble._pool is None
+    # A caller that picked up the bundle before the swap still gets an answer
+    probabilities, _, voters = bundle.predict(np.array([0, 1], dtype=np.int64), np.array([3], dtype=np.int32))
+    assert voters == 2 and np.allclose(probabilities.sum(), 1.0)
+
+
+def test_unchanged_reload_closes_the_candidate(tmp_path, forest_data, model_files, monkeypatch):
+    from ensemble_engine import ForestEnsemble
+
+    service, _ = ensemble_service(tmp_path, forest_data, model_files)
+    closed = []
+    monkeypatch.setattr(ForestEnsemble, "close", lambda self: closed.append(self))
+    assert not service.reload()["reloaded"]
+    assert len(closed) == 1 and closed[0] is not service.bundle.ensemble
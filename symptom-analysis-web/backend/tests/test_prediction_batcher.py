@@ -0,0 +1,68 @@
+import asyncio
+
+from prediction_batcher import PredictionBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def echo_batcher(calls, **kwargs):
+    """Batcher whose predict_batch records each batch and answers every row with its own symptoms."""
+    def predict_batch(rows):
+        calls.append(list(rows))
+        return [(row, float(len(row))) for row in rows]
+    return PredictionBatcher(predict_batch, **kwargs)
+
+
+def test_concurrent_requests_share_one_batch():
+    calls = []
+    batcher = echo_batcher(calls, window_ms=20)
+
+    async def main():
+        return await asyncio.gather(*(batcher.predict([f"s{i}"] * i) for i in range(1, 6)))
+
+    results = run(main())
+    assert results == [([f"s{i}"] * i, float(i)) for i in range(1, 6)]
+    assert len(calls) == 1
+    stats = batcher.stats()
+    assert stats["requests"] == 5 and stats["batches"] == 1 and stats["largest_batch"] == 5
+    assert stats["batch_size_histogram"] == {"<=8": 1}
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    calls = []
+    batcher = echo_batcher(calls, window_ms=10_000, max_batch_size=3)
+
+    async def main():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.predict([str(i)]) for i in range(3))), 2)
+
+    assert len(run(main())) == 3
+    assert [len(c) for c in calls] == [3]
+
+
+def test_failed_batch_fails_every_caller():
+    def predict_batch(rows):
+        raise RuntimeError("model unavailable")
+
+    batcher = PredictionBatcher(predict_batch, window_ms=5)
+
+    async def main():
+        return await asyncio.gather(batcher.predict(["a"]), batcher.predict(["b"]), return_exceptions=True)
+
+    results = run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_aclose_scores_queued_requests():
+    calls = []
+    batcher = echo_batcher(calls, window_ms=10_000)
+
+    async def main():
+        pending = asyncio.ensure_future(batcher.predict(["a"]))
+        await asyncio.sleep(0)  # Queued behind a long window
+        await batcher.aclose()
+        return await pending
+
+    assert run(main()) == (["a"], 1.0)
+    assert calls == [[["a"]]]
@@ -0,0 +1,53 @@
+import pytest
+
+import prediction_cache
+from ml_service import MLService
+from prediction_cache import PredictionCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for prediction_cache."""
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recent
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PredictionCache(max_size=10, ttl_seconds=60)
+    cache.put("a", 1)
+    clock[0] += 60
+    assert cache.get("a") == 1
+    clock[0] += 1
+    assert cache.get("a") is None
+    assert cache.expirations == 1 and cache.stats()["size"] == 0
+
+
+def test_zero_size_disables_the_cache():
+    cache = PredictionCache(max_size=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert not cache.stats()["enabled"] and cache.misses == 0
+
+
+def test_equivalent_symptom_lists_share_an_entry(model_files):
+    service = MLService(*model_files, use_flat_engine=True)
+    first = service.predict(["symptom_1", "symptom_2"])
+    assert service.predict(["Symptom 2", "symptom_1", "symptom_2"]) == first
+    assert service.cache.hits == 1 and service.cache.misses == 1
+
+    # Callers get copies, so mutating a result does not change the cached one
+    first[0][0]["prob"] = -1
+    assert service.predict(["symptom_1", "symptom_2"])[0][0]["prob"] != -1
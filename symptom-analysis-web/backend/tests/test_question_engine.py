@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from question_engine import QUESTION_TEMPLATE, QuestionEngine, parse_answer
+
+
+@pytest.mark.parametrize("answer", ["yes", "Yes.", "YES!", "y", "yeah", "yep", "sometimes", "a little",
+                                    "yes, a lot", "Yes - since Monday.", " yes "])
+def test_parse_answer_yes(answer):
+    assert parse_answer(answer) is True
+
+
+@pytest.mark.parametrize("answer", ["no", "No.", "n", "nope", "never", "not really", "Not really, no",
+                                    "no, never", "No. Not at all"])
+def test_parse_answer_no(answer):
+    assert parse_answer(answer) is False
+
+
+@pytest.mark.parametrize("answer", ["not sure", "no idea", "No idea!", "normally", "nothing like that",
+                                    "maybe", "I don't know", "yes please", "n/a", "no-one knows", "", None])
+def test_parse_answer_unclear(answer):
+    assert parse_answer(answer) is None
+
+
+@pytest.fixture
+def engine():
+    likelihood = np.array([
+        # fever, rash, cough, family_history
+        [0.9, 0.1, 0.5, 0.5],  # Flu
+        [0.9, 0.9, 0.5, 0.5],  # Measles
+        [0.1, 0.1, 0.5, 0.5],  # Cold
+    ])
+    questions = [QUESTION_TEMPLATE.format(phrase=s) for s in ("fever", "rash", "cough")]
+    questions.append("Has anyone in your family had a similar illness?")
+    return QuestionEngine(likelihood, ["Flu", "Measles", "Cold"], ["fever", "skin_rash", "cough", "family_history"],
+                          questions)
+
+
+DISEASES = [{"name": "Flu", "prob": 40}, {"name": "Measles", "prob": 30}, {"name": "Cold", "prob": 30}]
+
+
+def test_select_most_informative_unasked_symptom(engine):
+    assert engine.select(DISEASES)["symptom"] == "fever"
+    # Known or already asked symptoms are skipped
+    assert engine.select(DISEASES, known_symptoms=["fever"])["symptom"] == "skin_rash"
+    qa = [{"question": "Are you experiencing fever?", "answer": "yes"}]
+    assert engine.select(DISEASES, qa_history=qa)["symptom"] == "skin_rash"
+
+
+def test_posterior_applies_only_clear_answers(engine):
+    rows, prior = engine.posterior(DISEASES)
+    _, unclear = engine.posterior(DISEASES, [{"symptom": "skin rash", "answer": "no idea"}])
+    np.testing.assert_allclose(unclear, prior)
+
+    _, after_no = engine.posterior(DISEASES, [{"symptom": "skin rash", "answer": "no"}])
+    assert after_no[list(rows).index(1)] < prior[list(rows).index(1)]  # Measles less likely
+
+
+def test_select_without_known_candidates(engine):
+    assert engine.select([{"name": "Unknown", "prob": 90}]) is None
+
+
+def test_stored_questions_map_back_to_symptoms(engine):
+    question = "Has anyone in your family had a similar illness?"
+    assert engine.question_symptom({"question": question}) == "family_history"
+    assert engine.question_symptom({"question": "Something else?"}) is None
+
+
+def test_template_questions_for_tables_without_stored_wording():
+    engine = QuestionEngine(np.full((2, 1), 0.5), ["A", "B"], [" dischromic _patches"])
+    assert engine.questions == ["Are you experiencing dischromic patches?"]
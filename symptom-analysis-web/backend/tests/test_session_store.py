@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+import session_store
+from session_store import SessionStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for session_store."""
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: now[0])
+    return now
+
+
+def open_session(store, **fields):
+    return store.create(symptoms=["fever"], indices=None, top_diseases=[], confidence=40.0,
+                        question="Are you experiencing cough?", **fields)
+
+
+def test_idle_sessions_expire(clock):
+    store = SessionStore(ttl_seconds=60)
+    session = open_session(store)
+    clock[0] += 50
+    assert store.get(session.session_id) is session  # Each access restarts the idle timer
+    clock[0] += 50
+    assert store.get(session.session_id) is session
+    clock[0] += 61
+    assert store.get(session.session_id) is None
+    assert store.stats()["expirations"] == 1 and store.stats()["sessions"] == 0
+
+
+def test_expired_sessions_are_purged_on_create(clock):
+    store = SessionStore(ttl_seconds=60)
+    old = open_session(store)
+    clock[0] += 30
+    live = open_session(store)
+    clock[0] += 31
+    open_session(store)
+    assert store.expirations == 1
+    assert store.get(old.session_id) is None and store.get(live.session_id) is live
+
+
+def test_least_recently_used_session_is_evicted(clock):
+    store = SessionStore(max_sessions=2, ttl_seconds=0)
+    first, second = open_session(store), open_session(store)
+    clock[0] += 10 ** 6  # No TTL: idle sessions never expire
+    assert store.get(first.session_id) is first
+    third = open_session(store)
+    assert store.get(second.session_id) is None
+    assert store.get(first.session_id) is first and store.get(third.session_id) is third
+    assert store.stats()["evictions"] == 1
+
+
+def test_removed_sessions_cancel_their_prefetched_reports():
+    async def main():
+        store = SessionStore(max_sessions=1)
+        session = open_session(store)
+        task = asyncio.ensure_future(asyncio.sleep(10))
+        session.prefetch[True] = (["Flu"], task)
+        open_session(store)  # Evicts the first session
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return task
+
+    assert asyncio.run(main()).cancelled()
+
+
+def test_record_answer_keeps_the_asked_symptom():
+    session = open_session(SessionStore(), question_symptom="cough")
+    assert session.question_number == 1
+    assert session.record_answer("yes") == [
+        {"question": "Are you experiencing cough?", "answer": "yes", "symptom": "cough"}
+    ]
+    assert session.question is None and session.question_number == 2
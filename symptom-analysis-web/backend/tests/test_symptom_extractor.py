@@ -0,0 +1,58 @@
+import pytest
+
+from symptom_extractor import SymptomExtractor
+
+VOCABULARY = [" chills", " vomiting", " stomach_pain", " high_fever", " cough", " joint_pain", " headache",
+              " skin_rash", " itching", " nausea", " continuous_sneezing"]
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return SymptomExtractor.from_vocabularies({key: i for i, key in enumerate(VOCABULARY)},
+                                              ["Joint Pain", "sore throat"])
+
+
+def symptoms(extractor, text):
+    return [m["symptom"] for m in extractor.extract(text)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("I have a headache and nausea", ["headache", "nausea"]),
+    ("Skin rash, itching", ["skin_rash", "itching"]),
+    ("constant sneezing and a sore throat", ["continuous_sneezing", "sore throat"]),
+    ("stomach pain", ["stomach_pain"]),
+])
+def test_extracts_in_order_of_appearance(extractor, text, expected):
+    assert symptoms(extractor, text) == expected
+
+
+def test_extra_names_fold_into_model_keys(extractor):
+    assert symptoms(extractor, "joint pain") == ["joint_pain"]
+    assert extractor.canonicalize(["Joint Pain", "joint_pain", "unknown", "sore throat"]) == ["joint_pain", "sore throat"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("no cough", []),
+    ("no cough or fever", []),
+    ("I have chills, not vomiting but stomach pain", ["chills", "stomach_pain"]),
+    ("high fever and no cough, but joint pain", ["high_fever", "joint_pain"]),
+    ("no cough. headache", ["headache"]),
+    ("without vomiting; however nausea", ["nausea"]),
+    ("denies headache although itching", ["itching"]),
+])
+def test_negation_stops_at_clause_boundaries(extractor, text, expected):
+    assert symptoms(extractor, text) == expected
+
+
+def test_windows_do_not_span_clauses(extractor):
+    # "stomach" and "pain" are in different clauses, so no window joins them
+    texts = [m["text"] for m in extractor.extract("upset stomach. pain in my knee")]
+    assert texts and not any("stomach" in t and "pain" in t for t in texts)
+    assert [m["text"] for m in extractor.extract("upset stomach pain")] == ["stomach pain"]
+
+
+def test_confidence_is_the_weakest_match(extractor):
+    matches = extractor.extract("headache and joint pains")
+    assert SymptomExtractor.confidence(matches) == min(m["score"] for m in matches)
+    assert SymptomExtractor.confidence([]) == 0.0
+    assert extractor.extract("nothing relevant here") == []
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from symptom_resolver import SymptomResolver
+
+KEYS = ["itching", " skin_rash", "nodal_skin_eruptions", "continuous_sneezing", "shivering", "chills",
+        "joint_pain", "stomach_pain", "acidity", "ulcers_on_tongue", "muscle_wasting", "vomiting",
+        "burning_micturition", "spotting_ urination", "fatigue", "weight_gain", "anxiety", "cold_hands_and_feets",
+        "mood_swings", "weight_loss", "restlessness", "lethargy", "patches_in_throat", "cough", "high_fever",
+        "sunken_eyes", "breathlessness", "sweating", "dehydration", "indigestion", "headache", "yellowish_skin",
+        "dark_urine", "nausea", "loss_of_appetite", "pain_behind_the_eyes", "back_pain", "constipation",
+        "abdominal_pain", "diarrhoea", "mild_fever", "yellow_urine", "yellowing_of_eyes", "acute_liver_failure",
+        "fluid_overload", "swelling_of_stomach", "swelled_lymph_nodes", "malaise", "blurred_and_distorted_vision",
+        "phlegm", "throat_irritation", "redness_of_eyes", "sinus_pressure", "runny_nose", "congestion"]
+
+
+@pytest.fixture(scope="module")
+def resolver():
+    return SymptomResolver({key: i for i, key in enumerate(KEYS)})
+
+
+def linear_partial_match(resolver, clean_s):
+    """The scan the n-gram index replaces: first key inside the input or containing it."""
+    return next((i for i, key in enumerate(resolver._keys) if clean_s in key or key in clean_s), None)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Skin Rash", ("skin_rash", "direct")),
+    ("high_fever", ("high_fever", "direct")),
+    ("severe headache", ("headache", "keyword")),
+    ("stomach", ("stomach_pain", "direct")),  # Long words of a key are indexed on their own
+    ("my stomach hurts", ("stomach_pain", "keyword")),
+    ("sneez", ("continuous_sneezing", "partial")),
+    ("feverish", ("high_fever", "partial")),
+    ("qqqq", None),
+    ("", None),
+])
+def test_resolve_strategies(resolver, raw, expected):
+    hit = resolver.resolve(raw)
+    assert (None if hit is None else (hit[0].strip(), hit[1])) == expected
+
+
+def test_partial_match_agrees_with_linear_scan(resolver):
+    rng = random.Random(0)
+    probes = ["a", "ea", "ing", "pain", "xyz", "the eyes", "yellowi", "lymph", "o"]
+    for key in resolver._keys:
+        for _ in range(3):
+            start = rng.randrange(len(key))
+            probes.append(key[start:start + rng.randint(1, 8)])
+            probes.append("zz " + key + " qq")
+    for probe in probes:
+        assert resolver._partial_match(probe) == linear_partial_match(resolver, probe), probe
+
+
+def test_resolve_many_skips_misses_and_memoizes(resolver):
+    resolver.resolve.cache_clear()
+    matches = resolver.resolve_many(["cough", "qqqq", "cough"])
+    assert [(raw, key, strategy) for raw, key, strategy in matches] == [("cough", "cough", "direct")] * 2
+    assert resolver.memo_stats()["hits"] == 1
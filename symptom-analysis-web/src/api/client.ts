@@ -61,12 +61,17 @@ export type DiagnoseResponse = {
     // For ask_question
     question?: string;
     question_number?: number;
+    session_id?: string;
 };
 
 export type AskResponse = {
     action: "ask_question" | "show_report";
+    // Prediction updated with the answers so far
+    confidence_score?: number;
+    top_diseases?: Disease[];
     question?: string;
     question_number?: number;
+    session_id?: string;
     report?: DiagnosisReport;
 };
 
@@ -215,6 +220,19 @@ export async function askFollowUp(
     return response.json();
 }
 
+// Answer the pending question of a Q&A session opened by /diagnose.
+// Returns null if the session expired, so the caller can fall back to askFollowUp.
+export async function answerFollowUp(session_id: string, answer: string): Promise<AskResponse | null> {
+    const response = await fetch(`${API_BASE_URL}/ask`, {
+        method: "POST",
+        headers: getAuthHeaders(),
+        body: JSON.stringify({ session_id, answer }),
+    });
+    if (response.status === 404) return null;
+    if (!response.ok) throw new Error("Ask API failed");
+    return response.json();
+}
+
 // Legacy function for backward compatibility
 export async function finalizeDiagnosis(
     symptoms: string[],
@@ -8,7 +8,7 @@ import { localizedSymptoms, getSymptomTheme, themeClasses, formatSymptomDisplay
 import { CommonSymptoms } from "./CommonSymptoms";
 import { BodySilhouette } from "./BodySilhouette";
 import { GeneralSymptomSelector } from "./GeneralSymptomSelector";
-import { diagnoseSymptoms, askFollowUp, DiagnoseResponse, Disease, QAEntry, DiagnosisReport } from "@/api/client";
+import { diagnoseSymptoms, askFollowUp, answerFollowUp, DiagnoseResponse, Disease, QAEntry, DiagnosisReport } from "@/api/client";
 import { useUser } from "@/context/UserContext";
 import ReactMarkdown from "react-markdown";
 
@@ -26,6 +26,7 @@ interface QAFlowState {
     questionNumber: number;
     qaHistory: QAEntry[];
     currentQuestion: string;
+    sessionId?: string;  // Server-side Q&A session; /ask then only needs the answer
 }
 
 export function ChatInterface({ currentSession, onSendMessage, className = "" }: ChatInterfaceProps) {
@@ -160,13 +161,21 @@ ${report.reasoning}
                     { question: qaFlow.currentQuestion, answer }
                 ];
 
-                // Call /ask endpoint
-                const response = await askFollowUp(
-                    qaFlow.symptoms,
-                    qaFlow.topDiseases,
-                    qaFlow.questionNumber,
-                    newQaHistory
-                );
+                // Call /ask endpoint (full state only if the server session has expired)
+                const response = (qaFlow.sessionId && await answerFollowUp(qaFlow.sessionId, answer)) ||
+                    await askFollowUp(
+                        qaFlow.symptoms,
+                        qaFlow.topDiseases,
+                        qaFlow.questionNumber,
+                        newQaHistory
+                    );
+
+                if (response.top_diseases && response.confidence_score !== undefined) {
+                    setMlConfidenceData({
+                        topDiseases: response.top_diseases,
+                        confidence: response.confidence_score
+                    });
+                }
 
                 if (response.action === "show_report" && response.report) {
                     // All 3 questions answered - show final report
@@ -178,6 +187,8 @@ ${report.reasoning}
                     aiContent = `${response.question}`;
                     setQaFlow(prev => ({
                         ...prev,
+                        topDiseases: response.top_diseases || prev.topDiseases,
+                        sessionId: response.session_id || undefined,
                         questionNumber: response.question_number || prev.questionNumber + 1,
                         qaHistory: newQaHistory,
                         currentQuestion: response.question || ""
@@ -211,7 +222,8 @@ ${report.reasoning}
                         topDiseases: response.top_diseases,
                         questionNumber: response.question_number || 1,
                         qaHistory: [],
-                        currentQuestion: response.question
+                        currentQuestion: response.question,
+                        sessionId: response.session_id
                     });
                 }
             }